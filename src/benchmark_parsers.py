@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Parser Benchmark
+قياس تكلفة تحليل كل صفحة لكل محلل HTML على الصفحات المحفوظة في data/
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+from html_parser import available_parsers, make_soup
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+DEFAULT_PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def collect_pages(paths):
+    """جمع ملفات HTML من المسارات المعطاة"""
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            pages.extend(sorted(glob.glob(os.path.join(path, '**', '*.html'), recursive=True)))
+        elif os.path.isfile(path):
+            pages.append(path)
+    return pages
+
+
+def fetch_pages(urls, directory):
+    """جلب صفحات حية وحفظها لاستخدامها في القياس"""
+    from page_store import get_page_store
+
+    store = get_page_store()
+    store.get_many(urls)
+    return store.save_pages(directory)
+
+
+def time_parse(parse, markup, repeats):
+    """الوسيط بالمللي ثانية لعدة تكرارات"""
+    samples = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        parse(markup)
+        samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def run_benchmark(pages, repeats=5):
+    """قياس كل محلل على كل صفحة"""
+    backends = {name: (lambda markup, name=name: make_soup(markup, name)) for name in available_parsers()}
+
+    # التحليل الخام بدون بناء شجرة BeautifulSoup (الحد الأدنى الممكن)
+    if lxml is not None:
+        backends['lxml (native)'] = lxml.html.document_fromstring
+    if LexborHTMLParser is not None:
+        backends['selectolax (native)'] = LexborHTMLParser
+
+    results = {
+        'repeats': repeats,
+        'pages': [],
+        'totals_ms': {name: 0.0 for name in backends}
+    }
+
+    for path in pages:
+        with open(path, 'rb') as f:
+            markup = f.read()
+        page_result = {
+            'page': os.path.basename(path),
+            'size_kb': round(len(markup) / 1024, 1),
+            'parse_ms': {}
+        }
+        for name, parse in backends.items():
+            median_ms = time_parse(parse, markup, repeats)
+            page_result['parse_ms'][name] = round(median_ms, 2)
+            results['totals_ms'][name] += median_ms
+        results['pages'].append(page_result)
+
+    results['totals_ms'] = {name: round(total, 2) for name, total in results['totals_ms'].items()}
+    return results
+
+
+def print_results(results):
+    """طباعة جدول النتائج"""
+    names = list(results['totals_ms'])
+    print("\n" + "="*60)
+    print("⏱️ تكلفة التحليل لكل صفحة (ms، الوسيط):")
+    print("="*60)
+    print(f"{'page':<40} {'KB':>7} " + ' '.join(f"{name:>20}" for name in names))
+    for page in results['pages']:
+        print(f"{page['page'][:40]:<40} {page['size_kb']:>7} " + ' '.join(f"{page['parse_ms'][name]:>20}" for name in names))
+    print(f"{'TOTAL':<40} {'':>7} " + ' '.join(f"{results['totals_ms'][name]:>20}" for name in names))
+    print("="*60)
+
+
+def main():
+    """الوظيفة الرئيسية"""
+    parser = argparse.ArgumentParser(description='Benchmark HTML parser backends on saved pages')
+    parser.add_argument('paths', nargs='*', default=[DEFAULT_PAGES_DIR], help='HTML files or directories (default: data/)')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--fetch', nargs='+', metavar='URL', help='fetch these URLs into data/pages/ first')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    if args.fetch:
+        saved = fetch_pages(args.fetch, os.path.join(DEFAULT_PAGES_DIR, 'pages'))
+        print(f"📁 تم حفظ {len(saved)} صفحة في data/pages")
+
+    pages = collect_pages(args.paths)
+    if not pages:
+        print("⚠️ لا توجد صفحات HTML محفوظة. استخدم --fetch https://dnmeg.com ... لحفظ صفحات أولاً")
+        return
+
+    results = run_benchmark(pages, args.repeats)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,61 @@ DNM.EG Checkout Analyzer
 تحليل شامل لسلة التسوع وعملية الخروج
 """
 
-import requests
-from bs4 import BeautifulSoup
 import json
 import time
 import random
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 
+from dom_extract import DomExtractor
+from http_client import get_shared_fetcher
+from page_store import get_page_store
+
+# قواعد صفحة الخروج: كل المساعدات تقرأ من مرور واحد على الشجرة
+CHECKOUT_RULES = (
+    DomExtractor()
+    .add('title', 'title')
+    # خطوات الخروج ومؤشر التقدم
+    .add('step_lists', ['ol', 'ul'], class_=lambda x: x and ('step' in x.lower() or 'progress' in x.lower()))
+    .add('step_items', 'li', within='step_lists')
+    .add('progress_elements', ['div', 'ol'], class_=lambda x: x and ('progress' in x.lower() or 'step' in x.lower()))
+    .add('progress_items', 'li', within='progress_elements')
+    # حقول النموذج
+    .add('form_inputs', ['input', 'select', 'textarea'])
+    .add('validation_scripts', 'script', string=lambda x: x and ('validation' in x.lower() or 'required' in x.lower()) if x else False)
+    # طرق الدفع
+    .add('payment_options', ['div', 'section'], class_=lambda x: x and ('payment' in x.lower() or 'method' in x.lower()))
+    .add('credit_inputs', 'input', {'name': lambda x: x and ('card' in x.lower() or 'credit' in x.lower())}, within='payment_options')
+    .add_text('paypal_text', lambda x: x and 'paypal' in x.lower() if x else False, within='payment_options')
+    .add_text('apple_pay_text', lambda x: x and 'apple pay' in x.lower() if x else False, within='payment_options')
+    .add_text('cod_text', lambda x: x and ('cash' in x.lower() or 'cod' in x.lower()) if x else False, within='payment_options')
+    .add_text('installment_text', lambda x: x and ('installment' in x.lower() or 'valU' in x.lower() or 'sympl' in x.lower()) if x else False, within='payment_options')
+    # خيارات الشحن
+    .add('shipping_options', ['div', 'section'], class_=lambda x: x and ('shipping' in x.lower() or 'delivery' in x.lower()))
+    .add_text('standard_text', lambda x: x and ('standard' in x.lower() or 'regular' in x.lower()) if x else False, within='shipping_options')
+    .add_text('express_text', lambda x: x and ('express' in x.lower() or 'fast' in x.lower()) if x else False, within='shipping_options')
+    .add_text('free_shipping_text', lambda x: x and 'free shipping' in x.lower() if x else False, within='shipping_options')
+    .add_text('pickup_text', lambda x: x and ('pickup' in x.lower() or 'collect' in x.lower()) if x else False, within='shipping_options')
+    .add('calculator_inputs', 'input', {'name': lambda x: x and ('postal' in x.lower() or 'zip' in x.lower())})
+    # عناصر الثقة
+    .add_text('ssl_text', lambda x: x and ('ssl' in x.lower() or 'secure' in x.lower()) if x else False)
+    .add_text('payment_security_text', lambda x: x and ('payment security' in x.lower() or 'secure payment' in x.lower()) if x else False)
+    .add('privacy_links', 'a', href=lambda x: x and 'privacy' in x.lower())
+    .add('terms_links', 'a', href=lambda x: x and 'terms' in x.lower())
+    .add('return_links', 'a', href=lambda x: x and 'return' in x.lower())
+    .add('support_links', 'a', href=lambda x: x and ('support' in x.lower() or 'contact' in x.lower()))
+    .add('trust_seals', ['img', 'div'], class_=lambda x: x and ('trust' in x.lower() or 'seal' in x.lower() or 'verified' in x.lower()))
+    # معالجة الأخطاء
+    .add('error_elements', ['div', 'span'], class_=lambda x: x and ('error' in x.lower() or 'alert' in x.lower()))
+    .add('error_scripts', 'script', string=lambda x: x and ('validation' in x.lower() or 'error' in x.lower()) if x else False)
+)
+
 class CheckoutAnalyzer:
-    def __init__(self):
+    def __init__(self, fetcher=None, pages=None):
         self.base_url = "https://dnmeg.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.pages = pages or get_page_store(self.fetcher)
+        self._checkout_extraction = (None, None)
         self.checkout_data = {
             'cart_analysis': {},
             'checkout_process': {},
@@ -33,7 +73,8 @@ class CheckoutAnalyzer:
         try:
             # محاولة الوصول لصفحة السلة
             cart_url = f"{self.base_url}/cart"
-            response = self.session.get(cart_url, timeout=10)
+            page = self.pages.get(cart_url)
+            response = page.response
             
             if response.status_code != 200:
                 return {
@@ -42,7 +83,7 @@ class CheckoutAnalyzer:
                     'error': 'Cart page not accessible'
                 }
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = page.soup
             
             cart_analysis = {
                 'accessible': True,
@@ -301,7 +342,8 @@ class CheckoutAnalyzer:
         try:
             # محاولة الوصول لصفحة الخروج
             checkout_url = f"{self.base_url}/checkout"
-            response = self.session.get(checkout_url, timeout=10)
+            page = self.pages.get(checkout_url)
+            response = page.response
             
             if response.status_code != 200:
                 return {
@@ -310,11 +352,12 @@ class CheckoutAnalyzer:
                     'error': 'Checkout page not accessible'
                 }
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = page.soup
+            title = self.extract_checkout_elements(soup).first('title')
             
             checkout_analysis = {
                 'accessible': True,
-                'page_title': soup.find('title').text.strip() if soup.find('title') else '',
+                'page_title': title.text.strip() if title else '',
                 'checkout_steps': self.analyze_checkout_steps(soup),
                 'form_fields': self.analyze_checkout_fields(soup),
                 'payment_methods': self.analyze_payment_methods(soup),
@@ -332,6 +375,14 @@ class CheckoutAnalyzer:
                 'error': str(e)
             }
     
+    def extract_checkout_elements(self, soup):
+        """استخراج كل عناصر صفحة الخروج في مرور واحد (مع إعادة الاستخدام لنفس الشجرة)"""
+        cached_soup, found = self._checkout_extraction
+        if cached_soup is not soup:
+            found = CHECKOUT_RULES.run(soup)
+            self._checkout_extraction = (soup, found)
+        return found
+    
     def analyze_checkout_steps(self, soup):
         """تحليل خطوات الخروج"""
         steps = {
@@ -342,13 +393,14 @@ class CheckoutAnalyzer:
         }
         
         # البحث عن مؤشرات الخطوات
-        step_indicators = soup.find_all(['ol', 'ul'], class_=lambda x: x and ('step' in x.lower() or 'progress' in x.lower()))
+        found = self.extract_checkout_elements(soup)
+        step_indicators = found.all('step_lists')
         if step_indicators:
             steps['step_indicators'] = len(step_indicators)
             
             # استخراج أسماء الخطوات
-            for indicator in step_indicators:
-                step_items = indicator.find_all('li')
+            for index in range(len(step_indicators)):
+                step_items = found.inside('step_items', index)
                 for item in step_items:
                     step_text = item.text.strip()
                     if step_text:
@@ -390,7 +442,8 @@ class CheckoutAnalyzer:
         }
         
         # البحث عن حقول النموذج
-        all_inputs = soup.find_all(['input', 'select', 'textarea'])
+        found = self.extract_checkout_elements(soup)
+        all_inputs = found.all('form_inputs')
         
         for input_elem in all_inputs:
             input_name = input_elem.get('name', '').lower()
@@ -431,7 +484,7 @@ class CheckoutAnalyzer:
                 fields['optional_fields'] += 1
         
         # التحقق من وجود تحقق من صحة الحقول
-        validation_scripts = soup.find_all('script', string=lambda x: x and ('validation' in x.lower() or 'required' in x.lower()) if x else False)
+        validation_scripts = found.all('validation_scripts')
         if validation_scripts:
             fields['field_validation'] = True
         
@@ -452,36 +505,32 @@ class CheckoutAnalyzer:
         }
         
         # البحث عن طرق الدفع
-        payment_options = soup.find_all(['div', 'section'], class_=lambda x: x and ('payment' in x.lower() or 'method' in x.lower()))
+        found = self.extract_checkout_elements(soup)
+        payment_options = found.all('payment_options')
         
-        for option in payment_options:
+        for index in range(len(payment_options)):
             # التحقق من البطاقة الائتمانية
-            credit_inputs = option.find_all('input', {'name': lambda x: x and ('card' in x.lower() or 'credit' in x.lower())})
-            if credit_inputs:
+            if found.inside('credit_inputs', index):
                 payment_methods['credit_card'] = True
                 payment_methods['method_details'].append('Credit Card')
             
             # التحقق من باي بال
-            paypal_elements = option.find_all(string=lambda x: x and 'paypal' in x.lower() if x else False)
-            if paypal_elements:
+            if found.inside('paypal_text', index):
                 payment_methods['paypal'] = True
                 payment_methods['method_details'].append('PayPal')
             
             # التحقق من Apple Pay
-            apple_pay_elements = option.find_all(string=lambda x: x and 'apple pay' in x.lower() if x else False)
-            if apple_pay_elements:
+            if found.inside('apple_pay_text', index):
                 payment_methods['apple_pay'] = True
                 payment_methods['method_details'].append('Apple Pay')
             
             # التحقق من الدفع عند الاستلام
-            cod_elements = option.find_all(string=lambda x: x and ('cash' in x.lower() or 'cod' in x.lower()) if x else False)
-            if cod_elements:
+            if found.inside('cod_text', index):
                 payment_methods['cash_on_delivery'] = True
                 payment_methods['method_details'].append('Cash on Delivery')
             
             # التحقص من التقسيط
-            installment_elements = option.find_all(string=lambda x: x and ('installment' in x.lower() or 'valU' in x.lower() or 'sympl' in x.lower()) if x else False)
-            if installment_elements:
+            if found.inside('installment_text', index):
                 payment_methods['installments'] = True
                 payment_methods['method_details'].append('Installments')
         
@@ -502,35 +551,32 @@ class CheckoutAnalyzer:
         }
         
         # البحث عن خيارات الشحن
-        shipping_options = soup.find_all(['div', 'section'], class_=lambda x: x and ('shipping' in x.lower() or 'delivery' in x.lower()))
+        found = self.extract_checkout_elements(soup)
+        shipping_options = found.all('shipping_options')
         
-        for option in shipping_options:
+        for index in range(len(shipping_options)):
             # التحقق من الشحن القياسي
-            standard_elements = option.find_all(string=lambda x: x and ('standard' in x.lower() or 'regular' in x.lower()) if x else False)
-            if standard_elements:
+            if found.inside('standard_text', index):
                 shipping['standard_shipping'] = True
                 shipping['option_details'].append('Standard Shipping')
             
             # التحقق من الشحن السريع
-            express_elements = option.find_all(string=lambda x: x and ('express' in x.lower() or 'fast' in x.lower()) if x else False)
-            if express_elements:
+            if found.inside('express_text', index):
                 shipping['express_shipping'] = True
                 shipping['option_details'].append('Express Shipping')
             
             # التحقق من الشحن المجاني
-            free_elements = option.find_all(string=lambda x: x and 'free shipping' in x.lower() if x else False)
-            if free_elements:
+            if found.inside('free_shipping_text', index):
                 shipping['free_shipping'] = True
                 shipping['option_details'].append('Free Shipping')
             
             # التحقق من خيار الاستلام
-            pickup_elements = option.find_all(string=lambda x: x and ('pickup' in x.lower() or 'collect' in x.lower()) if x else False)
-            if pickup_elements:
+            if found.inside('pickup_text', index):
                 shipping['pickup_option'] = True
                 shipping['option_details'].append('Store Pickup')
         
         # التحقق من حاسبة الشحن
-        calculator_inputs = soup.find_all('input', {'name': lambda x: x and ('postal' in x.lower() or 'zip' in x.lower())})
+        calculator_inputs = found.all('calculator_inputs')
         if calculator_inputs:
             shipping['shipping_calculator'] = True
         
@@ -549,18 +595,19 @@ class CheckoutAnalyzer:
         }
         
         # البحث عن مؤشر التقدم
-        progress_elements = soup.find_all(['div', 'ol'], class_=lambda x: x and ('progress' in x.lower() or 'step' in x.lower()))
+        found = self.extract_checkout_elements(soup)
+        progress_elements = found.all('progress_elements')
         
         if progress_elements:
             progress['has_progress'] = True
             
-            for elem in progress_elements:
+            for index, elem in enumerate(progress_elements):
                 # التحقق من شريط التقدم
                 if 'progress' in elem.get('class', []):
                     progress['progress_bar'] = True
                 
                 # التحقق من أرقام الخطوات
-                step_items = elem.find_all('li')
+                step_items = found.inside('progress_items', index)
                 if step_items:
                     progress['total_steps'] = len(step_items)
                     
@@ -586,39 +633,34 @@ class CheckoutAnalyzer:
             'trust_seals': 0
         }
         
+        found = self.extract_checkout_elements(soup)
+        
         # البحث عن شارة SSL
-        ssl_elements = soup.find_all(string=lambda x: x and ('ssl' in x.lower() or 'secure' in x.lower()) if x else False)
-        if ssl_elements:
+        if found.all('ssl_text'):
             trust['ssl_badge'] = True
         
         # البحث عن أمان الدفع
-        payment_security = soup.find_all(string=lambda x: x and ('payment security' in x.lower() or 'secure payment' in x.lower()) if x else False)
-        if payment_security:
+        if found.all('payment_security_text'):
             trust['payment_security'] = True
         
         # البحث عن سياسة الخصوصية
-        privacy_links = soup.find_all('a', href=lambda x: x and 'privacy' in x.lower())
-        if privacy_links:
+        if found.all('privacy_links'):
             trust['privacy_policy'] = True
         
         # البحث عن شروط الخدمة
-        terms_links = soup.find_all('a', href=lambda x: x and 'terms' in x.lower())
-        if terms_links:
+        if found.all('terms_links'):
             trust['terms_of_service'] = True
         
         # البحث عن سياسة الإرجاع
-        return_links = soup.find_all('a', href=lambda x: x and 'return' in x.lower())
-        if return_links:
+        if found.all('return_links'):
             trust['return_policy'] = True
         
         # البحث عن اتصل بالدعم
-        support_links = soup.find_all('a', href=lambda x: x and ('support' in x.lower() or 'contact' in x.lower()))
-        if support_links:
+        if found.all('support_links'):
             trust['support_contact'] = True
         
         # البحث عن أختام الثقة
-        trust_seals = soup.find_all(['img', 'div'], class_=lambda x: x and ('trust' in x.lower() or 'seal' in x.lower() or 'verified' in x.lower()))
-        trust['trust_seals'] = len(trust_seals)
+        trust['trust_seals'] = found.count('trust_seals')
         
         return trust
     
@@ -632,15 +674,15 @@ class CheckoutAnalyzer:
             'error_display': 'none'
         }
         
+        found = self.extract_checkout_elements(soup)
+        
         # البحث عن رسائل الخطأ
-        error_elements = soup.find_all(['div', 'span'], class_=lambda x: x and ('error' in x.lower() or 'alert' in x.lower()))
-        if error_elements:
+        if found.all('error_elements'):
             error_handling['error_messages'] = True
             error_handling['error_display'] = 'inline'
         
         # البحث عن تحقق من صحة الأخطاء
-        validation_scripts = soup.find_all('script', string=lambda x: x and ('validation' in x.lower() or 'error' in x.lower()) if x else False)
-        if validation_scripts:
+        if found.all('error_scripts'):
             error_handling['validation_errors'] = True
         
         return error_handling
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Content-hash Memo
+ذاكرة LRU محدودة لنتائج تحليل الصفحات، مفتاحها بصمة المحتوى
+"""
+
+import copy
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ContentMemo:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+    def content_key(self, content):
+        """بصمة المحتوى (نص أو bytes)"""
+        if isinstance(content, str):
+            content = content.encode('utf-8', errors='surrogatepass')
+        return hashlib.sha1(content).hexdigest()
+
+    def get_or_compute(self, namespace, content, compute, copy_result=True):
+        """إرجاع النتيجة المحفوظة أو حسابها مرة واحدة (نسخة حتى لا تُعدَّل النتيجة المشتركة)"""
+        key = (namespace, self.content_key(content))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                value = self._entries[key]
+                return copy.deepcopy(value) if copy_result else value
+            self.stats['misses'] += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return copy.deepcopy(value) if copy_result else value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def memoized_by_content(content_arg=0):
+    """مُزخرف لدوال الكائن: النتيجة تُحفظ حسب بصمة المعامل content_arg وبقية المعاملات"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            namespace = (method.__name__,) + tuple(arg for i, arg in enumerate(args) if i != content_arg)
+            return self.memo.get_or_compute(namespace, args[content_arg], lambda: method(self, *args))
+        return wrapper
+    return decorator
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Crawl Frontier
+حدود زحف دائمة مع نقاط حفظ: تسجيل الروابط المنتظرة والجارية والمكتملة لاستئناف التشغيل
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+QUEUED = 'queued'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def content_hash(content):
+    """بصمة المحتوى لتمييز الصفحات المتغيرة"""
+    return hashlib.sha1(content).hexdigest()
+
+
+class CrawlFrontier:
+    def __init__(self, directory):
+        self.directory = directory
+        self.journal_path = os.path.join(directory, 'frontier.jsonl')
+        self.records_path = os.path.join(directory, 'records.jsonl')
+        self.state = {}
+        self._records = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._records_file = open(self.records_path, 'a', encoding='utf-8')
+
+    def _read_jsonl(self, path):
+        """قراءة ملف JSONL مع تجاهل السطر الأخير إن انقطع أثناء الكتابة"""
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return entries
+
+    def _load(self):
+        """إعادة بناء الحالة من السجل"""
+        for event in self._read_jsonl(self.journal_path):
+            self.state[event['url']] = {
+                'status': event['status'],
+                'content_hash': event.get('content_hash'),
+                'error': event.get('error')
+            }
+        for entry in self._read_jsonl(self.records_path):
+            self._records[entry['url']] = entry['record']
+
+        # السجل يُكتب بعد السجل النهائي، لذا أي رابط "مكتمل" بلا سجل يُعاد
+        for url, entry in self.state.items():
+            if entry['status'] == DONE and url not in self._records:
+                entry['status'] = QUEUED
+
+    def _append(self, url, status, **extra):
+        event = {'url': url, 'status': status, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+        event.update(extra)
+        self._journal.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._journal.flush()
+        self.state[url] = {
+            'status': status,
+            'content_hash': extra.get('content_hash'),
+            'error': extra.get('error')
+        }
+
+    def enqueue(self, urls):
+        """إضافة الروابط الجديدة فقط إلى قائمة الانتظار"""
+        for url in urls:
+            if url not in self.state:
+                self._append(url, QUEUED)
+
+    def pending(self, urls=None):
+        """الروابط غير المكتملة (بما فيها الجارية من تشغيل سابق انقطع)"""
+        candidates = urls if urls is not None else list(self.state)
+        return [url for url in dict.fromkeys(candidates) if not self.is_done(url)]
+
+    def mark_in_flight(self, urls):
+        for url in urls:
+            self._append(url, IN_FLIGHT)
+
+    def mark_done(self, url, record, content_hash=None):
+        """حفظ السجل على القرص فور اكتماله ثم تعليم الرابط كمكتمل"""
+        self._records_file.write(json.dumps({'url': url, 'record': record}, ensure_ascii=False) + '\n')
+        self._records_file.flush()
+        self._records[url] = record
+        self._append(url, DONE, content_hash=content_hash)
+
+    def mark_failed(self, url, error):
+        self._append(url, FAILED, error=str(error))
+
+    def is_done(self, url):
+        return self.state.get(url, {}).get('status') == DONE
+
+    def record(self, url):
+        return self._records.get(url)
+
+    def summary(self):
+        counts = {QUEUED: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        for entry in self.state.values():
+            counts[entry['status']] += 1
+        return counts
+
+    def close(self):
+        self._journal.close()
+        self._records_file.close()
+
+    def reset(self):
+        """حذف نقاط الحفظ بعد اكتمال التشغيل بنجاح"""
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.state = {}
+        self._records = {}
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Device Profiles
+ملفات أجهزة (سطح المكتب وعدة هواتف) مع شبكات مقيدة، وتشغيلها كلها بالتوازي على كل رابط
+"""
+
+import asyncio
+from urllib.parse import urlparse
+
+from http_client import DEFAULT_USER_AGENT, get_shared_fetcher
+
+HTML_ACCEPT = 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+
+# شبكات مقيدة بنفس قيم DevTools / Lighthouse (زمن الذهاب والعودة وسرعة التنزيل)
+NETWORK_PRESETS = {
+    'slow_4g': {'rtt_ms': 150, 'download_kbps': 1638.4},
+    'fast_3g': {'rtt_ms': 562.5, 'download_kbps': 1474.56},
+    'slow_3g': {'rtt_ms': 2000, 'download_kbps': 400}
+}
+
+DEVICE_PROFILES = {
+    'desktop': {
+        'user_agent': DEFAULT_USER_AGENT,
+        'mobile': False,
+        'network': None
+    },
+    'iphone': {
+        'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15',
+        'mobile': True,
+        'network': None
+    },
+    'android': {
+        'user_agent': 'Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Mobile Safari/537.36',
+        'mobile': True,
+        'network': None
+    },
+    'iphone_slow_4g': {
+        'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15',
+        'mobile': True,
+        'network': 'slow_4g'
+    },
+    'android_fast_3g': {
+        'user_agent': 'Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Mobile Safari/537.36',
+        'mobile': True,
+        'network': 'fast_3g'
+    }
+}
+
+
+def profile_headers(profile):
+    return {'User-Agent': profile['user_agent'], 'Accept': HTML_ACCEPT}
+
+
+def simulate_throttled_time(result, preset, secure=True):
+    """زمن التحميل المتوقع على شبكة مقيدة: القياس الفعلي + جولات الشبكة + زمن نقل البايتات"""
+    timings = result.timings or {}
+    round_trips = 1  # الطلب نفسه
+    if timings.get('dns_ms'):
+        round_trips += 1
+    if not timings.get('connection_reused'):
+        round_trips += 2 if secure else 1  # TCP (+ TLS)
+    transfer_ms = len(result.content) * 8 / preset['download_kbps']
+    return round((result.elapsed * 1000 + round_trips * preset['rtt_ms'] + transfer_ms) / 1000, 3)
+
+
+class DeviceProfileRunner:
+    def __init__(self, fetcher=None, profiles=None):
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.profiles = profiles or DEVICE_PROFILES
+        self._fetchers = {}
+
+    def profile_fetcher(self, name):
+        """جلسة مجمعة واحدة لكل ملف جهاز (تشارك الاتصالات مع طبقة الجلب)"""
+        if name not in self._fetchers:
+            fetcher = self.fetcher.scoped()
+            fetcher.headers.update(profile_headers(self.profiles[name]))
+            self._fetchers[name] = fetcher
+        return self._fetchers[name]
+
+    def fetch_groups(self, names):
+        """ملفات بنفس الترويسات (نفس الجهاز بشبكة مقيدة) تشارك جلباً واحداً: {الملف الذي يجلب: [الملفات]}"""
+        groups = {}
+        by_headers = {}
+        for name in names:
+            key = tuple(sorted(profile_headers(self.profiles[name]).items()))
+            representative = by_headers.setdefault(key, name)
+            groups.setdefault(representative, []).append(name)
+        return groups
+
+    async def _fetch_matrix_async(self, urls, groups):
+        pairs = [(url, name) for url in urls for name in groups]
+        results = await asyncio.gather(*(
+            self.profile_fetcher(name).fetch_async(url, use_cache=False) for url, name in pairs
+        ))
+        matrix = {url: {} for url in urls}
+        for (url, name), result in zip(pairs, results):
+            # الشبكة المقيدة تُحاكى فوق نفس الاستجابة في describe
+            for member in groups[name]:
+                matrix[url][member] = result
+        return matrix
+
+    def fetch_matrix(self, urls, names=None):
+        """جلب كل رابط بكل ملف جهاز بالتوازي: {url: {profile: FetchResult}}"""
+        groups = self.fetch_groups(list(names or self.profiles))
+        for name in groups:
+            self.profile_fetcher(name)
+        return self.fetcher.run(self._fetch_matrix_async(list(urls), groups))
+
+    def describe(self, name, result):
+        """قياسات ملف جهاز واحد لرابط واحد"""
+        profile = self.profiles[name]
+        entry = {
+            'mobile': profile['mobile'],
+            'network': profile['network'] or 'unthrottled',
+            'status_code': result.status_code,
+            'load_time': round(result.elapsed, 3),
+            'page_size_kb': round(len(result.content) / 1024, 2),
+            'timing_breakdown': result.timings
+        }
+        if result.error is not None:
+            entry['error'] = result.error
+            return entry
+        if profile['network']:
+            secure = urlparse(result.url).scheme == 'https'
+            entry['simulated_load_time'] = simulate_throttled_time(result, NETWORK_PRESETS[profile['network']], secure)
+        return entry
+
+    def close(self):
+        for fetcher in self._fetchers.values():
+            fetcher.close()
+        self._fetchers = {}
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Single-pass DOM Extractor
+محرك استخراج يمر على شجرة الصفحة مرة واحدة ويطبق كل القواعد المسجلة
+"""
+
+from bs4 import NavigableString, Tag
+
+
+class Rule:
+    """قاعدة مطابقة بنفس دلالات find_all في BeautifulSoup"""
+
+    def __init__(self, key, name=None, attrs=None, string=None, within=None):
+        self.key = key
+        if isinstance(name, str):
+            name = [name]
+        self.names = set(name) if name else None
+        self.attrs = attrs or {}
+        self.string = string
+        self.within = within
+
+    def _match_value(self, value, match_against):
+        """مطابقة قيمة خاصية (مع دعم الخصائص متعددة القيم مثل class)"""
+        if isinstance(value, (list, tuple)):
+            if any(self._match_value(item, match_against) for item in value):
+                return True
+            return len(value) > 1 and self._match_value(' '.join(value), match_against)
+        if callable(match_against):
+            return bool(match_against(value))
+        return value == match_against
+
+    def matches_tag(self, tag):
+        for attr, match_against in self.attrs.items():
+            if not self._match_value(tag.get(attr), match_against):
+                return False
+        if self.string is not None:
+            tag_string = tag.string
+            if tag_string is None or not self.string(tag_string):
+                return False
+        return True
+
+
+class Extraction:
+    """نتائج المرور الواحد على الشجرة"""
+
+    def __init__(self, extractor):
+        self.matches = {rule.key: [] for rule in extractor.rules}
+        self.nested = {rule.key: [] for rule in extractor.rules if rule.within}
+
+    def all(self, key):
+        return self.matches[key]
+
+    def first(self, key):
+        found = self.matches[key]
+        return found[0] if found else None
+
+    def count(self, key):
+        return len(self.matches[key])
+
+    def inside(self, key, index):
+        """العناصر المطابقة داخل الحاوية رقم index"""
+        return self.nested[key][index]
+
+
+class DomExtractor:
+    def __init__(self):
+        self.rules = []
+        self._tag_rules = {}
+        self._any_tag_rules = []
+        self._text_rules = []
+
+    def add(self, key, name=None, attrs=None, string=None, within=None, **kwargs):
+        """تسجيل قاعدة عنصر (class_ يمكن تمريرها كما في find_all)"""
+        attrs = dict(attrs or {})
+        if 'class_' in kwargs:
+            attrs['class'] = kwargs.pop('class_')
+        attrs.update(kwargs)
+        rule = Rule(key, name=name, attrs=attrs, string=string, within=within)
+        self.rules.append(rule)
+        if rule.names is None:
+            self._any_tag_rules.append(rule)
+        else:
+            for tag_name in rule.names:
+                self._tag_rules.setdefault(tag_name, []).append(rule)
+        return self
+
+    def add_text(self, key, string, within=None):
+        """تسجيل قاعدة نص (مثل find_all(string=...))"""
+        rule = Rule(key, string=string, within=within)
+        self.rules.append(rule)
+        self._text_rules.append(rule)
+        return self
+
+    def _record(self, rule, node, result, open_containers):
+        if rule.within is None:
+            result.matches[rule.key].append(node)
+            return
+        containers = open_containers[rule.within]
+        if containers:
+            result.matches[rule.key].append(node)
+            nested = result.nested[rule.key]
+            for index in containers:
+                nested[index].append(node)
+
+    def run(self, soup):
+        """المرور على الشجرة مرة واحدة وملء كل النتائج"""
+        result = Extraction(self)
+        nested_keys = {}
+        for rule in self.rules:
+            if rule.within:
+                nested_keys.setdefault(rule.within, []).append(rule.key)
+        open_containers = {key: [] for key in nested_keys}
+        stack = [(iter(soup.contents), ())]
+
+        while stack:
+            children, opened = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+                for key in opened:
+                    open_containers[key].pop()
+                continue
+
+            if isinstance(node, Tag):
+                rules = self._tag_rules.get(node.name, [])
+                if self._any_tag_rules:
+                    rules = rules + self._any_tag_rules
+                matched = [rule for rule in rules if rule.matches_tag(node)]
+                opened_here = []
+                for rule in matched:
+                    self._record(rule, node, result, open_containers)
+                for rule in matched:
+                    if rule.key in nested_keys:
+                        # فتح حاوية جديدة لقواعد within داخل هذا العنصر
+                        for nested_key in nested_keys[rule.key]:
+                            result.nested[nested_key].append([])
+                        open_containers[rule.key].append(len(result.matches[rule.key]) - 1)
+                        opened_here.append(rule.key)
+                stack.append((iter(node.contents), opened_here))
+            elif isinstance(node, NavigableString):
+                for rule in self._text_rules:
+                    if rule.string(node):
+                        self._record(rule, node, result, open_containers)
+
+        return result
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Monte Carlo Funnel Engine
+تحويل قمع المحاكاة إلى مصفوفة انتقال لكل نوع مستخدم ومحاكاة ملايين الجلسات بـ NumPy
+"""
+
+import math
+import time
+
+import numpy as np
+
+USER_TYPES = ['new_visitor', 'returning_customer', 'bargain_hunter', 'brand_loyal']
+
+# نفس احتمالات القرار في simulate_user_session
+BRANCH_PROBABILITIES = {
+    'explore': 0.7,
+    'open_product': 0.8,
+    'add_to_cart': 0.6,
+    'start_checkout': 0.4,
+    'complete_checkout': 0.7
+}
+
+# المراحل المؤقتة بالترتيب (القمع بلا دورات، لذا كل جلسة تنتهي بعد عددها من الخطوات)
+HOMEPAGE = 0
+BROWSE = 1
+PRODUCT = 2
+CART = 3
+TRANSIENT_STATES = ['homepage', 'browse', 'product', 'cart']
+
+DEFAULT_BATCH_SIZE = 16384
+
+
+def wilson_interval(successes, total, z=1.96):
+    """فترة ثقة Wilson للنسبة (بالنسبة المئوية)"""
+    if total == 0:
+        return [0.0, 0.0]
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return [round(max(0.0, center - margin) * 100, 3), round(min(1.0, center + margin) * 100, 3)]
+
+
+class FunnelModel:
+    def __init__(self, site_profile, user_type_probabilities=None):
+        self.site_profile = site_profile
+        self.user_types = list(USER_TYPES)
+        probabilities = user_type_probabilities or {}
+        self.probabilities = {
+            user_type: {**BRANCH_PROBABILITIES, **probabilities.get(user_type, {})}
+            for user_type in self.user_types
+        }
+
+        # الحالات النهائية: (الاسم، نقطة التخلي، السبب، أعمق مرحلة وصلتها الجلسة، تحويل؟)
+        self.states = list(TRANSIENT_STATES)
+        self.outcomes = {}
+        transitions = [self._compile(self.probabilities[user_type]) for user_type in self.user_types]
+        self.matrices = np.stack([self._matrix(t) for t in transitions])
+        self.cumulative = np.cumsum(self.matrices, axis=2)
+        self.cumulative[:, :, -1] = 1.0
+
+    def _outcome(self, name, point, reason, depth, converted=False):
+        """تسجيل حالة نهائية (مرة واحدة) وإرجاع رقمها"""
+        if name not in self.outcomes:
+            self.outcomes[name] = {
+                'index': len(self.states),
+                'point': point,
+                'reason': reason,
+                'depth': depth,
+                'converted': converted
+            }
+            self.states.append(name)
+        return self.outcomes[name]['index']
+
+    def _compile(self, branch):
+        """بناء مصفوفة الانتقال من ملف الموقع واحتمالات القرار"""
+        profile = self.site_profile
+        transitions = {state: {} for state in range(len(TRANSIENT_STATES))}
+
+        def add(source, target, probability):
+            if probability > 0:
+                transitions[source][target] = transitions[source].get(target, 0.0) + probability
+
+        # الصفحة الرئيسية
+        if profile['homepage_error']:
+            add(HOMEPAGE, self._outcome('error_homepage', 'error', f"Technical error: {profile['homepage_error']}", 0), 1.0)
+        else:
+            add(HOMEPAGE, self._outcome('bounce', 'homepage', 'Bounced immediately', 1), 1 - branch['explore'])
+            if profile['browse_error']:
+                add(HOMEPAGE, self._outcome('error_browse', 'error', f"Technical error: {profile['browse_error']}", 1), branch['explore'])
+            else:
+                add(HOMEPAGE, BROWSE, branch['explore'])
+
+        # صفحة المنتجات
+        add(BROWSE, self._outcome('left_products', 'product_browse', 'Left products page', 2), 1 - branch['open_product'])
+        if not profile['product_count']:
+            add(BROWSE, self._outcome('no_products', 'product_browse', 'No products available', 2), branch['open_product'])
+        else:
+            for reason, share in profile['product_errors'].items():
+                add(BROWSE, self._outcome(f'error_product:{reason}', 'error', f'Technical error: {reason}', 2), branch['open_product'] * share)
+            add(BROWSE, PRODUCT, branch['open_product'] * (1 - sum(profile['product_errors'].values())))
+
+        # صفحة المنتج والإضافة للسلة (النتيجة تعتمد على المنتج المختار عشوائياً)
+        add(PRODUCT, self._outcome('no_intent', 'product_view', 'No purchase intent', 3), 1 - branch['add_to_cart'])
+        for reason, share in profile['add_to_cart_outcomes'].items():
+            if reason == 'success':
+                add(PRODUCT, CART, branch['add_to_cart'] * share)
+            else:
+                add(PRODUCT, self._outcome(f'cart_failed:{reason}', 'add_to_cart', reason, 4), branch['add_to_cart'] * share)
+
+        # السلة: من لا يبدأ الخروج لا يُسجل له سبب تخلٍ (نفس سلوك المحاكاة الحية)
+        add(CART, self._outcome('cart_idle', None, None, 4), 1 - branch['start_checkout'])
+        checkout = profile['checkout']
+        if checkout['ready']:
+            add(CART, self._outcome('converted', None, None, 5, converted=True), branch['start_checkout'] * branch['complete_checkout'])
+            add(CART, self._outcome('checkout_failed:', 'checkout', 'Missing checkout elements: ', 5), branch['start_checkout'] * (1 - branch['complete_checkout']))
+        else:
+            add(CART, self._outcome(f"checkout_failed:{checkout['issue']}", 'checkout', checkout['issue'], 5), branch['start_checkout'])
+
+        return transitions
+
+    def _matrix(self, transitions):
+        size = len(self.states)
+        matrix = np.zeros((size, size))
+        for source, targets in transitions.items():
+            for target, probability in targets.items():
+                matrix[source, target] = probability
+            if not targets:
+                matrix[source, source] = 1.0
+        for outcome in self.outcomes.values():
+            matrix[outcome['index'], outcome['index']] = 1.0
+        return matrix
+
+    def simulate(self, num_sessions, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+        """محاكاة الجلسات على دفعات وإرجاع عدد الجلسات لكل (نوع مستخدم، حالة نهائية)"""
+        rng = np.random.default_rng(seed)
+        num_types = len(self.user_types)
+        num_states = len(self.states)
+        counts = np.zeros((num_types, num_states), dtype=np.int64)
+
+        for start in range(0, num_sessions, batch_size):
+            size = min(batch_size, num_sessions - start)
+            user_types = rng.integers(0, num_types, size)
+            state = np.zeros(size, dtype=np.intp)
+            for _ in TRANSIENT_STATES:
+                thresholds = self.cumulative[user_types, state]
+                state = (rng.random(size)[:, None] >= thresholds).sum(axis=1)
+            counts += np.bincount(user_types * num_states + state, minlength=num_types * num_states).reshape(num_types, num_states)
+
+        return counts
+
+    def summarize(self, counts):
+        """نفس هياكل analyze_simulation_results مع فترات الثقة"""
+        totals = counts.sum(axis=0)
+        sessions = int(totals.sum())
+
+        def reached(depth):
+            return int(sum(totals[o['index']] for o in self.outcomes.values() if o['depth'] >= depth))
+
+        converted = int(totals[self.outcomes['converted']['index']]) if 'converted' in self.outcomes else 0
+
+        funnel = {
+            'homepage_visitors': sessions,
+            'product_browsers': reached(2),
+            'product_viewers': reached(3),
+            'cart_adders': reached(4),
+            'checkout_starters': reached(5),
+            'converted_users': converted
+        }
+        rates = {
+            'browse_rate': 'product_browsers',
+            'view_rate': 'product_viewers',
+            'cart_rate': 'cart_adders',
+            'checkout_rate': 'checkout_starters',
+            'conversion_rate': 'converted_users'
+        }
+        if sessions > 0:
+            for rate, key in rates.items():
+                funnel[rate] = round(funnel[key] / sessions * 100, 2)
+            funnel['confidence_intervals'] = {rate: wilson_interval(funnel[key], sessions) for rate, key in rates.items()}
+
+        abandonment_points = {}
+        abandonment_reasons = {}
+        for outcome in self.outcomes.values():
+            count = int(totals[outcome['index']])
+            if outcome['point'] is None or count == 0:
+                continue
+            abandonment_points[outcome['point']] = abandonment_points.get(outcome['point'], 0) + count
+            abandonment_reasons[outcome['reason']] = abandonment_reasons.get(outcome['reason'], 0) + count
+
+        friction_points = [
+            {'point': point, 'count': count, 'percentage': round((count / sessions) * 100, 2),
+             'confidence_interval': wilson_interval(count, sessions)}
+            for point, count in sorted(abandonment_points.items(), key=lambda x: x[1], reverse=True)
+        ]
+        reasons = [
+            {'reason': reason, 'count': count, 'percentage': round((count / sessions) * 100, 2),
+             'confidence_interval': wilson_interval(count, sessions)}
+            for reason, count in sorted(abandonment_reasons.items(), key=lambda x: x[1], reverse=True)
+        ]
+
+        per_user_type = {}
+        converted_index = self.outcomes['converted']['index'] if 'converted' in self.outcomes else None
+        for i, user_type in enumerate(self.user_types):
+            type_sessions = int(counts[i].sum())
+            type_converted = int(counts[i, converted_index]) if converted_index is not None else 0
+            per_user_type[user_type] = {
+                'sessions': type_sessions,
+                'converted_users': type_converted,
+                'conversion_rate': round(type_converted / type_sessions * 100, 2) if type_sessions else 0,
+                'confidence_interval': wilson_interval(type_converted, type_sessions)
+            }
+
+        return {
+            'conversion_funnel': funnel,
+            'friction_points': friction_points,
+            'abandonment_reasons': reasons,
+            'per_user_type': per_user_type
+        }
+
+    def run(self, num_sessions, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+        """محاكاة وتلخيص مع قياس الزمن"""
+        start_time = time.perf_counter()
+        counts = self.simulate(num_sessions, seed=seed, batch_size=batch_size)
+        summary = self.summarize(counts)
+        summary['elapsed_ms'] = round((time.perf_counter() - start_time) * 1000, 1)
+        return summary
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+DNM.EG HTML Parser Backends
+اختيار محلل HTML لكل تشغيل (html.parser / lxml / selectolax) بنفس واجهة BeautifulSoup
+"""
+
+import os
+
+from bs4 import BeautifulSoup, Comment, Doctype
+from bs4.builder import HTMLParserTreeBuilder
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+PARSER_ENV_VAR = 'DNMEG_HTML_PARSER'
+
+
+class LexborTreeBuilder(HTMLParserTreeBuilder):
+    """بناء شجرة BeautifulSoup من تحليل lexbor (selectolax)"""
+
+    NAME = 'selectolax'
+    ALTERNATE_NAMES = ['lexbor']
+    features = [NAME, 'lexbor', 'html', 'fast']
+
+    def feed(self, markup):
+        document = LexborHTMLParser(markup).root
+        if document is None:
+            return
+        soup = self.soup
+        stack = []
+        node = document.parent.first_child
+
+        while node is not None:
+            tag = node.tag
+            if tag == '-text':
+                soup.handle_data(node.text_content or '')
+            elif tag == '-comment':
+                soup.endData()
+                soup.handle_data(node.html[len('<!--'):-len('-->')])
+                soup.endData(Comment)
+            elif tag == '-doctype':
+                soup.endData()
+                soup.handle_data(node.html[len('<!DOCTYPE '):-1] if node.html else 'html')
+                soup.endData(Doctype)
+            else:
+                attrs = {name: ('' if value is None else value) for name, value in node.attributes.items()}
+                soup.handle_starttag(tag, None, None, attrs)
+                if node.first_child is not None:
+                    stack.append(node)
+                    node = node.first_child
+                    continue
+                soup.handle_endtag(tag)
+
+            # الصعود للأب عند انتهاء الأبناء
+            while node.next is None and stack:
+                node = stack.pop()
+                soup.handle_endtag(node.tag)
+            node = node.next
+
+
+def _html_parser_soup(markup):
+    return BeautifulSoup(markup, 'html.parser')
+
+
+def _lxml_soup(markup):
+    if lxml is None:
+        raise ValueError("Parser backend 'lxml' requires the lxml package")
+    return BeautifulSoup(markup, 'lxml')
+
+
+def _selectolax_soup(markup):
+    if LexborHTMLParser is None:
+        raise ValueError("Parser backend 'selectolax' requires the selectolax package")
+    return BeautifulSoup(markup, builder=LexborTreeBuilder())
+
+
+PARSER_BACKENDS = {
+    'html.parser': _html_parser_soup,
+    'lxml': _lxml_soup,
+    'selectolax': _selectolax_soup
+}
+
+_default_parser = os.environ.get(PARSER_ENV_VAR, 'html.parser')
+
+
+def available_parsers():
+    """المحللات المثبتة فعلياً في هذه البيئة"""
+    available = ['html.parser']
+    if lxml is not None:
+        available.append('lxml')
+    if LexborHTMLParser is not None:
+        available.append('selectolax')
+    return available
+
+
+def set_default_parser(name):
+    """تحديد المحلل الافتراضي لهذا التشغيل"""
+    global _default_parser
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name} (choose from {', '.join(PARSER_BACKENDS)})")
+    _default_parser = name
+
+
+def get_default_parser():
+    return _default_parser
+
+
+def make_soup(markup, parser=None):
+    """تحليل HTML بالمحلل المختار وإرجاع شجرة BeautifulSoup"""
+    name = parser or _default_parser
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name} (choose from {', '.join(PARSER_BACKENDS)})")
+    return PARSER_BACKENDS[name](markup)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+DNM.EG HTTP Archive
+تسجيل كل استجابة (الحالة والترويسات والمحتوى المضغوط) في SQLite ثم إعادة تشغيلها عبر نفس مسار الجلب بدون شبكة
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from multidict import CIMultiDict
+
+ARCHIVE_ENV_VAR = 'DNMEG_HTTP_ARCHIVE'
+ARCHIVE_MODE_ENV_VAR = 'DNMEG_HTTP_ARCHIVE_MODE'
+DEFAULT_ARCHIVE_PATH = 'dnmeg_http_archive.sqlite'
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# ترويسات الطلب التي تغير الاستجابة (ملف الجهاز، نوع المحتوى، الجلب الجزئي)
+KEY_HEADERS = ['User-Agent', 'Accept', 'Range']
+
+
+class HttpArchive:
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH, mode=REPLAY):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"unknown archive mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.stats = {'recorded': 0, 'replayed': 0, 'missing': 0}
+        self.missing = []
+        # الطلب نفسه قد يتكرر (عينات متعددة، ملفات أجهزة متشابهة): كل تكرار يُسجل ويُعاد بترتيبه
+        self._occurrences = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT,
+                occurrence INTEGER,
+                method TEXT,
+                url TEXT,
+                final_url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                elapsed REAL,
+                timings TEXT,
+                recorded_at REAL,
+                PRIMARY KEY (key, occurrence)
+            )
+        """)
+        # لا مسح هنا: عدة عمليات تسجل في نفس الأرشيف (replay_check يمسحه مرة واحدة قبل التسجيل)
+        self._db.commit()
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def key(self, method, url, headers):
+        return '\n'.join([method.upper(), url] + [headers.get(name, '') for name in KEY_HEADERS])
+
+    def _next_occurrence(self, key):
+        occurrence = self._occurrences.get(key, 0)
+        self._occurrences[key] = occurrence + 1
+        return occurrence
+
+    def record(self, method, url, headers, result):
+        """حفظ استجابة حقيقية (الأخطاء الشبكية لا تُسجل)"""
+        if result.error is not None:
+            return
+        key = self.key(method, url, headers)
+        with self._lock:
+            occurrence = self._next_occurrence(key)
+        row = (
+            key,
+            occurrence,
+            method.upper(),
+            url,
+            result.url,
+            result.status_code,
+            json.dumps(list(result.headers.items())),
+            zlib.compress(result.content, 6),
+            result.elapsed,
+            json.dumps(result.timings) if result.timings else None,
+            time.time()
+        )
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._db.commit()
+            self.stats['recorded'] += 1
+
+    def lookup(self, method, url, headers):
+        """الاستجابة المسجلة بنفس ترتيب التكرار (أو آخر تكرار مسجل) أو None"""
+        key = self.key(method, url, headers)
+        with self._lock:
+            occurrence = self._next_occurrence(key)
+            row = self._db.execute(
+                "SELECT final_url, status, headers, body, elapsed, timings FROM responses WHERE key = ? AND occurrence <= ? "
+                "ORDER BY occurrence DESC LIMIT 1",
+                (key, occurrence)
+            ).fetchone()
+            if row is None:
+                self.stats['missing'] += 1
+                self.missing.append(f'{method.upper()} {url}')
+                return None
+            self.stats['replayed'] += 1
+        final_url, status, headers_json, body, elapsed, timings = row
+        return {
+            'url': final_url,
+            'status': status,
+            'headers': CIMultiDict(json.loads(headers_json)),
+            'content': zlib.decompress(body),
+            'elapsed': elapsed,
+            'timings': json.loads(timings) if timings else None
+        }
+
+    def summary(self):
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()
+        return {'mode': self.mode, 'responses': count, 'compressed_kb': round(size / 1024, 1), **self.stats}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def get_default_archive():
+    """الأرشيف حسب DNMEG_HTTP_ARCHIVE_MODE (record / replay)، أو None للجلب الحي العادي"""
+    mode = os.environ.get(ARCHIVE_MODE_ENV_VAR, '')
+    if not mode:
+        return None
+    return HttpArchive(os.environ.get(ARCHIVE_ENV_VAR) or DEFAULT_ARCHIVE_PATH, mode)
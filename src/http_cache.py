@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+DNM.EG On-disk HTTP Cache
+تخزين الصفحات مع ETag / Last-Modified على القرص لإعادة التحقق بدل إعادة التنزيل
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from multidict import CIMultiDict
+
+CACHE_ENV_VAR = 'DNMEG_HTTP_CACHE'
+DEFAULT_CACHE_PATH = 'dnmeg_http_cache.sqlite'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def parse_max_age(headers):
+    """مدة الصلاحية بالثواني من Cache-Control (None = غير محددة)"""
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'(?:^|[,\s])max-age=(\d+)', cache_control)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+class HttpCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'revalidated': 0,
+            'stored': 0,
+            'evicted': 0
+        }
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                max_age REAL,
+                stored_at REAL,
+                last_access REAL,
+                size INTEGER
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._db.commit()
+
+    def key(self, url, headers):
+        """المفتاح = الرابط + User-Agent + Accept (نفس الرابط قد يعيد HTML أو JSON)"""
+        return '\n'.join([url, headers.get('User-Agent', ''), headers.get('Accept', '')])
+
+    def lookup(self, key):
+        """قراءة المدخل المخزن وتحديث وقت آخر استخدام"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, headers, body, etag, last_modified, max_age, stored_at FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+
+        url, status, headers, body, etag, last_modified, max_age, stored_at = row
+        return {
+            'url': url,
+            'status': status,
+            'headers': CIMultiDict(json.loads(headers)),
+            'content': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'max_age': max_age,
+            'stored_at': stored_at
+        }
+
+    def is_fresh(self, entry):
+        """هل ما زال المدخل صالحاً دون الرجوع للخادم؟"""
+        return entry['max_age'] is not None and time.time() - entry['stored_at'] < entry['max_age']
+
+    def validators(self, entry):
+        """ترويسات الطلب الشرطي"""
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, key, result):
+        """تخزين استجابة 200 قابلة لإعادة الاستخدام"""
+        if result.status_code != 200 or 'no-store' in result.headers.get('Cache-Control', '').lower():
+            return
+        etag = result.headers.get('ETag')
+        last_modified = result.headers.get('Last-Modified')
+        max_age = parse_max_age(result.headers)
+        if not etag and not last_modified and not max_age:
+            # لا يمكن إعادة التحقق منها ولا إعادة استخدامها
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, result.url, result.status_code, json.dumps(list(result.headers.items())), result.content,
+                 etag, last_modified, max_age, now, now, len(result.content))
+            )
+            self._db.commit()
+            self.stats['stored'] += 1
+        self.evict()
+
+    def refresh(self, key, not_modified):
+        """تحديث صلاحية المدخل بعد 304"""
+        max_age = parse_max_age(not_modified.headers)
+        with self._lock:
+            if max_age is None:
+                self._db.execute("UPDATE entries SET stored_at = ? WHERE key = ?", (time.time(), key))
+            else:
+                self._db.execute("UPDATE entries SET stored_at = ?, max_age = ? WHERE key = ?", (time.time(), max_age, key))
+            self._db.commit()
+
+    def size(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """حذف الأقدم استخداماً حتى يعود الحجم تحت الحد"""
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                self.stats['evicted'] += 1
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def get_default_cache():
+    """الكاش الافتراضي (DNMEG_HTTP_CACHE=مسار، أو فارغ لتعطيله)"""
+    path = os.environ.get(CACHE_ENV_VAR, DEFAULT_CACHE_PATH)
+    if not path:
+        return None
+    return HttpCache(path)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Shared HTTP Client
+طبقة جلب غير متزامنة مشتركة بين جميع أدوات التحليل
+"""
+
+import asyncio
+import atexit
+import threading
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+from multidict import CIMultiDict
+
+from http_archive import get_default_archive
+from http_cache import get_default_cache
+from rate_limiter import HostRateLimiter, LimiterChain, parse_retry_after
+from resilience import ARCHIVE_MISS_ERROR, CIRCUIT_OPEN_ERROR, CircuitBreaker, ErrorLedger, RetryPolicy, classify_failure
+from request_timing import make_trace_config, timing_breakdown
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+class FetchError(Exception):
+    """خطأ في جلب الصفحة"""
+
+
+class FetchResult:
+    """نتيجة طلب HTTP واحد"""
+
+    def __init__(self, url, status_code=0, headers=None, content=b'', elapsed=0.0, error=None, cache_status=None, timings=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers if headers is not None else CIMultiDict()
+        self.content = content
+        self.elapsed = elapsed
+        self.error = error
+        # None (بدون كاش) / 'hit' / 'revalidated' / 'miss'
+        self.cache_status = cache_status
+        # مراحل الطلب بالمللي ثانية (None للنتائج المخدومة من الكاش)
+        self.timings = timings
+        # عدد المحاولات حتى هذه النتيجة (مع إعادة المحاولة)
+        self.attempts = 1
+
+    @property
+    def ok(self):
+        return self.error is None and 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        """فك ترميز المحتوى حسب الـ charset المعلن"""
+        charset = 'utf-8'
+        content_type = self.headers.get('Content-Type', '')
+        if 'charset=' in content_type:
+            charset = content_type.split('charset=')[-1].split(';')[0].strip() or charset
+        try:
+            return self.content.decode(charset, errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.error is not None:
+            raise FetchError(f"{self.url}: {self.error}")
+        if self.status_code >= 400:
+            raise FetchError(f"{self.status_code} Error for url: {self.url}")
+
+
+class AsyncFetcher:
+    def __init__(self, user_agent=DEFAULT_USER_AGENT, per_host_limit=6, total_limit=32, timeout=10, cache=None, rate_limiter=None,
+                 retry_policy=None, circuit_breaker=None, ledger=None, archive=None):
+        self.headers = {'User-Agent': user_agent}
+        self.per_host_limit = per_host_limit
+        self.total_limit = total_limit
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.ledger = ledger
+        # أرشيف HTTP: تسجيل كل استجابة أو إعادة تشغيلها بدون شبكة
+        self.archive = archive
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._connector = None
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """تشغيل حلقة الأحداث في خيط خلفي عند أول استخدام"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='dnmeg-fetcher', daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro):
+        """تنفيذ coroutine على حلقة الجلب وانتظار النتيجة"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._connector = aiohttp.TCPConnector(limit=self.total_limit, limit_per_host=self.per_host_limit)
+            self._session = aiohttp.ClientSession(
+                connector=self._connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                trace_configs=[make_trace_config()]
+            )
+        return self._session
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def _request(self, session, url, headers, method='GET'):
+        """إرسال الطلب عبر قاطع الدائرة مع إعادة المحاولة وتسجيل كل فشل"""
+        attempt = 1
+        while True:
+            if self.circuit_breaker is not None and not self.circuit_breaker.allow(url):
+                # المضيف معطل: فشل فوري بدلاً من انتظار المهلة
+                result = FetchResult(url, error=CIRCUIT_OPEN_ERROR)
+            else:
+                result = await self._send(session, url, headers, method)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(url, result)
+            result.attempts = attempt
+
+            failed = classify_failure(result) is not None
+            retry = failed and self.retry_policy is not None and self.retry_policy.should_retry(method, result, attempt)
+            if failed and self.ledger is not None:
+                self.ledger.record(url, method, result, attempt, final=not retry)
+            if not retry:
+                return result
+            await asyncio.sleep(self.retry_policy.delay(attempt, parse_retry_after(result.headers)))
+            attempt += 1
+
+    def _replayed_result(self, url, method, request_headers):
+        entry = self.archive.lookup(method, url, request_headers)
+        if entry is None:
+            return FetchResult(url, error=ARCHIVE_MISS_ERROR)
+        return FetchResult(
+            entry['url'],
+            status_code=entry['status'],
+            headers=entry['headers'],
+            content=entry['content'],
+            elapsed=entry['elapsed'],
+            timings=entry['timings']
+        )
+
+    async def _send(self, session, url, headers, method='GET'):
+        if self.archive is not None and self.archive.replaying:
+            return self._replayed_result(url, method, {**self.headers, **(headers or {})})
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(url)
+        marks = {}
+        start_time = time.perf_counter_ns()
+        try:
+            async with session.request(method, url, headers=headers, trace_request_ctx=marks) as response:
+                content = await response.read()
+                marks['body_end'] = time.perf_counter_ns()
+                result = FetchResult(
+                    str(response.url),
+                    status_code=response.status,
+                    headers=CIMultiDict(response.headers),
+                    content=content,
+                    elapsed=(marks['body_end'] - start_time) / 1e9,
+                    timings=timing_breakdown(marks)
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result = FetchResult(url, elapsed=(time.perf_counter_ns() - start_time) / 1e9, error=str(e) or e.__class__.__name__)
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(url, result)
+        if self.archive is not None:
+            self.archive.record(method, url, {**self.headers, **(headers or {})}, result)
+        return result
+
+    async def fetch_async(self, url, headers=None, use_cache=True, method='GET'):
+        """جلب رابط واحد دون حجز الخيط"""
+        session = await self._get_session()
+        cache = self.cache if use_cache and method == 'GET' else None
+        async with self._host_semaphore(url):
+            if cache is None:
+                result = await self._request(session, url, headers, method)
+                if self.cache is not None and method == 'GET' and result.error is None:
+                    # القياس البارد يتجاوز الكاش لكن يحدّث محتواه
+                    self.cache.store(self.cache.key(url, {**self.headers, **(headers or {})}), result)
+                return result
+
+            key = cache.key(url, {**self.headers, **(headers or {})})
+            entry = cache.lookup(key)
+            if entry is not None and cache.is_fresh(entry):
+                cache.stats['hits'] += 1
+                return self._cached_result(entry, 'hit')
+
+            request_headers = dict(headers or {})
+            if entry is not None:
+                request_headers.update(cache.validators(entry))
+            result = await self._request(session, url, request_headers)
+
+            if entry is not None and result.status_code == 304:
+                cache.stats['revalidated'] += 1
+                cache.refresh(key, result)
+                return self._cached_result(entry, 'revalidated', elapsed=result.elapsed)
+
+            cache.stats['misses'] += 1
+            result.cache_status = 'miss'
+            if result.error is None:
+                cache.store(key, result)
+            return result
+
+    async def fetch_stream_async(self, url, on_chunk, headers=None, chunk_size=65536):
+        """جلب ملف كبير على دفعات دون تحميله كاملاً في الذاكرة (بدون كاش)"""
+        request_headers = {**self.headers, **(headers or {})}
+        if self.archive is not None and self.archive.replaying:
+            result = self._replayed_result(url, 'GET', request_headers)
+            if result.status_code < 400:
+                for i in range(0, len(result.content), chunk_size):
+                    on_chunk(result.content[i:i + chunk_size])
+            result.content = b''
+            return result
+        # التسجيل يحتاج المحتوى كاملاً لحفظه
+        recorded = [] if self.archive is not None else None
+
+        session = await self._get_session()
+        async with self._host_semaphore(url):
+            if self.circuit_breaker is not None and not self.circuit_breaker.allow(url):
+                return FetchResult(url, error=CIRCUIT_OPEN_ERROR)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(url)
+            start_time = time.perf_counter_ns()
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status < 400:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            on_chunk(chunk)
+                            if recorded is not None:
+                                recorded.append(chunk)
+                    result = FetchResult(
+                        str(response.url),
+                        status_code=response.status,
+                        headers=CIMultiDict(response.headers),
+                        elapsed=(time.perf_counter_ns() - start_time) / 1e9
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result = FetchResult(url, elapsed=(time.perf_counter_ns() - start_time) / 1e9, error=str(e) or e.__class__.__name__)
+            if self.rate_limiter is not None:
+                self.rate_limiter.observe(url, result)
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record(url, result)
+            if self.ledger is not None and classify_failure(result) is not None:
+                self.ledger.record(url, 'GET', result, 1, final=True)
+            if recorded is not None:
+                result.content = b''.join(recorded)
+                self.archive.record('GET', url, request_headers, result)
+                result.content = b''
+            return result
+
+    def _cached_result(self, entry, cache_status, elapsed=0.0):
+        return FetchResult(
+            entry['url'],
+            status_code=entry['status'],
+            headers=entry['headers'],
+            content=entry['content'],
+            elapsed=elapsed,
+            cache_status=cache_status
+        )
+
+    async def fetch_many_async(self, urls, headers=None, use_cache=True, method='GET'):
+        return await asyncio.gather(*(self.fetch_async(url, headers=headers, use_cache=use_cache, method=method) for url in urls))
+
+    def fetch(self, url, headers=None, use_cache=True, method='GET'):
+        """جلب رابط واحد (واجهة متزامنة)"""
+        result = self.run(self.fetch_async(url, headers=headers, use_cache=use_cache, method=method))
+        if result.error is not None:
+            raise FetchError(f"{url}: {result.error}")
+        return result
+
+    def fetch_many(self, urls, headers=None, use_cache=True, method='GET'):
+        """جلب عدة روابط بالتوازي مع حد أقصى لكل مضيف"""
+        return self.run(self.fetch_many_async(list(urls), headers=headers, use_cache=use_cache, method=method))
+
+    def scoped(self, rate_limiter=None, fresh_connections=False):
+        """جلسة مستقلة (كوكيز خاصة) تشارك الاتصالات وحدود المضيف والكاش"""
+        return ScopedFetcher(self, rate_limiter=rate_limiter, fresh_connections=fresh_connections)
+
+    def close(self):
+        """إغلاق الجلسة وإيقاف حلقة الأحداث"""
+        if self._loop is None:
+            return
+        if self._session is not None and not self._session.closed:
+            self.run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._connector = None
+        self._host_semaphores = {}
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+
+class ScopedFetcher(AsyncFetcher):
+    """جلسة مستخدم منفصلة فوق طبقة جلب مشتركة"""
+
+    def __init__(self, parent, rate_limiter=None, fresh_connections=False):
+        super().__init__(
+            per_host_limit=parent.per_host_limit,
+            total_limit=parent.total_limit,
+            timeout=parent.timeout,
+            cache=parent.cache,
+            # حد الجلسة (إن وجد) يُطبق فوق سياسة المضيف المشتركة
+            rate_limiter=LimiterChain([rate_limiter, parent.rate_limiter]) if rate_limiter else parent.rate_limiter,
+            retry_policy=parent.retry_policy,
+            circuit_breaker=parent.circuit_breaker,
+            ledger=parent.ledger,
+            archive=parent.archive
+        )
+        self.session_limiter = rate_limiter
+        self.headers = dict(parent.headers)
+        self.parent = parent
+        # اتصال جديد (DNS + TCP + TLS) لكل طلب لقياسات "باردة"
+        self.fresh_connections = fresh_connections
+
+    def _ensure_loop(self):
+        return self.parent._ensure_loop()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            if self.fresh_connections:
+                connector = aiohttp.TCPConnector(force_close=True, use_dns_cache=False)
+            else:
+                await self.parent._get_session()
+                connector = self.parent._connector
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                connector_owner=self.fresh_connections,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                trace_configs=[make_trace_config()]
+            )
+        return self._session
+
+    def _host_semaphore(self, url):
+        return self.parent._host_semaphore(url)
+
+    def scoped(self, rate_limiter=None, fresh_connections=False):
+        return self.parent.scoped(rate_limiter=rate_limiter or self.session_limiter, fresh_connections=fresh_connections)
+
+    def close(self):
+        """إغلاق جلسة الكوكيز فقط (الاتصالات والكاش ملك الطبقة الأم)"""
+        if self._session is not None and not self._session.closed:
+            self.run(self._session.close())
+        self._session = None
+
+
+_shared_fetcher = None
+
+
+def get_shared_fetcher():
+    """الحصول على طبقة الجلب المشتركة لهذا التشغيل"""
+    global _shared_fetcher
+    if _shared_fetcher is None:
+        archive = get_default_archive()
+        _shared_fetcher = AsyncFetcher(
+            # التسجيل وإعادة التشغيل يحتاجان استجابات كاملة (بدون 304 من الكاش)
+            cache=get_default_cache() if archive is None else None,
+            rate_limiter=HostRateLimiter(),
+            retry_policy=RetryPolicy(),
+            circuit_breaker=CircuitBreaker(),
+            ledger=ErrorLedger(),
+            archive=archive
+        )
+        atexit.register(_shared_fetcher.close)
+    return _shared_fetcher
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Inventory Snapshots
+سلسلة زمنية لتوافر المنتجات والمتغيرات كخرائط بت: تُحفظ الفروق فقط (XOR) ويُستخرج منها النفاد وإعادة التخزين والمخزون المنخفض
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+SNAPSHOTS_ENV_VAR = 'DNMEG_INVENTORY_SNAPSHOTS'
+DEFAULT_SNAPSHOTS_PATH = 'dnmeg_inventory_snapshots.sqlite'
+
+# البت 0 = المنتج نفسه، والبتات التالية = المتغيرات بترتيب أول ظهور
+PRODUCT_BIT = 1
+
+SOLD_OUT = 'sold_out'
+RESTOCKED = 'restocked'
+LOW_STOCK = 'low_stock'
+VARIANT_SOLD_OUT = 'variant_sold_out'
+VARIANT_RESTOCKED = 'variant_restocked'
+NEW_PRODUCT = 'new_product'
+
+# أيام المخزون التي تغطيها كمية إعادة التخزين المقترحة
+RESTOCK_COVER_DAYS = 14
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)) if timestamp else None
+
+
+def _to_blob(bitmap):
+    return bitmap.to_bytes(max(1, (bitmap.bit_length() + 7) // 8), 'little')
+
+
+def _from_blob(blob):
+    return int.from_bytes(blob, 'little') if blob else 0
+
+
+def _json_variants(variants):
+    return json.dumps(variants, ensure_ascii=False)
+
+
+def _load_variants(variants_json):
+    return json.loads(variants_json) if variants_json else []
+
+
+def variant_key(option_label, variant):
+    """معرف المتغير (value) ثابت بينما نصه يتغير ("M - Sold out")"""
+    return str(variant.get('value') or option_label)
+
+
+def snapshot_bitmap(stock_info, variants):
+    """خريطة بت التوافر للقطة واحدة؛ variants تُمدد بالمتغيرات الجديدة (مواضع البتات لا تتغير)"""
+    bitmap = PRODUCT_BIT if stock_info.get('in_stock') and not stock_info.get('out_of_stock') else 0
+    positions = {key: index for index, (key, _) in enumerate(variants)}
+    for label, variant in stock_info.get('variant_availability', {}).items():
+        key = variant_key(label, variant)
+        if key not in positions:
+            positions[key] = len(variants)
+            variants.append([key, label])
+        if variant.get('available'):
+            bitmap |= 1 << (positions[key] + 1)
+    return bitmap
+
+
+def diff_snapshots(product_url, previous, current, variants, taken_at):
+    """انتقالات التوافر بين لقطتين متتاليتين.
+    previous و current = (bitmap, quantity, low_stock)، و previous = None لمنتج جديد"""
+    at = format_time(taken_at)
+    bitmap, quantity, low_stock = current
+    if previous is None:
+        events = [{'type': NEW_PRODUCT, 'product_url': product_url, 'variant': None, 'at': at, 'quantity': quantity}]
+        if low_stock:
+            events.append({'type': LOW_STOCK, 'product_url': product_url, 'variant': None, 'at': at, 'quantity': quantity})
+        return events
+
+    events = []
+    previous_bitmap, _, previous_low = previous
+    changed = previous_bitmap ^ bitmap
+    if changed & PRODUCT_BIT:
+        events.append({
+            'type': RESTOCKED if bitmap & PRODUCT_BIT else SOLD_OUT,
+            'product_url': product_url, 'variant': None, 'at': at, 'quantity': quantity
+        })
+    for index, (_, label) in enumerate(variants):
+        bit = 1 << (index + 1)
+        if changed & bit:
+            events.append({
+                'type': VARIANT_RESTOCKED if bitmap & bit else VARIANT_SOLD_OUT,
+                'product_url': product_url, 'variant': label, 'at': at, 'quantity': None
+            })
+    if low_stock and not previous_low and bitmap & PRODUCT_BIT:
+        events.append({'type': LOW_STOCK, 'product_url': product_url, 'variant': None, 'at': at, 'quantity': quantity})
+    return events
+
+
+class InventorySnapshotStore:
+    def __init__(self, path=DEFAULT_SNAPSHOTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                product_id INTEGER PRIMARY KEY,
+                product_url TEXT UNIQUE,
+                variants TEXT,
+                bitmap BLOB,
+                quantity INTEGER,
+                low_stock INTEGER,
+                first_seen REAL,
+                last_snapshot REAL
+            );
+            CREATE TABLE IF NOT EXISTS deltas (
+                product_id INTEGER,
+                taken_at REAL,
+                changed BLOB,
+                quantity INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS deltas_product ON deltas (product_id, taken_at);
+            CREATE TABLE IF NOT EXISTS events (
+                product_url TEXT,
+                variant TEXT,
+                type TEXT,
+                taken_at REAL,
+                quantity INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS events_product ON events (product_url, type, taken_at);
+            CREATE TABLE IF NOT EXISTS snapshots (
+                taken_at REAL PRIMARY KEY,
+                products INTEGER,
+                changed INTEGER
+            );
+        """)
+        self._db.commit()
+
+    def record(self, all_stock_info, taken_at=None, catalog=True):
+        """حفظ لقطة لكل المنتجات (الفروق فقط) وإرجاع الانتقالات مقارنة باللقطة السابقة.
+        catalog=False لفحص جزئي (دفعة من مراقب المخزون): تُحفظ الفروق والأحداث بدون صف في snapshots،
+        فيبقى snapshot_interval فاصل لقطات الكتالوج الكاملة"""
+        taken_at = taken_at or time.time()
+        transitions = []
+        changed_products = 0
+        with self._lock:
+            for stock_info in all_stock_info:
+                product_url = stock_info['product_url']
+                # النافد = صفر، والكمية غير المعروضة = None (لا تدخل في حساب معدل البيع)
+                quantity = 0 if stock_info.get('out_of_stock') else (stock_info.get('stock_quantity') or None)
+                low_stock = bool(stock_info.get('low_stock_warning'))
+                row = self._db.execute(
+                    "SELECT product_id, variants, bitmap, quantity, low_stock FROM products WHERE product_url = ?", (product_url,)
+                ).fetchone()
+
+                if row is None:
+                    variants = []
+                    bitmap = snapshot_bitmap(stock_info, variants)
+                    cursor = self._db.execute(
+                        "INSERT INTO products (product_url, variants, bitmap, quantity, low_stock, first_seen, last_snapshot) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (product_url, _json_variants(variants), _to_blob(bitmap), quantity, int(low_stock), taken_at, taken_at)
+                    )
+                    product_id = cursor.lastrowid
+                    previous = None
+                    delta = bitmap
+                else:
+                    product_id, variants_json, previous_blob, previous_quantity, previous_low = row
+                    variants = _load_variants(variants_json)
+                    bitmap = snapshot_bitmap(stock_info, variants)
+                    previous = (_from_blob(previous_blob), previous_quantity, bool(previous_low))
+                    delta = previous[0] ^ bitmap
+                    self._db.execute(
+                        "UPDATE products SET variants = ?, bitmap = ?, quantity = ?, low_stock = ?, last_snapshot = ? WHERE product_id = ?",
+                        (_json_variants(variants), _to_blob(bitmap), quantity, int(low_stock), taken_at, product_id)
+                    )
+
+                # اللقطة الأولى دلتا من الصفر؛ بعدها يُكتب صف فقط عند تغير التوافر أو الكمية
+                if previous is None or delta or quantity != previous[1]:
+                    self._db.execute(
+                        "INSERT INTO deltas VALUES (?, ?, ?, ?)", (product_id, taken_at, _to_blob(delta), quantity)
+                    )
+                    changed_products += 1
+
+                events = diff_snapshots(product_url, previous, (bitmap, quantity, low_stock), variants, taken_at)
+                for event in events:
+                    self._db.execute(
+                        "INSERT INTO events VALUES (?, ?, ?, ?, ?)",
+                        (event['product_url'], event['variant'], event['type'], taken_at, event['quantity'])
+                    )
+                transitions.extend(event for event in events if event['type'] != NEW_PRODUCT)
+
+            if catalog:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (taken_at, len(all_stock_info), changed_products)
+                )
+            self._db.commit()
+        return transitions
+
+    def history(self, product_url):
+        """إعادة بناء السلسلة الزمنية من الفروق: [(الوقت، متوفر، {المتغير: متوفر}، الكمية)]"""
+        with self._lock:
+            row = self._db.execute("SELECT product_id, variants FROM products WHERE product_url = ?", (product_url,)).fetchone()
+            if row is None:
+                return []
+            deltas = self._db.execute(
+                "SELECT taken_at, changed, quantity FROM deltas WHERE product_id = ? ORDER BY taken_at", (row[0],)
+            ).fetchall()
+        variants = _load_variants(row[1])
+        bitmap = 0
+        series = []
+        for taken_at, changed, quantity in deltas:
+            bitmap ^= _from_blob(changed)
+            series.append((
+                format_time(taken_at),
+                bool(bitmap & PRODUCT_BIT),
+                {label: bool(bitmap & (1 << (index + 1))) for index, (_, label) in enumerate(variants)},
+                quantity
+            ))
+        return series
+
+    def last_event(self, product_url, event_type):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(taken_at) FROM events WHERE product_url = ? AND type = ? AND variant IS NULL",
+                (product_url, event_type)
+            ).fetchone()
+        return row[0] if row else None
+
+    def events(self, since=None, types=None):
+        query = "SELECT product_url, variant, type, taken_at, quantity FROM events WHERE taken_at >= ?"
+        params = [since or 0]
+        if types:
+            query += f" AND type IN ({', '.join('?' for _ in types)})"
+            params.extend(types)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY taken_at", params).fetchall()
+        return [
+            {'type': kind, 'product_url': url, 'variant': variant, 'at': format_time(taken_at), 'quantity': quantity}
+            for url, variant, kind, taken_at, quantity in rows
+        ]
+
+    def depletion_rate(self, product_url):
+        """متوسط الوحدات المباعة يومياً من انخفاضات الكمية المرصودة، أو None بدون بيانات كافية"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT d.taken_at, d.quantity FROM deltas d JOIN products p ON p.product_id = d.product_id "
+                "WHERE p.product_url = ? AND d.quantity IS NOT NULL ORDER BY d.taken_at",
+                (product_url,)
+            ).fetchall()
+        if len(rows) < 2:
+            return None
+        sold = sum(max(0, previous[1] - current[1]) for previous, current in zip(rows, rows[1:]))
+        days = (rows[-1][0] - rows[0][0]) / 86400
+        if sold == 0 or days <= 0:
+            return None
+        return sold / days
+
+    def suggested_quantity(self, product_url, cover_days=RESTOCK_COVER_DAYS):
+        rate = self.depletion_rate(product_url)
+        return math.ceil(rate * cover_days) if rate else None
+
+    def snapshot_interval(self):
+        """الفاصل الوسيط بين اللقطات بالثواني، أو None قبل اللقطة الثانية"""
+        with self._lock:
+            times = [row[0] for row in self._db.execute("SELECT taken_at FROM snapshots ORDER BY taken_at DESC LIMIT 100")]
+        gaps = sorted(newer - older for newer, older in zip(times, times[1:]))
+        return gaps[len(gaps) // 2] if gaps else None
+
+    def summary(self):
+        with self._lock:
+            products, deltas, events, snapshots = self._db.execute(
+                "SELECT (SELECT COUNT(*) FROM products), (SELECT COUNT(*) FROM deltas), "
+                "(SELECT COUNT(*) FROM events), (SELECT COUNT(*) FROM snapshots)"
+            ).fetchone()
+        return {'products': products, 'snapshots': snapshots, 'delta_rows': deltas, 'events': events}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_snapshot_store = None
+
+
+def get_snapshot_store():
+    """مخزن لقطات المخزون المشترك (DNMEG_INVENTORY_SNAPSHOTS=مسار، أو فارغ لمخزن في الذاكرة فقط)"""
+    global _snapshot_store
+    if _snapshot_store is None:
+        path = os.environ.get(SNAPSHOTS_ENV_VAR, DEFAULT_SNAPSHOTS_PATH)
+        _snapshot_store = InventorySnapshotStore(path or ':memory:')
+    return _snapshot_store
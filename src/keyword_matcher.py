@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Keyword Matcher
+مطابقة عدة قوائم كلمات في مرور واحد على النص (Aho-Corasick) مع حدود الكلمات والسوابق واللواحق العربية
+"""
+
+import re
+from collections import deque
+
+# تشكيل وتطويل تُحذف، وأشكال الحروف تُوحد قبل المطابقة
+_ARABIC_NORMALIZATION = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ة': 'ه', 'ؤ': 'و', 'ئ': 'ي',
+    'ـ': None,
+    **{chr(code): None for code in range(0x064B, 0x0653)}
+})
+
+# حروف وأدوات تلتصق بأول الكلمة العربية (و/ف/ب/ل/ك + ال)
+ARABIC_PROCLITICS = {'و', 'ف', 'ب', 'ل', 'ك', 'ال', 'وال', 'فال', 'بال', 'كال', 'لل', 'ولل', 'فلل'}
+
+# لواحق التأنيث والجمع والضمائر (بعد التوحيد: ة ← ه)
+ARABIC_SUFFIXES = {'ه', 'ات', 'ين', 'ون', 'ي', 'ها', 'هم', 'ك', 'نا'}
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """أحرف صغيرة، توحيد الحروف العربية، ومسافة واحدة بين الكلمات"""
+    return _WHITESPACE.sub(' ', text.lower().translate(_ARABIC_NORMALIZATION)).strip()
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _is_arabic(char):
+    return '؀' <= char <= 'ۿ'
+
+
+class KeywordMatcher:
+    """آلة Aho-Corasick: كل عبارة لها وسم (مثل positive أو sizing_problems)،
+    والعبارة المنتهية بـ * تطابق أي كلمة تبدأ بها (love* = love / loved / lovely)"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        # (العبارة، الوسم، الطول، مطابقة البادئة)
+        self._patterns = []
+        self._built = False
+
+    def add(self, phrase, label):
+        prefix = phrase.endswith('*')
+        normalized = normalize_text(phrase.rstrip('*'))
+        if not normalized:
+            return self
+        node = 0
+        for char in normalized:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._outputs[node].append(len(self._patterns))
+        self._patterns.append((phrase.rstrip('*'), label, len(normalized), prefix))
+        self._built = False
+        return self
+
+    def add_lexicon(self, lexicon):
+        """{الوسم: [العبارات]}"""
+        for label, phrases in lexicon.items():
+            for phrase in phrases:
+                self.add(phrase, label)
+        return self
+
+    def build(self):
+        """حساب روابط الفشل بالعرض (BFS) ودمج المخرجات"""
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+        while queue:
+            current = queue.popleft()
+            for char, child in self._goto[current].items():
+                queue.append(child)
+                fallback = self._fail[current]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+        self._built = True
+        return self
+
+    def _ends_word(self, text, end, arabic):
+        if end == len(text) or not _is_word_char(text[end]):
+            return True
+        if not arabic:
+            return False
+        # لاحقة عربية ملتصقة: "ممتازة" / "مقاسات" / "سعرها"
+        word_end = end
+        while word_end < len(text) and _is_word_char(text[word_end]):
+            word_end += 1
+        return text[end:word_end] in ARABIC_SUFFIXES
+
+    def _starts_word(self, text, start, arabic):
+        if start == 0 or not _is_word_char(text[start - 1]):
+            return True
+        if not arabic:
+            return False
+        # سابقة عربية ملتصقة: "بالمقاس" / "والتوصيل" / "للشحن"
+        word_start = start
+        while word_start > 0 and _is_word_char(text[word_start - 1]):
+            word_start -= 1
+        return text[word_start:start] in ARABIC_PROCLITICS
+
+    def find(self, text, normalized=False):
+        """كل المطابقات عند حدود الكلمات: [(start, end, phrase, label)] (المواضع في النص الموحد)"""
+        if not self._built:
+            self.build()
+        if not normalized:
+            text = normalize_text(text)
+        matches = []
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern_id in self._outputs[node]:
+                phrase, label, length, prefix = self._patterns[pattern_id]
+                start = i - length + 1
+                end = i + 1
+                arabic = _is_arabic(text[start])
+                if not prefix and not self._ends_word(text, end, arabic):
+                    continue
+                if not self._starts_word(text, start, arabic):
+                    continue
+                matches.append((start, end, phrase, label))
+        return matches
+
+    def classify(self, text):
+        """العبارات المطابقة لكل وسم (بدون تكرار وبترتيب الظهور)"""
+        found = {}
+        for _, _, phrase, label in self.find(text):
+            phrases = found.setdefault(label, [])
+            if phrase not in phrases:
+                phrases.append(phrase)
+        return found
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Load Tester
+توليد حمل بمعدل طلبات ثابت (حلقة مفتوحة) مع مدرج زمني ثابت الذاكرة ومعدلات الأخطاء والإنتاجية عبر الزمن
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from array import array
+from collections import Counter
+from urllib.parse import urlparse
+
+from http_client import AsyncFetcher
+
+
+class LatencyHistogram:
+    """مدرج لوغاريتمي-خطي على طريقة HdrHistogram: ذاكرة ثابتة ودقة نسبية ثابتة"""
+
+    def __init__(self, highest_us=60 * 1000 * 1000, significant_digits=2):
+        self.highest_us = highest_us
+        sub_bucket_count = 2 ** math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_half_count = sub_bucket_count // 2
+        self.sub_bucket_half_magnitude = int(math.log2(self.sub_bucket_half_count))
+        self.sub_bucket_mask = sub_bucket_count - 1
+
+        buckets = 1
+        smallest_untrackable = sub_bucket_count
+        while smallest_untrackable <= highest_us:
+            smallest_untrackable <<= 1
+            buckets += 1
+        self.counts = array('q', [0]) * ((buckets + 1) * self.sub_bucket_half_count)
+        self.total = 0
+        self.min_us = None
+        self.max_us = 0
+        self.sum_us = 0
+
+    def _index(self, value):
+        bucket_index = (value | self.sub_bucket_mask).bit_length() - (self.sub_bucket_half_magnitude + 1)
+        sub_bucket_index = value >> bucket_index
+        return ((bucket_index + 1) << self.sub_bucket_half_magnitude) + (sub_bucket_index - self.sub_bucket_half_count)
+
+    def _value_at(self, index):
+        """أعلى قيمة مكافئة للخانة index"""
+        bucket_index = (index >> self.sub_bucket_half_magnitude) - 1
+        sub_bucket_index = (index & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self.sub_bucket_half_count
+            bucket_index = 0
+        return (sub_bucket_index << bucket_index) + (1 << bucket_index) - 1
+
+    def record(self, value_us):
+        value = max(0, min(int(value_us), self.highest_us))
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.sum_us += value
+        self.max_us = max(self.max_us, value)
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+
+    def percentile(self, q):
+        """القيمة (µs) التي تقع تحتها q% من العينات"""
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(q / 100 * self.total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value_at(index), self.max_us)
+        return self.max_us
+
+    def summary_ms(self):
+        if not self.total:
+            return {'count': 0}
+        return {
+            'count': self.total,
+            'min': round(self.min_us / 1000, 2),
+            'mean': round(self.sum_us / self.total / 1000, 2),
+            'p50': round(self.percentile(50) / 1000, 2),
+            'p90': round(self.percentile(90) / 1000, 2),
+            'p99': round(self.percentile(99) / 1000, 2),
+            'p99.9': round(self.percentile(99.9) / 1000, 2),
+            'max': round(self.max_us / 1000, 2)
+        }
+
+
+def url_mix_from_catalog(analysis_path='dnmeg_analysis.json', base_url=None):
+    """مزيج الروابط من نتيجة DNMScraper (الصفحة الرئيسية + المنتجات)"""
+    with open(analysis_path, encoding='utf-8') as f:
+        analysis = json.load(f)
+    urls = [product['url'] for product in analysis.get('products', []) if product.get('url')]
+    mix = Counter(urls)
+    if base_url:
+        # الصفحة الرئيسية تأخذ وزناً يساوي كل المنتجات معاً
+        mix[base_url] += max(1, len(urls))
+    return dict(mix)
+
+
+def url_mix_from_journeys(journey_path='dnmeg_user_behavior_analysis.json'):
+    """مزيج الروابط من رحلات محاكي السلوك (وزن كل رابط = عدد زياراته)"""
+    with open(journey_path, encoding='utf-8') as f:
+        journeys = json.load(f)
+    mix = Counter()
+    for session in journeys.get('user_sessions', []):
+        for step in session.get('journey_steps', []):
+            if step.get('url') and step.get('action') != 'add_to_cart':
+                mix[step['url']] += 1
+    return dict(mix)
+
+
+class LoadTester:
+    def __init__(self, url_mix, max_connections=256, timeout=30, user_agent=None):
+        if not url_mix:
+            raise ValueError("url_mix is empty")
+        self.urls = list(url_mix)
+        self.weights = [url_mix[url] for url in self.urls]
+        # طبقة جلب مستقلة بحدود اتصالات عالية وبدون كاش
+        fetcher_options = {'per_host_limit': max_connections, 'total_limit': max_connections, 'timeout': timeout}
+        if user_agent:
+            fetcher_options['user_agent'] = user_agent
+        self.fetcher = AsyncFetcher(**fetcher_options)
+
+    async def _one_request(self, url, scheduled_ns, start_ns, result):
+        response = await self.fetcher.fetch_async(url, use_cache=False)
+        done_ns = time.perf_counter_ns()
+        second = int((done_ns - start_ns) // 1e9)
+        window = result['windows'].setdefault(second, {
+            'completed': 0,
+            'errors': 0,
+            'latency': LatencyHistogram(significant_digits=1)
+        })
+
+        # الكمون من الموعد المقرر (يشمل الانتظار في الطابور) + زمن الخدمة الفعلي
+        latency_us = (done_ns - scheduled_ns) / 1000
+        result['latency'].record(latency_us)
+        result['service_time'].record(response.elapsed * 1e6)
+        window['latency'].record(latency_us)
+        window['completed'] += 1
+
+        if response.error is not None or response.status_code >= 400:
+            key = response.error.split(':')[0] if response.error else f'HTTP {response.status_code}'
+            result['errors'][key] += 1
+            window['errors'] += 1
+        result['status_codes'][response.status_code] += 1
+
+    async def _run_async(self, rps, duration, seed):
+        rng = random.Random(seed)
+        total_requests = int(rps * duration)
+        interval_ns = 1e9 / rps
+        result = {
+            'latency': LatencyHistogram(),
+            'service_time': LatencyHistogram(),
+            'windows': {},
+            'errors': Counter(),
+            'status_codes': Counter(),
+            'max_lag_ms': 0.0
+        }
+
+        # الطلبات الجارية فقط: الذاكرة تتبع التزامن لا rps × المدة
+        tasks = set()
+        failures = []
+
+        def finished(task):
+            tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                failures.append(task.exception())
+
+        start_ns = time.perf_counter_ns()
+        for i in range(total_requests):
+            scheduled_ns = start_ns + i * interval_ns
+            delay = (scheduled_ns - time.perf_counter_ns()) / 1e9
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # المولد متأخر عن الجدول (تأخر حلقة الأحداث نفسها)
+                result['max_lag_ms'] = max(result['max_lag_ms'], -delay * 1000)
+            # حلقة مفتوحة: لا ننتظر انتهاء الطلب السابق قبل إرسال التالي
+            url = rng.choices(self.urls, self.weights)[0]
+            task = asyncio.ensure_future(self._one_request(url, scheduled_ns, start_ns, result))
+            tasks.add(task)
+            task.add_done_callback(finished)
+
+        await asyncio.gather(*tasks)
+        if failures:
+            raise failures[0]
+        result['elapsed'] = (time.perf_counter_ns() - start_ns) / 1e9
+        result['total_requests'] = total_requests
+        return result
+
+    def run(self, rps, duration, seed=None):
+        """تشغيل الحمل بمعدل rps طلب/ثانية لمدة duration ثانية"""
+        print(f"🔥 اختبار الحمل: {rps} طلب/ثانية لمدة {duration} ثانية على {len(self.urls)} رابط...")
+        raw = self.fetcher.run(self._run_async(rps, duration, seed))
+        total_errors = sum(raw['errors'].values())
+
+        timeline = []
+        for second in sorted(raw['windows']):
+            window = raw['windows'][second]
+            timeline.append({
+                'second': second,
+                'throughput': window['completed'],
+                'errors': window['errors'],
+                'error_rate': round(window['errors'] / window['completed'] * 100, 2),
+                'p50_ms': round(window['latency'].percentile(50) / 1000, 2),
+                'p99_ms': round(window['latency'].percentile(99) / 1000, 2)
+            })
+
+        return {
+            'target_rps': rps,
+            'duration': duration,
+            'total_requests': raw['total_requests'],
+            'elapsed': round(raw['elapsed'], 2),
+            'achieved_rps': round(raw['total_requests'] / raw['elapsed'], 2) if raw['elapsed'] else 0,
+            'error_rate': round(total_errors / raw['total_requests'] * 100, 2) if raw['total_requests'] else 0,
+            'errors': dict(raw['errors']),
+            'status_codes': {str(code): count for code, count in raw['status_codes'].items()},
+            'latency_ms': raw['latency'].summary_ms(),
+            'service_time_ms': raw['service_time'].summary_ms(),
+            'scheduler_max_lag_ms': round(raw['max_lag_ms'], 2),
+            'timeline': timeline,
+            'url_mix': dict(zip(self.urls, self.weights))
+        }
+
+    def close(self):
+        self.fetcher.close()
+
+
+def start_stand_in_server(host='127.0.0.1', port=8799, latency_ms=20, error_rate=0.0, body_kb=50):
+    """خادم محلي بديل للمتجر لتجربة اختبار الحمل دون المساس بالموقع الحقيقي"""
+    from aiohttp import web
+
+    body = ('<html><body>' + 'x' * body_kb * 1024 + '</body></html>').encode('utf-8')
+
+    async def handle(request):
+        await asyncio.sleep(latency_ms / 1000)
+        if error_rate and random.random() < error_rate:
+            return web.Response(status=503, text='busy')
+        return web.Response(body=body, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handle)
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, host, port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, name='dnmeg-stand-in', daemon=True).start()
+    ready.wait(timeout=5)
+    return f"http://{host}:{port}"
+
+
+def print_report(report):
+    """طباعة ملخص اختبار الحمل"""
+    latency = report['latency_ms']
+    print("\n" + "="*60)
+    print("🔥 ملخص اختبار الحمل:")
+    print("="*60)
+    print(f"📨 الطلبات: {report['total_requests']} في {report['elapsed']} ثانية ({report['achieved_rps']} طلب/ثانية)")
+    print(f"❌ معدل الأخطاء: {report['error_rate']}%")
+    print(f"⏱️ الكمون: p50 {latency.get('p50')}ms | p90 {latency.get('p90')}ms | p99 {latency.get('p99')}ms | max {latency.get('max')}ms")
+    for window in report['timeline']:
+        print(f"  t={window['second']:>3}s  {window['throughput']:>5} طلب  أخطاء {window['error_rate']:>6}%  p50 {window['p50_ms']}ms  p99 {window['p99_ms']}ms")
+    print("="*60)
+
+
+def main():
+    """الوظيفة الرئيسية"""
+    parser = argparse.ArgumentParser(description='Open-loop load test for dnmeg.com')
+    parser.add_argument('--rps', type=float, default=10)
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--url', action='append', help='URL to include in the mix (repeatable)')
+    parser.add_argument('--catalog', help='build the mix from a dnmeg_analysis.json file')
+    parser.add_argument('--journeys', help='build the mix from a dnmeg_user_behavior_analysis.json file')
+    parser.add_argument('--stand-in', action='store_true', help='run against a local stand-in server')
+    parser.add_argument('--max-connections', type=int, default=256)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', default='dnmeg_load_test.json')
+    args = parser.parse_args()
+
+    url_mix = {}
+    if args.stand_in:
+        base_url = start_stand_in_server()
+        url_mix = {f"{base_url}/": 3, f"{base_url}/collections/all": 2, f"{base_url}/products/tee-v1": 1}
+    if args.catalog:
+        url_mix.update(url_mix_from_catalog(args.catalog, base_url="https://dnmeg.com"))
+    if args.journeys:
+        url_mix.update(url_mix_from_journeys(args.journeys))
+    for url in args.url or []:
+        url_mix[url] = url_mix.get(url, 0) + 1
+    if not url_mix:
+        url_mix = {"https://dnmeg.com": 1}
+
+    hosts = {urlparse(url).netloc for url in url_mix}
+    print(f"🎯 المضيفون: {', '.join(sorted(hosts))}")
+
+    tester = LoadTester(url_mix, max_connections=args.max_connections)
+    try:
+        report = tester.run(args.rps, args.duration, seed=args.seed)
+    finally:
+        tester.close()
+
+    print_report(report)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📁 تم حفظ النتائج في {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Run-scoped Page Store
+مخزن صفحات مشترك: كل رابط يُجلب ويُحلَّل مرة واحدة في التشغيل
+"""
+
+import hashlib
+import os
+import re
+import threading
+import weakref
+
+from html_parser import make_soup
+from http_client import get_shared_fetcher
+
+
+class Page:
+    """صفحة مجلوبة مع الشجرة المحللة عند الطلب"""
+
+    def __init__(self, response, store=None):
+        self.response = response
+        self._store = store
+        self._soup = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return self.response.url
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+    @property
+    def content(self):
+        return self.response.content
+
+    @property
+    def text(self):
+        return self.response.text
+
+    @property
+    def soup(self):
+        """تحليل HTML مرة واحدة فقط ومشاركة الشجرة"""
+        with self._lock:
+            if self._soup is None:
+                parser = self._store.parser if self._store is not None else None
+                self._soup = make_soup(self.response.content, parser)
+                if self._store is not None:
+                    self._store.stats['parses'] += 1
+        return self._soup
+
+
+class PageStore:
+    def __init__(self, fetcher=None, parser=None):
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.parser = parser
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'parses': 0
+        }
+
+    def _key(self, url, headers=None):
+        """المفتاح = الرابط + User-Agent"""
+        user_agent = (headers or {}).get('User-Agent') or self.fetcher.headers.get('User-Agent', '')
+        return (url, user_agent)
+
+    def _lookup(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self.stats['hits'] += 1
+            return page
+
+    def put(self, response, url=None, headers=None):
+        """تخزين استجابة جُلبت خارج المخزن (مثل قياسات التوقيت)"""
+        page = Page(response, store=self)
+        if response.error is None:
+            with self._lock:
+                self._pages[self._key(url or response.url, headers)] = page
+        return page
+
+    def get(self, url, headers=None):
+        """الحصول على صفحة من المخزن أو جلبها"""
+        key = self._key(url, headers)
+        page = self._lookup(key)
+        if page is not None:
+            return page
+
+        with self._lock:
+            self.stats['misses'] += 1
+        response = self.fetcher.fetch(url, headers=headers)
+        return self.put(response, url=url, headers=headers)
+
+    def get_many(self, urls, headers=None):
+        """الحصول على عدة صفحات مع جلب الناقص منها بالتوازي"""
+        urls = list(urls)
+        pages = {}
+        missing = []
+        for url in urls:
+            page = self._lookup(self._key(url, headers))
+            if page is not None:
+                pages[url] = page
+            elif url not in missing:
+                missing.append(url)
+
+        if missing:
+            with self._lock:
+                self.stats['misses'] += len(missing)
+            for url, response in zip(missing, self.fetcher.fetch_many(missing, headers=headers)):
+                pages[url] = self.put(response, url=url, headers=headers)
+
+        return [pages[url] for url in urls]
+
+    def save_pages(self, directory):
+        """حفظ صفحات HTML المخزنة على القرص (لمقارنة المحللات مثلاً)"""
+        os.makedirs(directory, exist_ok=True)
+        saved = []
+        with self._lock:
+            pages = list(self._pages.items())
+        for (url, user_agent), page in pages:
+            if 'html' not in page.response.headers.get('Content-Type', 'text/html'):
+                continue
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', url.split('://', 1)[-1]).strip('_') or 'index'
+            if user_agent != self.fetcher.headers.get('User-Agent', ''):
+                slug += '_' + hashlib.sha1(user_agent.encode('utf-8')).hexdigest()[:8]
+            path = os.path.join(directory, f"{slug}.html")
+            with open(path, 'wb') as f:
+                f.write(page.content)
+            saved.append(path)
+        return saved
+
+    def clear(self):
+        with self._lock:
+            self._pages = {}
+
+
+_page_stores = weakref.WeakKeyDictionary()
+
+
+def get_page_store(fetcher=None):
+    """الحصول على مخزن الصفحات المشترك لطبقة الجلب"""
+    fetcher = fetcher or get_shared_fetcher()
+    if fetcher not in _page_stores:
+        _page_stores[fetcher] = PageStore(fetcher)
+    return _page_stores[fetcher]
+
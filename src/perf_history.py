@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Performance History
+سجل دائم لقياسات الأداء عبر التشغيلات مع خطوط أساس متحركة وكشف التراجع
+"""
+
+import os
+import sqlite3
+import statistics
+import threading
+import time
+
+HISTORY_ENV_VAR = 'DNMEG_PERF_HISTORY'
+DEFAULT_HISTORY_PATH = 'dnmeg_performance_history.sqlite'
+
+# المقاييس التي تُكتب من كل صفحة في page_load_times (الأكبر = أسوأ)
+PAGE_METRICS = {
+    'load_time': lambda data: data.get('load_time'),
+    'ttfb_ms': lambda data: (data.get('timing_breakdown') or {}).get('ttfb_ms'),
+    'page_weight_kb': lambda data: data.get('total_page_weight_kb'),
+    'cold_p50': lambda data: data.get('samples', {}).get('cold', {}).get('p50'),
+    'cold_p90': lambda data: data.get('samples', {}).get('cold', {}).get('p90')
+}
+
+
+class PerfHistory:
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS measurements (
+                url TEXT,
+                metric TEXT,
+                ts REAL,
+                value REAL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS measurements_series ON measurements (url, metric, ts)")
+        self._db.commit()
+
+    def record(self, url, metrics, ts=None):
+        """إضافة قياسات تشغيل واحد (لا تعديل ولا حذف)"""
+        ts = ts or time.time()
+        rows = [(url, metric, ts, float(value)) for metric, value in metrics.items() if value is not None]
+        with self._lock:
+            self._db.executemany("INSERT INTO measurements VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+        return len(rows)
+
+    def record_page_load_times(self, page_load_times, ts=None):
+        """كتابة مقاييس كل الصفحات من نتيجة PerformanceAnalyzer"""
+        ts = ts or time.time()
+        for data in page_load_times.values():
+            if data.get('error') or not data.get('url'):
+                continue
+            self.record(data['url'], {metric: extract(data) for metric, extract in PAGE_METRICS.items()}, ts)
+        return ts
+
+    def series(self, url, metric, since=None, until=None, limit=None):
+        """القيم بالترتيب الزمني: [(ts, value), ...]"""
+        query = "SELECT ts, value FROM measurements WHERE url = ? AND metric = ?"
+        params = [url, metric]
+        if since is not None:
+            query += " AND ts >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND ts < ?"
+            params.append(until)
+        query += " ORDER BY ts DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return rows[::-1]
+
+    def rolling_baseline(self, url, metric, window=24, before=None):
+        """خط الأساس من آخر window قياس قبل before: الوسيط والانحراف المطلق الوسيط"""
+        values = [value for _, value in self.series(url, metric, until=before, limit=window)]
+        if not values:
+            return None
+        median = statistics.median(values)
+        return {
+            'count': len(values),
+            'median': median,
+            'mad': statistics.median([abs(value - median) for value in values]),
+            'min': min(values),
+            'max': max(values)
+        }
+
+    def detect_regression(self, url, metric, recent=3, baseline_window=24, min_baseline=6,
+                          min_relative_shift=0.25, mad_multiplier=3.0):
+        """تراجع = وسيط آخر recent قياس أعلى من وسيط خط الأساس بفارق نسبي ومعنوي"""
+        recent_rows = self.series(url, metric, limit=recent)
+        if len(recent_rows) < recent:
+            return None
+        baseline = self.rolling_baseline(url, metric, window=baseline_window, before=recent_rows[0][0])
+        if baseline is None or baseline['count'] < min_baseline:
+            return None
+
+        recent_median = statistics.median([value for _, value in recent_rows])
+        shift = recent_median - baseline['median']
+        relative_shift = shift / baseline['median'] if baseline['median'] else float('inf')
+        # الحد الأدنى للفارق: مضاعف MAD (مع حد أدنى صغير حتى لا يكون الصفر مع قياسات ثابتة)
+        noise_floor = mad_multiplier * max(baseline['mad'], abs(baseline['median']) * 0.01)
+        if shift <= 0 or relative_shift < min_relative_shift or shift < noise_floor:
+            return None
+
+        return {
+            'url': url,
+            'metric': metric,
+            'recent_median': round(recent_median, 4),
+            'baseline_median': round(baseline['median'], 4),
+            'baseline_mad': round(baseline['mad'], 4),
+            'baseline_count': baseline['count'],
+            'relative_shift': round(relative_shift * 100, 1)
+        }
+
+    def detect_regressions(self, urls, metrics=None, **kwargs):
+        """كشف التراجع لكل (رابط، مقياس)"""
+        findings = []
+        for url in urls:
+            for metric in metrics or PAGE_METRICS:
+                finding = self.detect_regression(url, metric, **kwargs)
+                if finding:
+                    findings.append(finding)
+        return findings
+
+    def regression_issues(self, findings):
+        """تحويل نتائج الكشف إلى صيغة technical_issues"""
+        return [
+            {
+                'type': 'performance_regression',
+                'severity': 'high' if finding['relative_shift'] >= 50 else 'medium',
+                'page': finding['url'],
+                'metric': finding['metric'],
+                'issue': f'تراجع في {finding["metric"]}: الوسيط الحالي {finding["recent_median"]} مقابل {finding["baseline_median"]} (+{finding["relative_shift"]}%)',
+                'recommendation': 'مراجعة التغييرات الأخيرة في الثيم والتطبيقات والـ CDN منذ بداية التراجع'
+            }
+            for finding in findings
+        ]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def get_default_history():
+    """السجل الافتراضي (DNMEG_PERF_HISTORY=مسار، أو فارغ لتعطيله)"""
+    path = os.environ.get(HISTORY_ENV_VAR, DEFAULT_HISTORY_PATH)
+    if not path:
+        return None
+    return PerfHistory(path)
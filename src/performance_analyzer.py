@@ -4,22 +4,54 @@ DNM.EG Performance Analyzer
 تحليل أداء تقني شامل لموقع dnmeg.com
 """
 
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import json
-import time
+import math
+from array import array
 from urllib.parse import urljoin, urlparse
 import re
 
+from device_profiles import DeviceProfileRunner, profile_headers
+from http_client import FetchError, get_shared_fetcher
+from page_store import get_page_store
+from perf_history import get_default_history
+from resource_waterfall import HEAVY_IMAGE_BYTES, ResourceWaterfall
+from url_inventory import SitemapDiscovery
+
+# توصية لكل مرحلة من مراحل الطلب عندما تكون هي سبب البطء
+PHASE_RECOMMENDATIONS = {
+    'queue': 'تقليل عدد الطلبات المتزامنة لنفس المضيف',
+    'dns': 'استخدام مزود DNS أسرع أو زيادة مدة TTL',
+    'connect': 'مراجعة إعدادات CDN و TLS (استئناف الجلسات، HTTP/2)',
+    'ttfb': 'تحسين استجابة الخادم الأصلي والتخزين المؤقت على CDN',
+    'transfer': 'تحسين الصور وتقليل حجم الصفحة'
+}
+
+def percentile(sorted_values, q):
+    """النسبة المئوية q (0-100) بالاستيفاء الخطي"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
 class PerformanceAnalyzer:
-    def __init__(self):
+    def __init__(self, fetcher=None, pages=None, history=None):
         self.base_url = "https://dnmeg.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.pages = pages or get_page_store(self.fetcher)
+        # سجل القياسات عبر التشغيلات لكشف التراجع
+        self.history = history if history is not None else get_default_history()
+        # العينات الخام بالثواني لكل رابط: {'cold': array('d'), 'warm': array('d')}
+        self.samples = {}
+        self.waterfall = ResourceWaterfall(self.fetcher, self.pages)
+        self.devices = DeviceProfileRunner(self.fetcher)
+        self.discovery = SitemapDiscovery(self.fetcher)
         self.results = {
             'page_load_times': {},
+            'resource_waterfall': {},
+            'device_matrix': {},
             'image_analysis': {},
             'mobile_performance': {},
             'seo_analysis': {},
@@ -30,9 +62,13 @@ class PerformanceAnalyzer:
     def measure_page_load_time(self, url):
         """قياس وقت تحميل الصفحة"""
         try:
-            start_time = time.time()
-            response = self.session.get(url, timeout=10)
-            load_time = time.time() - start_time
+            # القياس بارد دائماً: تجاوز كاش HTTP
+            response = self.fetcher.fetch(url, use_cache=False)
+            # زمن المحاولة الناجحة فقط (بدون انتظار إعادة المحاولة)
+            load_time = response.elapsed
+            
+            # مشاركة الاستجابة المقاسة مع بقية التحليلات بدلاً من إعادة جلبها
+            self.pages.put(response, url=url)
             
             # تحليل حجم الصفحة
             page_size = len(response.content) / 1024  # بالكيلوبايت
@@ -42,17 +78,77 @@ class PerformanceAnalyzer:
                 'load_time': round(load_time, 3),
                 'page_size_kb': round(page_size, 2),
                 'status_code': response.status_code,
+                'attempts': response.attempts,
+                'timing_breakdown': response.timings,
                 'response_headers': dict(response.headers)
             }
         except Exception as e:
+            # لا قيم بديلة: القياس غائب وتفاصيل الفشل في سجل الأخطاء
             return {
                 'url': url,
                 'error': str(e),
-                'load_time': 999,
-                'page_size_kb': 0,
-                'status_code': 0
+                'load_time': None,
+                'page_size_kb': None,
+                'status_code': None
             }
     
+    def measure_page_samples(self, url, samples=10):
+        """قياس الرابط عدة مرات باتصال بارد (DNS + TCP + TLS جديد) وآخر دافئ (اتصال معاد استخدامه)"""
+        cold_fetcher = self.fetcher.scoped(fresh_connections=True)
+        warm_fetcher = self.fetcher.scoped()
+        runs = {'cold': array('d'), 'warm': array('d')}
+        errors = {'cold': 0, 'warm': 0}
+        warmup_error = None
+        
+        try:
+            # طلب تسخين لفتح الاتصال الدافئ؛ فشله يُسجل ويكمل القياس (أول عينة دافئة تفتح الاتصال)
+            try:
+                warm_fetcher.fetch(url, use_cache=False)
+            except FetchError as e:
+                errors['warm'] += 1
+                warmup_error = str(e)
+            
+            # تبديل الترتيب بين النوعين حتى لا يتأثر أحدهما وحده بتغير ظروف الشبكة
+            for _ in range(samples):
+                for variant, fetcher in (('cold', cold_fetcher), ('warm', warm_fetcher)):
+                    try:
+                        response = fetcher.fetch(url, use_cache=False)
+                    except FetchError:
+                        errors[variant] += 1
+                        continue
+                    # زمن الطلب نفسه (بدون انتظار محدد المعدل أو إعادة المحاولة)
+                    runs[variant].append(response.elapsed)
+        finally:
+            cold_fetcher.close()
+            warm_fetcher.close()
+        
+        self.samples[url] = runs
+        summary = {
+            variant: dict(self.summarize_samples(values), errors=errors[variant])
+            for variant, values in runs.items()
+        }
+        if warmup_error is not None:
+            summary['warm']['warmup_error'] = warmup_error
+        return summary
+    
+    def summarize_samples(self, samples):
+        """إحصائيات العينات بالثواني"""
+        values = sorted(samples)
+        if not values:
+            return {'count': 0}
+        mean = sum(values) / len(values)
+        stddev = math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1)) if len(values) > 1 else 0.0
+        return {
+            'count': len(values),
+            'min': round(values[0], 4),
+            'p50': round(percentile(values, 50), 4),
+            'p90': round(percentile(values, 90), 4),
+            'p99': round(percentile(values, 99), 4),
+            'max': round(values[-1], 4),
+            'mean': round(mean, 4),
+            'stddev': round(stddev, 4)
+        }
+    
     def analyze_images(self, soup, page_url):
         """تحليل الصور وتحسينها"""
         images = soup.find_all('img')
@@ -104,41 +200,47 @@ class PerformanceAnalyzer:
         
         return image_analysis
     
+    def run_device_matrix(self, urls):
+        """كل ملفات الأجهزة على كل رابط بالتوازي: {url: {profile: نتائج}}"""
+        device_matrix = {}
+        for url, by_profile in self.devices.fetch_matrix(urls).items():
+            device_matrix[url] = {}
+            # ملفات الشبكات المقيدة تشارك استجابة الجهاز نفسه: تحليل صفحتها مرة واحدة
+            mobile_pages = {}
+            for name, response in by_profile.items():
+                entry = self.devices.describe(name, response)
+                profile = self.devices.profiles[name]
+                if response.error is None and profile['mobile']:
+                    if id(response) not in mobile_pages:
+                        soup = self.pages.put(response, url=url, headers=profile_headers(profile)).soup
+                        mobile_pages[id(response)] = self.analyze_mobile_page(soup)
+                    entry.update(mobile_pages[id(response)])
+                device_matrix[url][name] = entry
+        return device_matrix
+    
+    def analyze_mobile_page(self, soup):
+        """تحليل مدى توافق الجوال"""
+        return {
+            'viewport_meta': bool(soup.find('meta', {'name': 'viewport'})),
+            'responsive_images': len(soup.find_all('img', {'srcset': True})),
+            'mobile_navigation': bool(soup.find('nav', class_='mobile-menu')),
+            'touch_friendly': self.check_touch_friendly(soup),
+            'font_sizes': self.analyze_font_sizes(soup)
+        }
+    
     def test_mobile_performance(self, url):
-        """اختبار أداء الجوال (محاكاة)"""
-        try:
-            # محاكاة طلب الجوال
-            mobile_headers = {
-                'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
-            }
-            
-            mobile_session = requests.Session()
-            mobile_session.headers.update(mobile_headers)
-            
-            start_time = time.time()
-            response = mobile_session.get(url, timeout=10)
-            mobile_load_time = time.time() - start_time
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # تحليل مدى توافق الجوال
-            mobile_analysis = {
-                'mobile_load_time': round(mobile_load_time, 3),
-                'viewport_meta': bool(soup.find('meta', {'name': 'viewport'})),
-                'responsive_images': len(soup.find_all('img', {'srcset': True})),
-                'mobile_navigation': bool(soup.find('nav', class_='mobile-menu')),
-                'touch_friendly': self.check_touch_friendly(soup),
-                'font_sizes': self.analyze_font_sizes(soup)
-            }
-            
-            return mobile_analysis
-            
-        except Exception as e:
+        """اختبار أداء الجوال (من مصفوفة الأجهزة إن وُجدت)"""
+        device_row = self.results.get('device_matrix', {}).get(url) or self.run_device_matrix([url])[url]
+        iphone = device_row.get('iphone') or {'error': 'iphone profile not measured'}
+        if 'error' in iphone:
             return {
-                'error': str(e),
-                'mobile_load_time': 999
+                'error': iphone['error'],
+                'mobile_load_time': None
             }
+        
+        mobile_analysis = {'mobile_load_time': iphone.get('load_time')}
+        mobile_analysis.update({key: iphone.get(key) for key in ['viewport_meta', 'responsive_images', 'mobile_navigation', 'touch_friendly', 'font_sizes']})
+        return mobile_analysis
     
     def check_touch_friendly(self, soup):
         """فحص توافق اللمس"""
@@ -227,20 +329,65 @@ class PerformanceAnalyzer:
         
         return seo_analysis
     
+    def slowest_phase(self, timing_breakdown):
+        """المرحلة الأطول في الطلب"""
+        phases = {phase: timing_breakdown.get(f'{phase}_ms', 0) for phase in ['queue', 'dns', 'connect', 'ttfb', 'transfer']}
+        return max(phases, key=phases.get)
+    
     def identify_technical_issues(self, analysis_results):
         """تحديد المشاكل التقنية"""
         issues = []
         
-        # مشاكل وقت التحميل
+        # مشاكل وقت التحميل (بالنسب المئوية عند توفر عينات متعددة)
         for page, data in analysis_results['page_load_times'].items():
-            if data.get('load_time', 0) > 3:
+            if data.get('error'):
                 issues.append({
+                    'type': 'availability',
+                    'severity': 'high',
+                    'page': page,
+                    'issue': f'تعذر تحميل الصفحة: {data["error"]}',
+                    'recommendation': 'مراجعة توفر الخادم/CDN وسجل الأخطاء (fetch_errors)'
+                })
+                continue
+            cold = data.get('samples', {}).get('cold', {})
+            issue = None
+            if cold.get('count'):
+                if cold['p50'] > 3:
+                    issue = {
+                        'type': 'performance',
+                        'severity': 'high',
+                        'page': page,
+                        'issue': f'بطء تحميل الصفحة: الوسيط p50 = {cold["p50"]} ثانية ({cold["count"]} عينة)',
+                        'recommendation': 'تحسين الصور وتقليل حجم الصفحة'
+                    }
+                elif cold['p90'] > 3:
+                    issue = {
+                        'type': 'performance',
+                        'severity': 'medium',
+                        'page': page,
+                        'issue': f'بطء متقطع: p90 = {cold["p90"]} ثانية بينما الوسيط {cold["p50"]} ثانية',
+                        'recommendation': 'تحسين الصور وتقليل حجم الصفحة'
+                    }
+            elif data.get('load_time', 0) > 3:
+                issue = {
                     'type': 'performance',
                     'severity': 'high',
                     'page': page,
                     'issue': f'بطء تحميل الصفحة: {data["load_time"]} ثانية',
                     'recommendation': 'تحسين الصور وتقليل حجم الصفحة'
-                })
+                }
+            
+            if issue:
+                # تحديد المرحلة المسؤولة عن البطء (الشبكة/CDN أم الخادم أم حجم الصفحة)
+                if data.get('timing_breakdown'):
+                    phase = self.slowest_phase(data['timing_breakdown'])
+                    issue['slowest_phase'] = phase
+                    issue['recommendation'] = PHASE_RECOMMENDATIONS.get(phase, issue['recommendation'])
+                issues.append(issue)
+        
+        # مشاكل وزن الصفحة والموارد
+        for page, waterfall in analysis_results.get('resource_waterfall', {}).items():
+            issues.extend(self.waterfall.identify_issues(waterfall, page))
         
         # مشاكل الصور
         img_analysis = analysis_results.get('image_analysis', {})
@@ -326,43 +473,81 @@ class PerformanceAnalyzer:
         
         return recommendations
     
-    def run_full_analysis(self):
+    def run_full_analysis(self, samples=1, max_products=3):
         """تشغيل التحليل الشامل"""
         print("🚀 بدء تحليل الأداء التقني لموقع dnmeg.com...")
         
         # تحليل الصفحة الرئيسية
         print("📊 تحليل أداء الصفحة الرئيسية...")
         homepage_performance = self.measure_page_load_time(self.base_url)
+        if samples > 1:
+            homepage_performance['samples'] = self.measure_page_samples(self.base_url, samples)
         self.results['page_load_times']['homepage'] = homepage_performance
         
         # تحليل صفحات المنتجات
         print("📦 تحليل صفحات المنتجات...")
-        product_urls = [
-            f"{self.base_url}/products/tee-v1",
-            f"{self.base_url}/products/tee-v2",
-            f"{self.base_url}/products/jeans-1-9"
-        ]
+        # المنتجات من جرد sitemap المشترك (الأحدث تعديلاً أولاً)
+        try:
+            product_urls = self.discovery.urls(self.base_url, 'product', limit=max_products)
+        except Exception as e:
+            print(f"❌ خطأ في اكتشاف روابط المنتجات: {e}")
+            product_urls = []
+        if not product_urls:
+            print("⚠️ لم يتم العثور على منتجات في sitemap")
         
         for url in product_urls:
             try:
                 performance = self.measure_page_load_time(url)
+                if samples > 1:
+                    performance['samples'] = self.measure_page_samples(url, samples)
                 page_name = url.split('/')[-1]
                 self.results['page_load_times'][page_name] = performance
                 print(f"✅ تم تحليل {page_name}")
             except Exception as e:
                 print(f"❌ خطأ في تحليل {url}: {e}")
         
+        # كل ملفات الأجهزة (سطح المكتب والهواتف والشبكات المقيدة) على كل الصفحات بالتوازي
+        print("📱 تحليل الصفحات على ملفات الأجهزة...")
+        measured_urls = [data['url'] for data in self.results['page_load_times'].values() if not data.get('error')]
+        try:
+            self.results['device_matrix'] = self.run_device_matrix(measured_urls)
+        except Exception as e:
+            print(f"❌ خطأ في تحليل ملفات الأجهزة: {e}")
+        
+        # شلال الموارد: الوزن الحقيقي لكل صفحة مع الصور والسكربتات والأنماط والخطوط
+        print("📦 تحليل موارد الصفحات (وزن الصفحة الكلي)...")
+        for page_name, performance in self.results['page_load_times'].items():
+            if performance.get('error'):
+                continue
+            try:
+                waterfall = self.waterfall.analyze_page(performance['url'])
+                self.results['resource_waterfall'][page_name] = waterfall
+                performance['total_page_weight_kb'] = waterfall['total_kb']
+            except Exception as e:
+                print(f"❌ خطأ في تحليل موارد {page_name}: {e}")
+        
         # تحليل الصفحة الرئيسية بالتفصيل
         print("🔍 تحليل تفصيلي للصفحة الرئيسية...")
         try:
-            response = self.session.get(self.base_url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = self.pages.get(self.base_url).soup
             
             # تحليل الصور
             self.results['image_analysis'] = self.analyze_images(soup, self.base_url)
+            homepage_waterfall = self.results['resource_waterfall'].get('homepage')
+            if homepage_waterfall:
+                # الأحجام الحقيقية من شلال الموارد بدلاً من تقدير width=
+                image_sizes = {entry['url']: entry['bytes'] for entry in homepage_waterfall['resources'] if entry['type'] == 'image'}
+                for image_info in self.results['image_analysis']['image_details']:
+                    image_info['bytes'] = image_sizes.get(urljoin(self.base_url, image_info['src']))
+                self.results['image_analysis']['heavy_images'] = len([size for size in image_sizes.values() if size and size > HEAVY_IMAGE_BYTES])
+                self.results['image_analysis']['total_image_kb'] = round(homepage_waterfall['by_type'].get('image', {}).get('bytes', 0) / 1024, 2)
             
-            # تحليل الجوال
-            self.results['mobile_performance'] = self.test_mobile_performance(self.base_url)
+            # تحليل الجوال (فشله لا يلغي تحليل SEO)
+            try:
+                self.results['mobile_performance'] = self.test_mobile_performance(self.base_url)
+            except Exception as e:
+                print(f"❌ خطأ في تحليل الجوال: {e}")
+                self.results['mobile_performance'] = {'error': str(e), 'mobile_load_time': None}
             
             # تحليل SEO
             self.results['seo_analysis'] = self.analyze_seo(soup, self.base_url)
@@ -370,9 +555,33 @@ class PerformanceAnalyzer:
         except Exception as e:
             print(f"❌ خطأ في التحليل التفصيلي: {e}")
         
+        self.devices.close()
+        
+        # العينات الخام بالمللي ثانية
+        if self.samples:
+            self.results['load_samples_ms'] = {
+                url: {variant: [round(value * 1000, 3) for value in values] for variant, values in runs.items()}
+                for url, runs in self.samples.items()
+            }
+        
+        # سجل أخطاء الجلب المنظم (المحاولات الفاشلة وأسبابها)
+        if self.fetcher.ledger is not None:
+            self.results['fetch_errors'] = {
+                'summary': self.fetcher.ledger.summary(),
+                'failed_urls': self.fetcher.ledger.failed_urls()
+            }
+        
         # تحديد المشاكل
         self.results['technical_issues'] = self.identify_technical_issues(self.results)
         
+        # حفظ القياسات في السجل الدائم ومقارنتها بخط الأساس
+        if self.history is not None:
+            self.history.record_page_load_times(self.results['page_load_times'])
+            urls = [data['url'] for data in self.results['page_load_times'].values() if data.get('url')]
+            regressions = self.history.detect_regressions(urls)
+            self.results['regressions'] = regressions
+            self.results['technical_issues'].extend(self.history.regression_issues(regressions))
+        
         # توليد التوصيات
         self.results['recommendations'] = self.generate_recommendations(self.results)
         
@@ -392,7 +601,21 @@ class PerformanceAnalyzer:
         print("="*60)
         
         # أداء التحميل
-        print(f"⚡ وقت تحميل الصفحة الرئيسية: {self.results['page_load_times'].get('homepage', {}).get('load_time', 'N/A')} ثانية")
+        print(f"⚡ وقت تحميل الصفحة الرئيسية: {self.results['page_load_times'].get('homepage', {}).get('load_time') or 'N/A'} ثانية")
+        homepage_samples = self.results['page_load_times'].get('homepage', {}).get('samples')
+        if homepage_samples:
+            for variant in ['cold', 'warm']:
+                stats = homepage_samples[variant]
+                if stats.get('count'):
+                    print(f"   {variant}: p50 {stats['p50']}s | p90 {stats['p90']}s | p99 {stats['p99']}s | σ {stats['stddev']}s ({stats['count']} عينة)")
+                if stats.get('errors'):
+                    print(f"   ⚠️ {variant}: {stats['errors']} طلب فاشل{' (فشل طلب التسخين: ' + stats['warmup_error'] + ')' if stats.get('warmup_error') else ''}")
+        homepage_waterfall = self.results.get('resource_waterfall', {}).get('homepage')
+        if homepage_waterfall:
+            print(f"📦 وزن الصفحة الرئيسية الكلي: {homepage_waterfall['total_kb']} KB ({homepage_waterfall['resource_count']} مورد)")
+        breakdown = self.results['page_load_times'].get('homepage', {}).get('timing_breakdown')
+        if breakdown:
+            print(f"   DNS {breakdown['dns_ms']}ms | اتصال {breakdown['connect_ms']}ms | أول بايت {breakdown['ttfb_ms']}ms | نقل {breakdown['transfer_ms']}ms")
         
         # تحليل الصور
         img_analysis = self.results.get('image_analysis', {})
@@ -402,7 +625,10 @@ class PerformanceAnalyzer:
         
         # تحليل الجوال
         mobile = self.results.get('mobile_performance', {})
-        print(f"📱 وقت تحميل الجوال: {mobile.get('mobile_load_time', 'N/A')} ثانية")
+        print(f"📱 وقت تحميل الجوال: {mobile.get('mobile_load_time') or 'N/A'} ثانية")
+        for name, entry in self.results.get('device_matrix', {}).get(self.base_url, {}).items():
+            simulated = f" (متوقع {entry['simulated_load_time']} ثانية على {entry['network']})" if 'simulated_load_time' in entry else ''
+            print(f"   {name}: {entry.get('load_time', 'N/A')} ثانية{simulated}")
         print(f"📱 viewport meta: {'✅' if mobile.get('viewport_meta') else '❌'}")
         
         # تحليل SEO
@@ -412,6 +638,8 @@ class PerformanceAnalyzer:
         
         # المشاكل
         issues = self.results.get('technical_issues', [])
+        if self.results.get('regressions'):
+            print(f"📉 تراجعات مقارنة بخط الأساس: {len(self.results['regressions'])}")
         print(f"⚠️ عدد المشاكل: {len(issues)}")
         
         # التوصيات
@@ -422,8 +650,13 @@ class PerformanceAnalyzer:
 
 def main():
     """الوظيفة الرئيسية"""
+    parser = argparse.ArgumentParser(description='Technical performance analysis for dnmeg.com')
+    parser.add_argument('--samples', type=int, default=1, help='measure each URL N times (cold and warm connections)')
+    parser.add_argument('--max-products', type=int, default=3, help='number of product pages from the sitemap inventory')
+    args = parser.parse_args()
+    
     analyzer = PerformanceAnalyzer()
-    results = analyzer.run_full_analysis()
+    results = analyzer.run_full_analysis(samples=args.samples, max_products=args.max_products)
     analyzer.print_summary()
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Rate Limiter
+تحديد معدل الطلبات على حلقة الجلب: دلو رموز عام، ودلو لكل مضيف يتكيف مع Retry-After و 429/503 وزمن الاستجابة
+"""
+
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# أقصى انتظار نقبله من Retry-After (بالثواني)
+MAX_RETRY_AFTER = 120
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(headers):
+    """Retry-After بالثواني (رقم أو تاريخ HTTP) أو None"""
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        return min(max(0.0, parsedate_to_datetime(value).timestamp() - time.time()), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """دلو رموز: rate طلب في الثانية مع سماح بدفعة حتى burst"""
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def set_rate(self, rate):
+        """تغيير المعدل مع الحفاظ على الرموز المتراكمة حتى اللحظة"""
+        self._refill()
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+    async def acquire(self, url=None):
+        """انتظار رمز متاح (يُستدعى من حلقة الجلب فقط)"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def observe(self, url, result):
+        """الدلو العام لا يتكيف مع الاستجابات"""
+
+
+class HostRateLimiter:
+    """دلو رموز لكل مضيف بزيادة جمعية وتخفيض ضربي (AIMD):
+    يرفع المعدل مع الاستجابات السليمة ويخفضه مع 429/503 أو انتهاء المهلة أو ارتفاع زمن الاستجابة"""
+
+    def __init__(self, initial_rate=8.0, min_rate=0.2, max_rate=50.0, additive_increase=2.0,
+                 decrease_factor=0.5, latency_factor=2.0, cooldown=1.0):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        # زيادة المعدل بهذا القدر (طلب/ثانية) لكل ثانية من الاستجابات السليمة
+        self.additive_increase = additive_increase
+        self.decrease_factor = decrease_factor
+        # ارتفاع زمن أول بايت فوق هذا المضاعف من خط الأساس يعتبر ازدحاماً
+        self.latency_factor = latency_factor
+        # تخفيض واحد فقط لكل فترة (الطلبات الجارية تحمل نفس الإشارة)
+        self.cooldown = cooldown
+        self.hosts = {}
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = {
+                'bucket': TokenBucket(self.initial_rate),
+                'blocked_until': 0.0,
+                'latency_ms': None,
+                'baseline_ms': None,
+                'last_decrease': 0.0,
+                'stats': {'requests': 0, 'throttled': 0, 'retry_after_waits': 0, 'slowdowns': 0}
+            }
+        return self.hosts[host]
+
+    async def acquire(self, url):
+        state = self._host(url)
+        while True:
+            wait = state['blocked_until'] - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await state['bucket'].acquire()
+        state['stats']['requests'] += 1
+
+    def _decrease(self, state, now):
+        if now - state['last_decrease'] < self.cooldown:
+            return
+        state['last_decrease'] = now
+        bucket = state['bucket']
+        bucket.set_rate(max(self.min_rate, bucket.rate * self.decrease_factor))
+        bucket.tokens = min(bucket.tokens, 0.0)
+
+    def _increase(self, state):
+        bucket = state['bucket']
+        if bucket.rate < self.max_rate:
+            bucket.set_rate(min(self.max_rate, bucket.rate + self.additive_increase / bucket.rate))
+
+    def observe(self, url, result):
+        """تكييف معدل المضيف حسب نتيجة الطلب"""
+        state = self._host(url)
+        now = time.monotonic()
+
+        if result.status_code in THROTTLE_STATUSES:
+            state['stats']['throttled'] += 1
+            retry_after = parse_retry_after(result.headers)
+            if retry_after:
+                state['stats']['retry_after_waits'] += 1
+                state['blocked_until'] = max(state['blocked_until'], now + retry_after)
+            self._decrease(state, now)
+            return
+
+        if result.error is not None:
+            if 'timeout' in result.error.lower():
+                self._decrease(state, now)
+            return
+
+        latency_ms = (result.timings or {}).get('ttfb_ms') or result.elapsed * 1000
+        state['latency_ms'] = latency_ms if state['latency_ms'] is None else 0.8 * state['latency_ms'] + 0.2 * latency_ms
+        if state['baseline_ms'] is None or state['latency_ms'] < state['baseline_ms']:
+            state['baseline_ms'] = state['latency_ms']
+        else:
+            # خط الأساس يتبع الارتفاع الدائم ببطء
+            state['baseline_ms'] += (state['latency_ms'] - state['baseline_ms']) * 0.01
+
+        if state['latency_ms'] > self.latency_factor * state['baseline_ms'] and state['latency_ms'] - state['baseline_ms'] > 50:
+            state['stats']['slowdowns'] += 1
+            self._decrease(state, now)
+        else:
+            self._increase(state)
+
+    def summary(self):
+        """المعدل الحالي والإحصاءات لكل مضيف"""
+        return {
+            host: {
+                'rate': round(state['bucket'].rate, 2),
+                'latency_ms': round(state['latency_ms'], 1) if state['latency_ms'] is not None else None,
+                **state['stats']
+            }
+            for host, state in self.hosts.items()
+        }
+
+
+class LimiterChain:
+    """تطبيق عدة محددات بالترتيب (مثلاً حد عام للجلسات + سياسة المضيف)"""
+
+    def __init__(self, limiters):
+        self.limiters = [limiter for limiter in limiters if limiter is not None]
+
+    async def acquire(self, url):
+        for limiter in self.limiters:
+            await limiter.acquire(url)
+
+    def observe(self, url, result):
+        for limiter in self.limiters:
+            limiter.observe(url, result)
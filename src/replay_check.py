@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Replay Check
+تشغيل كل المحللات من أرشيف HTTP بدون شبكة: قياس زمن كل محلل ومقارنة مخرجاته ببيانات data/ أو بتشغيل سابق
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from http_archive import ARCHIVE_ENV_VAR, ARCHIVE_MODE_ENV_VAR, DEFAULT_ARCHIVE_PATH, RECORD, REPLAY
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(SRC_DIR), 'data')
+
+# (الاسم، السكربت، المعاملات، ملف المخرجات)
+ANALYZERS = [
+    ('scraper', 'scraper_dnemeg.py', [], 'dnmeg_analysis.json'),
+    ('performance', 'performance_analyzer.py', [], 'dnmeg_performance_analysis.json'),
+    ('behavior', 'user_behavior_simulator.py', ['--sessions', '5', '--seed', '0'], 'dnmeg_user_behavior_analysis.json'),
+    ('checkout', 'checkout_analyzer.py', [], 'dnmeg_checkout_analysis.json'),
+    ('reviews', 'reviews_inventory_analyzer.py', [], 'dnmeg_reviews_inventory_analysis.json')
+]
+
+# مفاتيح تتغير في كل تشغيل ولا تدخل في المقارنة
+VOLATILE_KEYS = {'scrape_time', 'timestamp', 'time', 'analysis_time', 'elapsed_ms', 'total_time', 'recorded_at'}
+
+
+def key_paths(value, depth, prefix=''):
+    """مسارات المفاتيح حتى عمق depth (عناصر القوائم تُدمج تحت [])"""
+    paths = set()
+    if depth <= 0:
+        return paths
+    if isinstance(value, dict):
+        for key, child in value.items():
+            path = f'{prefix}.{key}' if prefix else key
+            paths.add(path)
+            paths |= key_paths(child, depth - 1, path)
+    elif isinstance(value, list):
+        for child in value:
+            paths |= key_paths(child, depth, f'{prefix}[]')
+    return paths
+
+
+def value_diffs(expected, actual, prefix='', limit=20):
+    """الفروق في القيم مع تجاهل المفاتيح المتغيرة"""
+    diffs = []
+
+    def walk(a, b, path):
+        if len(diffs) >= limit:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in sorted(set(a) | set(b)):
+                if key in VOLATILE_KEYS:
+                    continue
+                walk(a.get(key), b.get(key), f'{path}.{key}' if path else key)
+        elif isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+            for i, (x, y) in enumerate(zip(a, b)):
+                walk(x, y, f'{path}[{i}]')
+        elif a != b:
+            diffs.append({'path': path, 'expected': a, 'actual': b})
+
+    walk(expected, actual, prefix)
+    return diffs
+
+
+def run_analyzer(script, args, workdir, env):
+    start_time = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, script)] + args,
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    return completed, round(time.perf_counter() - start_time, 2)
+
+
+def main():
+    """الوظيفة الرئيسية"""
+    parser = argparse.ArgumentParser(description='Record or replay every analyzer against an HTTP archive')
+    parser.add_argument('--record', action='store_true', help='run live and record every response')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE_PATH)
+    parser.add_argument('--ground-truth', default=DATA_DIR, help='directory with reference JSON outputs')
+    parser.add_argument('--baseline', help='directory with outputs of a previous replay (exact value diff)')
+    parser.add_argument('--save', help='copy this run\'s outputs to a directory')
+    parser.add_argument('--depth', type=int, default=2, help='key depth for schema comparison')
+    parser.add_argument('--only', action='append', help='run only these analyzers')
+    args = parser.parse_args()
+
+    mode = RECORD if args.record else REPLAY
+    archive_path = os.path.abspath(args.archive)
+    if mode == REPLAY and not os.path.exists(archive_path):
+        print(f"❌ الأرشيف غير موجود: {archive_path} (شغّل --record أولاً)")
+        sys.exit(2)
+    if mode == RECORD and not args.only and os.path.exists(archive_path):
+        # تسجيل كامل يبدأ من أرشيف فارغ؛ مع --only تُستبدل استجابات المحللات المختارة فقط
+        os.remove(archive_path)
+
+    env = dict(os.environ)
+    env.update({
+        ARCHIVE_MODE_ENV_VAR: mode,
+        ARCHIVE_ENV_VAR: archive_path,
+        # تشغيل معزول: بدون كاش أو سجل أداء أو جرد سابق
+        'DNMEG_HTTP_CACHE': '',
+        'DNMEG_PERF_HISTORY': '',
+        'DNMEG_URL_INVENTORY': '',
+        'DNMEG_REVIEW_STORE': '',
+        'DNMEG_INVENTORY_SNAPSHOTS': ''
+    })
+
+    report = {'mode': mode, 'archive': archive_path, 'analyzers': {}}
+    failed = False
+    workdir = tempfile.mkdtemp(prefix='dnmeg_replay_')
+    try:
+        for name, script, script_args, output in ANALYZERS:
+            if args.only and name not in args.only:
+                continue
+            print(f"{'🔴' if mode == RECORD else '▶️'} {name}...")
+            completed, elapsed = run_analyzer(script, script_args, workdir, env)
+            entry = {'seconds': elapsed, 'exit_code': completed.returncode}
+            report['analyzers'][name] = entry
+
+            output_path = os.path.join(workdir, output)
+            if completed.returncode != 0 or not os.path.exists(output_path):
+                entry['stderr'] = completed.stderr[-2000:]
+                print(f"❌ {name} فشل ({elapsed} ثانية)\n{completed.stderr[-2000:]}")
+                failed = True
+                continue
+            with open(output_path, encoding='utf-8') as f:
+                result = json.load(f)
+
+            ground_truth_path = os.path.join(args.ground_truth, output)
+            if os.path.exists(ground_truth_path):
+                with open(ground_truth_path, encoding='utf-8') as f:
+                    expected_paths = key_paths(json.load(f), args.depth)
+                actual_paths = key_paths(result, args.depth)
+                entry['missing_keys'] = sorted(expected_paths - actual_paths)
+                entry['new_keys'] = sorted(actual_paths - expected_paths)
+                if entry['missing_keys']:
+                    failed = True
+
+            if args.baseline and os.path.exists(os.path.join(args.baseline, output)):
+                with open(os.path.join(args.baseline, output), encoding='utf-8') as f:
+                    entry['value_diffs'] = value_diffs(json.load(f), result)
+                if entry['value_diffs']:
+                    failed = True
+
+            if args.save:
+                os.makedirs(args.save, exist_ok=True)
+                shutil.copy(output_path, os.path.join(args.save, output))
+
+            status = '✅' if not entry.get('missing_keys') and not entry.get('value_diffs') else '⚠️'
+            print(f"{status} {name}: {elapsed} ثانية | مفاتيح ناقصة {len(entry.get('missing_keys', []))} | جديدة {len(entry.get('new_keys', []))} | فروق القيم {len(entry.get('value_diffs', []))}")
+            for path in entry.get('missing_keys', [])[:10]:
+                print(f"   - {path}")
+            for diff in entry.get('value_diffs', [])[:10]:
+                print(f"   ≠ {diff['path']}: {diff['expected']!r} → {diff['actual']!r}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report['total_seconds'] = round(sum(entry['seconds'] for entry in report['analyzers'].values()), 2)
+    with open('dnmeg_replay_report.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"⏱️ الزمن الكلي: {report['total_seconds']} ثانية")
+    print("📁 تم حفظ التقرير في dnmeg_replay_report.json")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Request Timing
+تسجيل مراحل كل طلب (DNS / الاتصال / أول بايت / النقل) بساعة perf_counter_ns
+"""
+
+import time
+
+import aiohttp
+
+
+def _mark(name, first=False):
+    """دالة تتبع تسجل وقت الحدث في سياق الطلب"""
+    async def handler(session, trace_config_ctx, params):
+        marks = trace_config_ctx.trace_request_ctx
+        if marks is None:
+            return
+        if first:
+            marks.setdefault(name, time.perf_counter_ns())
+        else:
+            marks[name] = time.perf_counter_ns()
+    return handler
+
+
+async def _on_redirect(session, trace_config_ctx, params):
+    marks = trace_config_ctx.trace_request_ctx
+    if marks is not None:
+        marks['redirects'] = marks.get('redirects', 0) + 1
+
+
+def make_trace_config():
+    """TraceConfig لجلسة aiohttp تملأ trace_request_ctx بأوقات المراحل"""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_mark('request_start', first=True))
+    trace_config.on_connection_queued_start.append(_mark('queue_start'))
+    trace_config.on_connection_queued_end.append(_mark('queue_end'))
+    trace_config.on_dns_resolvehost_start.append(_mark('dns_start'))
+    trace_config.on_dns_resolvehost_end.append(_mark('dns_end'))
+    trace_config.on_connection_create_start.append(_mark('connect_start'))
+    trace_config.on_connection_create_end.append(_mark('connect_end'))
+    trace_config.on_connection_reuseconn.append(_mark('connection_reused'))
+    trace_config.on_request_headers_sent.append(_mark('request_sent'))
+    trace_config.on_request_end.append(_mark('response_start'))
+    trace_config.on_request_redirect.append(_on_redirect)
+    return trace_config
+
+
+def _span_ms(marks, start, end):
+    if start in marks and end in marks:
+        return round((marks[end] - marks[start]) / 1e6, 3)
+    return 0.0
+
+
+def timing_breakdown(marks):
+    """تحويل أوقات الأحداث إلى مراحل بالمللي ثانية"""
+    if 'request_start' not in marks or 'body_end' not in marks:
+        return None
+    dns = _span_ms(marks, 'dns_start', 'dns_end')
+    return {
+        'queue_ms': _span_ms(marks, 'queue_start', 'queue_end'),
+        'dns_ms': dns,
+        # إنشاء الاتصال يشمل TCP و TLS (aiohttp لا يفصل بينهما)
+        'connect_ms': round(max(0.0, _span_ms(marks, 'connect_start', 'connect_end') - dns), 3),
+        'ttfb_ms': _span_ms(marks, 'request_sent' if 'request_sent' in marks else 'request_start', 'response_start'),
+        'transfer_ms': _span_ms(marks, 'response_start', 'body_end'),
+        'total_ms': _span_ms(marks, 'request_start', 'body_end'),
+        'connection_reused': 'connection_reused' in marks and 'connect_end' not in marks,
+        'redirects': marks.get('redirects', 0)
+    }
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Resilience
+إعادة المحاولة بتأخير أسي عشوائي للطلبات الآمنة، وقاطع دائرة لكل مضيف، وسجل أخطاء منظم لكل رابط
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+CIRCUIT_OPEN_ERROR = 'circuit open'
+ARCHIVE_MISS_ERROR = 'not in archive'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def classify_failure(result):
+    """نوع الفشل: timeout / connection / throttled / server / client / circuit_open / archive_miss، أو None للنجاح.
+    503 بدون Retry-After عطل في الخادم (يُحسب في قاطع الدائرة) وليس طلب إبطاء"""
+    if result.error is not None:
+        if result.error == CIRCUIT_OPEN_ERROR:
+            return 'circuit_open'
+        if result.error == ARCHIVE_MISS_ERROR:
+            return 'archive_miss'
+        if 'timeout' in result.error.lower():
+            return 'timeout'
+        return 'connection'
+    if result.status_code == 429 or (result.status_code == 503 and result.headers.get('Retry-After')):
+        return 'throttled'
+    if result.status_code >= 500:
+        return 'server'
+    if result.status_code >= 400:
+        return 'client'
+    return None
+
+
+class RetryPolicy:
+    """إعادة محاولة GET/HEAD فقط بتأخير أسي مع عشوائية كاملة (full jitter)"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0,
+                 retry_on=('timeout', 'connection', 'throttled', 'server'), methods=('GET', 'HEAD')):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.methods = methods
+
+    def should_retry(self, method, result, attempt):
+        """attempt يبدأ من 1"""
+        if attempt >= self.max_attempts or method.upper() not in self.methods:
+            return False
+        return classify_failure(result) in self.retry_on
+
+    def delay(self, attempt, retry_after=None):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after:
+            return max(backoff, min(retry_after, self.max_delay))
+        return backoff
+
+
+class CircuitBreaker:
+    """قاطع دائرة لكل مضيف: يفتح بعد فشل متتالٍ ويرفض الطلبات فوراً حتى انتهاء المهلة ثم يسمح بطلب اختبار"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, failure_kinds=('timeout', 'connection', 'server')):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_kinds = failure_kinds
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = {'state': CLOSED, 'failures': 0, 'opened_at': 0.0, 'probing': False, 'trips': 0}
+        return self.hosts[host]
+
+    def allow(self, url):
+        with self._lock:
+            state = self._host(url)
+            if state['state'] == CLOSED:
+                return True
+            if state['state'] == OPEN and time.monotonic() - state['opened_at'] >= self.reset_timeout:
+                state['state'] = HALF_OPEN
+                state['probing'] = False
+            if state['state'] == HALF_OPEN and not state['probing']:
+                # طلب اختبار واحد فقط أثناء نصف الفتح
+                state['probing'] = True
+                return True
+            return False
+
+    def record(self, url, result):
+        with self._lock:
+            state = self._host(url)
+            if classify_failure(result) in self.failure_kinds:
+                state['failures'] += 1
+                if state['state'] == HALF_OPEN or state['failures'] >= self.failure_threshold:
+                    if state['state'] != OPEN:
+                        state['trips'] += 1
+                    state['state'] = OPEN
+                    state['opened_at'] = time.monotonic()
+                    state['probing'] = False
+            else:
+                state['state'] = CLOSED
+                state['failures'] = 0
+                state['probing'] = False
+
+    def summary(self):
+        with self._lock:
+            return {host: {'state': state['state'], 'trips': state['trips']} for host, state in self.hosts.items()}
+
+
+class ErrorLedger:
+    """سجل منظم لكل محاولة فاشلة بدلاً من القيم البديلة (مثل 999)"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def record(self, url, method, result, attempt, final, kind=None):
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'url': url,
+            'host': urlparse(url).netloc,
+            'method': method,
+            'kind': kind or classify_failure(result),
+            'status_code': result.status_code,
+            'error': result.error,
+            'attempt': attempt,
+            # final = لن تتم محاولة أخرى (الفشل وصل للمستدعي)
+            'final': final
+        }
+        with self._lock:
+            if len(self.entries) >= self.max_entries:
+                self.dropped += 1
+                return
+            self.entries.append(entry)
+
+    def for_url(self, url):
+        with self._lock:
+            return [entry for entry in self.entries if entry['url'] == url]
+
+    def failed_urls(self):
+        """الروابط التي فشلت نهائياً مع آخر سبب"""
+        with self._lock:
+            return {entry['url']: entry['kind'] for entry in self.entries if entry['final']}
+
+    def summary(self):
+        with self._lock:
+            final = [entry for entry in self.entries if entry['final']]
+            return {
+                'attempts_failed': len(self.entries) + self.dropped,
+                'urls_failed': len({entry['url'] for entry in final}),
+                'retried': len([entry for entry in self.entries if not entry['final']]),
+                'by_kind': dict(Counter(entry['kind'] for entry in final)),
+                'by_host': dict(Counter(entry['host'] for entry in final))
+            }
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Resource Waterfall
+جمع كل موارد الصفحة (صور، سكربتات، أنماط، خطوط) وقياس حجمها الحقيقي وضغطها وتخزينها المؤقت
+"""
+
+import json
+import re
+from urllib.parse import urljoin, urlparse
+
+from dom_extract import DomExtractor
+from http_client import get_shared_fetcher
+from http_cache import parse_max_age
+from page_store import get_page_store
+
+# قواعد الموارد: تُطبق كلها في مرور واحد على الشجرة
+RESOURCE_RULES = (
+    DomExtractor()
+    .add('images', 'img')
+    .add('scripts', 'script', src=lambda x: bool(x))
+    .add('stylesheets', 'link', rel=lambda x: x and x.lower() == 'stylesheet', href=lambda x: bool(x))
+    .add('font_preloads', 'link', rel=lambda x: x and x.lower() == 'preload', href=lambda x: bool(x), **{'as': 'font'})
+    .add('inline_styles', 'style')
+)
+
+FONT_URL_PATTERN = re.compile(r'url\(\s*[\'"]?([^\'")]+\.(?:woff2?|ttf|otf|eot)(?:[?#][^\'")]*)?)[\'"]?\s*\)', re.IGNORECASE)
+TEXT_RESOURCE_TYPES = ['script', 'stylesheet']
+
+# حدود التنبيه
+HEAVY_PAGE_BYTES = 3 * 1024 * 1024
+HEAVY_IMAGE_BYTES = 300 * 1024
+HEAVY_SCRIPT_BYTES = 500 * 1024
+
+
+class ResourceWaterfall:
+    def __init__(self, fetcher=None, pages=None, scan_stylesheets=True):
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.pages = pages or get_page_store(self.fetcher)
+        # جلب ملفات CSS لاكتشاف الخطوط المعرفة في @font-face
+        self.scan_stylesheets = scan_stylesheets
+
+    def collect_resources(self, soup, page_url):
+        """استخراج روابط الموارد من الصفحة المحللة"""
+        found = RESOURCE_RULES.run(soup)
+        resources = {}
+
+        def add(url, resource_type):
+            if not url or url.startswith(('data:', 'blob:', 'javascript:')):
+                return
+            full_url = urljoin(page_url, url.strip())
+            if urlparse(full_url).scheme in ('http', 'https'):
+                resources.setdefault(full_url, resource_type)
+
+        for img in found.all('images'):
+            add(img.get('src') or img.get('data-src'), 'image')
+        for script in found.all('scripts'):
+            add(script.get('src'), 'script')
+        for link in found.all('stylesheets'):
+            add(link.get('href'), 'stylesheet')
+        for link in found.all('font_preloads'):
+            add(link.get('href'), 'font')
+        for style in found.all('inline_styles'):
+            for font_url in FONT_URL_PATTERN.findall(style.string or ''):
+                add(font_url, 'font')
+
+        return resources
+
+    def discover_stylesheet_fonts(self, resources):
+        """الخطوط المعرفة داخل ملفات CSS الخارجية"""
+        stylesheets = [url for url, resource_type in resources.items() if resource_type == 'stylesheet']
+        fonts = {}
+        for css_url, page in zip(stylesheets, self.pages.get_many(stylesheets)):
+            if page.response.error is not None:
+                continue
+            for font_url in FONT_URL_PATTERN.findall(page.text):
+                full_url = urljoin(css_url, font_url.strip())
+                if full_url not in resources:
+                    fonts.setdefault(full_url, 'font')
+        return fonts
+
+    def measure_resources(self, resources):
+        """قياس كل الموارد بالتوازي: HEAD أولاً ثم GET جزئي (Range) عند الحاجة"""
+        headers = {'Accept-Encoding': 'gzip, deflate, br'}
+        urls = list(resources)
+        head_results = self.fetcher.fetch_many(urls, headers=headers, method='HEAD')
+
+        fallback = [
+            url for url, result in zip(urls, head_results)
+            if result.error is not None or result.status_code >= 400 or 'Content-Length' not in result.headers
+        ]
+        range_results = dict(zip(fallback, self.fetcher.fetch_many(
+            fallback, headers={**headers, 'Range': 'bytes=0-0'}, use_cache=False
+        )))
+
+        measured = []
+        for url, head_result in zip(urls, head_results):
+            if url in range_results:
+                entry = self.describe_response(url, resources[url], range_results[url], 'range_get')
+            else:
+                entry = self.describe_response(url, resources[url], head_result, 'head')
+            measured.append(entry)
+        return measured
+
+    def describe_response(self, url, resource_type, result, method):
+        """حجم النقل والضغط والتخزين المؤقت لمورد واحد"""
+        entry = {
+            'url': url,
+            'type': resource_type,
+            'method': method,
+            'status_code': result.status_code,
+            'bytes': None,
+            'size_source': None,
+            'content_type': result.headers.get('Content-Type', ''),
+            'content_encoding': result.headers.get('Content-Encoding'),
+            'cache_control': result.headers.get('Cache-Control'),
+            'max_age': parse_max_age(result.headers),
+            'has_validator': 'ETag' in result.headers or 'Last-Modified' in result.headers,
+            'third_party': False
+        }
+        if result.error is not None:
+            entry['error'] = result.error
+            return entry
+
+        content_range = result.headers.get('Content-Range', '')
+        if result.status_code == 206 and '/' in content_range and not content_range.endswith('/*'):
+            entry['bytes'] = int(content_range.rsplit('/', 1)[1])
+            entry['size_source'] = 'content_range'
+        elif 'Content-Length' in result.headers and method == 'head':
+            entry['bytes'] = int(result.headers['Content-Length'])
+            entry['size_source'] = 'content_length'
+        elif result.status_code == 200 and result.content:
+            # الخادم تجاهل Range وأرسل الملف كاملاً (المحتوى بعد فك الضغط)
+            entry['bytes'] = len(result.content)
+            entry['size_source'] = 'body'
+        return entry
+
+    def analyze_page(self, page_url, soup=None, response=None):
+        """شلال موارد صفحة واحدة مع الوزن الكلي"""
+        if soup is None or response is None:
+            page = self.pages.get(page_url)
+            soup, response = page.soup, page.response
+
+        resources = self.collect_resources(soup, page_url)
+        if self.scan_stylesheets:
+            resources.update(self.discover_stylesheet_fonts(resources))
+
+        entries = self.measure_resources(resources) if resources else []
+        page_host = urlparse(page_url).netloc
+        for entry in entries:
+            entry['third_party'] = urlparse(entry['url']).netloc != page_host
+
+        html_bytes = int(response.headers.get('Content-Length', len(response.content)))
+        by_type = {}
+        for entry in entries:
+            stats = by_type.setdefault(entry['type'], {'count': 0, 'bytes': 0, 'unknown_size': 0})
+            stats['count'] += 1
+            if entry['bytes'] is None:
+                stats['unknown_size'] += 1
+            else:
+                stats['bytes'] += entry['bytes']
+
+        measured = [entry for entry in entries if entry['bytes'] is not None]
+        total_bytes = html_bytes + sum(entry['bytes'] for entry in measured)
+
+        return {
+            'url': page_url,
+            'html_bytes': html_bytes,
+            'resource_count': len(entries),
+            'total_bytes': total_bytes,
+            'total_kb': round(total_bytes / 1024, 2),
+            'by_type': by_type,
+            'third_party_resources': len([entry for entry in entries if entry['third_party']]),
+            'uncompressed_text_resources': [
+                entry['url'] for entry in entries
+                if entry['type'] in TEXT_RESOURCE_TYPES and entry['bytes'] and not entry['content_encoding']
+            ],
+            'uncached_resources': [
+                entry['url'] for entry in entries
+                if entry.get('error') is None and entry['status_code'] < 400 and not entry['max_age'] and not entry['has_validator']
+            ],
+            'heaviest_resources': sorted(measured, key=lambda entry: entry['bytes'], reverse=True)[:10],
+            'resources': entries
+        }
+
+    def identify_issues(self, waterfall, page_name):
+        """مشاكل وزن الصفحة والموارد"""
+        issues = []
+        if waterfall['total_bytes'] > HEAVY_PAGE_BYTES:
+            issues.append({
+                'type': 'performance',
+                'severity': 'high',
+                'page': page_name,
+                'issue': f'وزن الصفحة الكلي {waterfall["total_kb"]} KB ({waterfall["resource_count"]} مورد)',
+                'recommendation': 'تقليل أصول الثيم الثقيلة وتأجيل تحميل السكربتات والصور غير الظاهرة'
+            })
+
+        heavy = [
+            entry for entry in waterfall['heaviest_resources']
+            if (entry['type'] == 'image' and entry['bytes'] > HEAVY_IMAGE_BYTES)
+            or (entry['type'] == 'script' and entry['bytes'] > HEAVY_SCRIPT_BYTES)
+        ]
+        if heavy:
+            issues.append({
+                'type': 'performance',
+                'severity': 'medium',
+                'page': page_name,
+                'issue': f'موارد ثقيلة: {len(heavy)} (أكبرها {round(heavy[0]["bytes"] / 1024)} KB)',
+                'recommendation': 'ضغط الصور وتقسيم السكربتات الكبيرة',
+                'resources': [entry['url'] for entry in heavy]
+            })
+
+        if waterfall['uncompressed_text_resources']:
+            issues.append({
+                'type': 'performance',
+                'severity': 'medium',
+                'page': page_name,
+                'issue': f'ملفات JS/CSS بدون ضغط: {len(waterfall["uncompressed_text_resources"])}',
+                'recommendation': 'تفعيل gzip أو brotli على الخادم/CDN'
+            })
+
+        if waterfall['uncached_resources']:
+            issues.append({
+                'type': 'performance',
+                'severity': 'low',
+                'page': page_name,
+                'issue': f'موارد بدون ترويسات تخزين مؤقت: {len(waterfall["uncached_resources"])}',
+                'recommendation': 'إضافة Cache-Control مع max-age طويل للأصول الثابتة'
+            })
+        return issues
+
+
+def main():
+    """الوظيفة الرئيسية"""
+    waterfall = ResourceWaterfall()
+    result = waterfall.analyze_page("https://dnmeg.com")
+
+    with open('dnmeg_resource_waterfall.json', 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"📦 وزن الصفحة الكلي: {result['total_kb']} KB في {result['resource_count']} مورد")
+    for resource_type, stats in result['by_type'].items():
+        print(f"  • {resource_type}: {stats['count']} ملف، {round(stats['bytes'] / 1024, 1)} KB")
+    print("📁 تم حفظ النتائج في dnmeg_resource_waterfall.json")
+
+if __name__ == "__main__":
+    main()
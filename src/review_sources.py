@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Review Sources
+مصادر المراجعات المحمّلة عبر XHR (Judge.me / Loox): جلب الصفحات بالتوازي وإرجاع المراجعات كمولّد بذاكرة محدودة
+"""
+
+import hashlib
+import json
+import random
+import re
+from urllib.parse import quote, urlparse
+
+from html_parser import make_soup
+
+# صفحات تُجلب معاً في كل دفعة، وحد أقصى للصفحات لكل منتج
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_PAGES = 200
+
+_PRODUCT_ID_PATTERNS = [
+    re.compile(r'"product"\s*:\s*\{\s*"id"\s*:\s*(\d+)'),
+    re.compile(r'data-product-id="(\d+)"'),
+    re.compile(r'class="jdgm-widget[^"]*"[^>]*data-id="(\d+)"'),
+]
+_SHOP_DOMAIN_PATTERN = re.compile(r'Shopify\.shop\s*=\s*["\']([\w.-]+)["\']')
+_LOOX_CLIENT_PATTERN = re.compile(r'loox\.io/widget/([\w-]+)/loox')
+_DIGITS = re.compile(r'(\d+(?:\.\d+)?)')
+# تاريخ مطلق = يحتوي سنة؛ "2 days ago" أو "منذ يومين" نص نسبي يتغير كل يوم
+_ABSOLUTE_DATE = re.compile(r'(?:19|20)\d{2}')
+
+
+def review_id(review, position=None):
+    """معرف ثابت للمراجعة: معرف تطبيق المراجعات إن وجد، وإلا الكاتب مع التاريخ المطلق أو الترتيب في الصفحة.
+    المحتوى والتاريخ النسبي ("منذ يومين") لا يدخلان المعرف: تغيرهما تعديل تكشفه بصمة المحتوى"""
+    if review.get('id'):
+        return str(review['id'])
+    date = str(review.get('date') or '')
+    anchor = date if _ABSOLUTE_DATE.search(date) else f'#{position}'
+    fingerprint = '\n'.join([review.get('source') or 'page', str(review.get('author') or ''), anchor])
+    return 'sha1:' + hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+
+def _text(element):
+    return element.get_text(' ', strip=True) if element is not None else ''
+
+
+class BoundedSample:
+    """عينة عشوائية بحجم ثابت (reservoir) من تدفق بطول غير معروف"""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.items = []
+        self._random = random.Random(seed)
+
+    def add(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            return
+        index = self._random.randrange(self.seen)
+        if index < self.size:
+            self.items[index] = item
+
+
+class ReviewSource:
+    """مصدر مراجعات مقسم لصفحات: page_url لكل صفحة و parse_page لتحويل الاستجابة لمراجعات"""
+
+    name = 'widget'
+    per_page = 10
+
+    def __init__(self, fetcher, product_url, product_id, concurrency=DEFAULT_CONCURRENCY, max_pages=DEFAULT_MAX_PAGES):
+        self.fetcher = fetcher
+        self.product_url = product_url
+        self.product_id = product_id
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.stats = {'pages': 0, 'reviews': 0, 'errors': 0}
+        # complete = وصلنا لآخر صفحة فعلاً؛ truncated = توقفنا عند max_pages؛ خطأ الجلب يترك الاثنين False
+        self.complete = False
+        self.truncated = False
+
+    def page_url(self, page):
+        raise NotImplementedError
+
+    def parse_page(self, result):
+        raise NotImplementedError
+
+    def reviews(self):
+        """مولّد المراجعات: كل دفعة صفحات تُجلب بالتوازي ثم تُرجع مراجعاتها بالترتيب وتُنسى.
+        نهاية المولّد لا تعني نهاية المراجعات: المستدعي يفحص complete / truncated / stats['errors']"""
+        self.complete = False
+        self.truncated = False
+        page = 1
+        # الدفعة تبدأ بصفحة واحدة وتتضاعف: التشغيل التزايدي الذي يتوقف مبكراً لا يجلب صفحات زائدة
+        batch = 1
+        while page <= self.max_pages:
+            pages = range(page, min(page + batch, self.max_pages + 1))
+            results = self.fetcher.fetch_many([self.page_url(number) for number in pages])
+            for result in results:
+                if result.error is not None or not result.ok:
+                    print(f"⚠️ فشل جلب صفحة مراجعات {self.name} لـ {self.product_url}: {result.error or result.status_code}")
+                    self.stats['errors'] += 1
+                    return
+                try:
+                    reviews = self.parse_page(result)
+                except (ValueError, KeyError) as e:
+                    print(f"⚠️ استجابة غير متوقعة من {self.name} لـ {self.product_url}: {e}")
+                    self.stats['errors'] += 1
+                    return
+                self.stats['pages'] += 1
+                for review in reviews:
+                    review['source'] = self.name
+                    self.stats['reviews'] += 1
+                    yield review
+                if len(reviews) < self.per_page:
+                    self.complete = True
+                    return
+            page += batch
+            batch = min(batch * 2, self.concurrency)
+        self.truncated = True
+
+
+class JudgeMeSource(ReviewSource):
+    """واجهة ودجت Judge.me العامة: JSON يحتوي HTML المراجعات لكل صفحة"""
+
+    name = 'judgeme'
+    api_url = 'https://judge.me/reviews/reviews_for_widget'
+
+    def __init__(self, fetcher, product_url, product_id, shop_domain, **kwargs):
+        super().__init__(fetcher, product_url, product_id, **kwargs)
+        self.shop_domain = shop_domain
+
+    def page_url(self, page):
+        shop = quote(self.shop_domain)
+        return (f"{self.api_url}?url={shop}&shop_domain={shop}&platform=shopify"
+                f"&page={page}&per_page={self.per_page}&product_id={self.product_id}")
+
+    def parse_page(self, result):
+        soup = make_soup(json.loads(result.text)['html'])
+        reviews = []
+        for item in soup.select('.jdgm-rev'):
+            rating = item.select_one('.jdgm-rev__rating')
+            timestamp = item.select_one('.jdgm-rev__timestamp')
+            reviews.append({
+                'id': item.get('data-review-id', ''),
+                'rating': int(float(rating.get('data-score', 0))) if rating is not None else '',
+                'title': _text(item.select_one('.jdgm-rev__title')),
+                'content': _text(item.select_one('.jdgm-rev__body')),
+                'author': _text(item.select_one('.jdgm-rev__author')),
+                'date': timestamp.get('data-content', '') if timestamp is not None else '',
+                'verified': item.get('data-verified-buyer') == 'true',
+                'helpful': int(item.get('data-thumb-up-count') or 0)
+            })
+        return reviews
+
+
+class LooxSource(ReviewSource):
+    """ودجت Loox: صفحات HTML مرقمة لكل منتج"""
+
+    name = 'loox'
+    api_url = 'https://loox.io/widget'
+    per_page = 20
+
+    def __init__(self, fetcher, product_url, product_id, client_id, **kwargs):
+        super().__init__(fetcher, product_url, product_id, **kwargs)
+        self.client_id = client_id
+
+    def page_url(self, page):
+        return f"{self.api_url}/{self.client_id}/reviews/{self.product_id}?page={page}&limit={self.per_page}"
+
+    def parse_page(self, result):
+        soup = make_soup(result.content)
+        reviews = []
+        for item in soup.select('[data-id].grid-item-wrap, [data-id].grid-item'):
+            stars = item.select_one('[aria-label*="star"], .stars')
+            rating_match = _DIGITS.search(stars.get('aria-label', '') if stars is not None else '')
+            reviews.append({
+                'id': item.get('data-id', ''),
+                'rating': int(float(rating_match.group(1))) if rating_match else '',
+                'title': '',
+                'content': _text(item.select_one('.main-text, .pre-wrap')),
+                'author': _text(item.select_one('.title, .block.title')),
+                'date': _text(item.select_one('.time, .date')),
+                'verified': item.select_one('.verified, .loox-icon-verified') is not None,
+                'helpful': 0
+            })
+        return reviews
+
+
+def detect_review_source(fetcher, product_url, html, **kwargs):
+    """اكتشاف تطبيق المراجعات من HTML صفحة المنتج، أو None إن كانت المراجعات داخل الصفحة فقط"""
+    product_id = None
+    for pattern in _PRODUCT_ID_PATTERNS:
+        match = pattern.search(html)
+        if match:
+            product_id = match.group(1)
+            break
+    if product_id is None:
+        return None
+
+    loox = _LOOX_CLIENT_PATTERN.search(html)
+    if loox:
+        return LooxSource(fetcher, product_url, product_id, loox.group(1), **kwargs)
+
+    if 'jdgm' in html:
+        shop = _SHOP_DOMAIN_PATTERN.search(html)
+        shop_domain = shop.group(1) if shop else urlparse(product_url).netloc
+        return JudgeMeSource(fetcher, product_url, product_id, shop_domain, **kwargs)
+    return None
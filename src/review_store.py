@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Review Store
+مخزن مراجعات دائم: كل مراجعة بمعرف وبصمة محتوى، وعلامة آخر مراجعة لكل منتج، وتجميعات محفوظة تُدمج بدل إعادة الحساب
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+REVIEW_STORE_ENV_VAR = 'DNMEG_REVIEW_STORE'
+DEFAULT_REVIEW_STORE_PATH = 'dnmeg_review_store.sqlite'
+
+
+def content_hash(review):
+    """بصمة ما يغير نتيجة التحليل (التقييم والعنوان والمحتوى): تغيرها يعني مراجعة معدلة"""
+    text = '\n'.join(str(review.get(field) or '') for field in ('rating', 'title', 'content'))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class ReviewStore:
+    def __init__(self, path=DEFAULT_REVIEW_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS reviews (
+                product_url TEXT,
+                review_id TEXT,
+                content_hash TEXT,
+                review TEXT,
+                matches TEXT,
+                has_complaint INTEGER,
+                first_seen REAL,
+                updated_at REAL,
+                PRIMARY KEY (product_url, review_id)
+            );
+            CREATE INDEX IF NOT EXISTS reviews_complaints ON reviews (has_complaint, updated_at);
+            CREATE TABLE IF NOT EXISTS products (
+                product_url TEXT PRIMARY KEY,
+                high_water_mark TEXT,
+                review_count INTEGER,
+                aggregate TEXT,
+                updated_at REAL,
+                full_scan_at REAL
+            );
+        """)
+        # مخازن أقدم بدون عمود آخر فحص كامل
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(products)")}
+        if 'full_scan_at' not in columns:
+            self._db.execute("ALTER TABLE products ADD COLUMN full_scan_at REAL")
+        self._db.commit()
+
+    def known(self, product_url):
+        """{review_id: content_hash} لمراجعات المنتج المخزنة"""
+        with self._lock:
+            rows = self._db.execute("SELECT review_id, content_hash FROM reviews WHERE product_url = ?", (product_url,)).fetchall()
+        return dict(rows)
+
+    def previous(self, product_url, review_id):
+        """المراجعة المخزنة ووسومها (لطرح مساهمتها القديمة عند التعديل)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT review, matches FROM reviews WHERE product_url = ? AND review_id = ?", (product_url, review_id)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), json.loads(row[1]) if row[1] else None
+
+    def page_reviews(self, product_url):
+        """{review_id: (review, matches)} للمراجعات المخزنة من HTML الصفحة نفسها (بدون مصدر ودجت)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT review_id, review, matches FROM reviews WHERE product_url = ? AND json_extract(review, '$.source') IS NULL",
+                (product_url,)
+            ).fetchall()
+        return {key: (json.loads(review), json.loads(matches) if matches else None) for key, review, matches in rows}
+
+    def delete_reviews(self, product_url, review_ids):
+        """حذف مراجعات اختفت (يُحفظ مع تجميع المنتج في save_product)"""
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM reviews WHERE product_url = ? AND review_id = ?", [(product_url, key) for key in review_ids]
+            )
+
+    def save_review(self, product_url, review, digest, matches, has_complaint):
+        now = time.time()
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(product_url, review_id) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    review = excluded.review,
+                    matches = excluded.matches,
+                    has_complaint = excluded.has_complaint,
+                    updated_at = excluded.updated_at
+            """, (
+                product_url,
+                review['id'],
+                digest,
+                json.dumps(review, ensure_ascii=False),
+                json.dumps(matches, ensure_ascii=False) if matches is not None else None,
+                int(has_complaint),
+                now,
+                now
+            ))
+
+    def product_state(self, product_url):
+        """(علامة آخر مراجعة، التجميع المحفوظ، وقت آخر فحص كامل) أو (None, None, None) لمنتج جديد"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT high_water_mark, aggregate, full_scan_at FROM products WHERE product_url = ?", (product_url,)
+            ).fetchone()
+        if row is None:
+            return None, None, None
+        return row[0], json.loads(row[1]) if row[1] else None, row[2]
+
+    def save_product(self, product_url, high_water_mark, aggregate, full_scan_at=None):
+        with self._lock:
+            review_count = self._db.execute(
+                "SELECT COUNT(*) FROM reviews WHERE product_url = ?", (product_url,)
+            ).fetchone()[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?)",
+                (product_url, high_water_mark, review_count, json.dumps(aggregate, ensure_ascii=False), time.time(), full_scan_at)
+            )
+            self._db.commit()
+        return review_count
+
+    def rollback(self):
+        """إلغاء مراجعات منتج فشل تحليله قبل حفظ تجميعه"""
+        with self._lock:
+            self._db.rollback()
+
+    def _placeholders(self, product_urls):
+        return ', '.join('?' for _ in product_urls)
+
+    def review_count(self, product_urls):
+        if not product_urls:
+            return 0
+        with self._lock:
+            return self._db.execute(
+                f"SELECT COUNT(*) FROM reviews WHERE product_url IN ({self._placeholders(product_urls)})", list(product_urls)
+            ).fetchone()[0]
+
+    def latest_reviews(self, product_urls, limit, complaints_only=False):
+        """أحدث المراجعات المخزنة (عينة المخرجات) مع وسومها"""
+        if not product_urls:
+            return []
+        query = f"SELECT review, matches FROM reviews WHERE product_url IN ({self._placeholders(product_urls)})"
+        if complaints_only:
+            query += " AND has_complaint = 1"
+        query += " ORDER BY updated_at DESC, rowid DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(query, list(product_urls) + [limit]).fetchall()
+        return [(json.loads(review), json.loads(matches) if matches else {}) for review, matches in rows]
+
+    def summary(self):
+        with self._lock:
+            reviews, products = self._db.execute(
+                "SELECT (SELECT COUNT(*) FROM reviews), (SELECT COUNT(*) FROM products)"
+            ).fetchone()
+        return {'reviews': reviews, 'products': products}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_review_store = None
+
+
+def get_review_store():
+    """مخزن المراجعات المشترك (DNMEG_REVIEW_STORE=مسار، أو فارغ لمخزن في الذاكرة فقط)"""
+    global _review_store
+    if _review_store is None:
+        path = os.environ.get(REVIEW_STORE_ENV_VAR, DEFAULT_REVIEW_STORE_PATH)
+        _review_store = ReviewStore(path or ':memory:')
+    return _review_store
@@ -4,22 +4,190 @@ DNM.EG Reviews & Inventory Analyzer
 تحليل شامل للمراجعات والتقييمات والمخزون والتوافر
 """
 
-import requests
-from bs4 import BeautifulSoup
 import json
 import time
-import random
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 import re
+from collections import Counter
+
+from http_client import FetchError, get_shared_fetcher
+from inventory_snapshots import (LOW_STOCK, RESTOCKED, SOLD_OUT, VARIANT_RESTOCKED, VARIANT_SOLD_OUT,
+                                 format_time, get_snapshot_store)
+from keyword_matcher import KeywordMatcher
+from page_store import get_page_store
+from review_sources import BoundedSample, detect_review_source, review_id
+from review_store import content_hash, get_review_store
+from url_inventory import SitemapDiscovery
+
+# كلمات المشاعر بالإنجليزية والعربية (* = أي كلمة تبدأ بها)
+SENTIMENT_LEXICON = {
+    'positive': [
+        'good', 'great', 'excellent', 'amazing', 'perfect*', 'love*', 'awesome', 'fantastic', 'wonderful', 'nice',
+        'happy', 'satisfied', 'comfortable', 'comfy', 'quality', 'fit', 'fits', 'style*', 'recommend*',
+        'ممتاز', 'رائع', 'جميل', 'حلو', 'جيد', 'جامد', 'تحفه', 'روعه', 'مريح', 'عجبني', 'انصح', 'جوده', 'مظبوط', 'شكرا'
+    ],
+    'negative': [
+        'bad', 'poor', 'terrible', 'awful', 'hate*', 'disappoint*', 'uncomfortable', 'cheap', 'wrong', 'small',
+        'large', 'tight', 'loose', 'defective', 'damaged', 'late', 'expensive', 'broken', 'refund*',
+        'سيء', 'سيئ', 'وحش', 'رديء', 'مش كويس', 'ضيق', 'واسع', 'غالي', 'متاخر', 'تالف', 'غلط', 'ندمت', 'مخيب'
+    ]
+}
+
+# فئات الشكاوى بالترتيب (الفئة الأولى المطابقة هي النوع الرئيسي للشكوى)
+COMPLAINT_LEXICON = {
+    'quality_issues': ['quality', 'defective', 'broken', 'poor quality', 'cheap material',
+                       'جوده', 'خامه', 'رديء', 'خامه وحشه', 'بيكش', 'باهت'],
+    'sizing_problems': ['size', 'sizes', 'small', 'large', 'tight', 'loose', 'fit', 'fits', 'sizing',
+                        'مقاس', 'مقاسات', 'ضيق', 'واسع', 'صغير', 'كبير'],
+    'shipping_delays': ['shipping', 'delivery', 'late', 'delay*', 'slow',
+                        'شحن', 'توصيل', 'تاخير', 'متاخر', 'اتاخر', 'مندوب'],
+    'customer_service': ['service', 'support', 'help', 'response', 'rude',
+                         'خدمه العملاء', 'دعم', 'محدش رد', 'تواصل'],
+    'price_concerns': ['price', 'expensive', 'overpriced', 'cost', 'value',
+                       'سعر', 'غالي', 'مكلف', 'فلوس'],
+    'product_damage': ['damaged', 'torn', 'ripped', 'stained', 'dirty',
+                       'تالف', 'مقطوع', 'مشقوق', 'متبقع', 'بقع', 'وسخ'],
+    'wrong_item': ['wrong', 'incorrect', 'different', 'not what', 'mistake',
+                   'غلط', 'خطا', 'مختلف', 'مش زي الصوره']
+}
+
+REVIEW_MATCHER = KeywordMatcher().add_lexicon(SENTIMENT_LEXICON).add_lexicon(COMPLAINT_LEXICON).build()
+
+# حدود العينات المحفوظة في المخرجات (الأعداد نفسها دقيقة دائماً)
+MAX_REVIEW_SAMPLES = 100
+MAX_PRODUCT_REVIEW_SAMPLES = 20
+MAX_COMPLAINT_DETAILS = 50
+
+# التوقف عند العلامة لا يرى تعديل أو حذف مراجعات الودجت الأقدم منها: فحص كامل لكل منتج مرة كل هذه المدة
+FULL_RESCAN_INTERVAL = 7 * 86400
+
+
+def classify_review(review):
+    """وسوم المراجعة من مرور واحد على نصها، أو None للمراجعة بدون محتوى"""
+    if not review.get('content'):
+        return None
+    return REVIEW_MATCHER.classify(review['content'] + ' ' + (review.get('title') or ''))
+
+
+def complaint_types(matches):
+    """فئات الشكاوى المطابقة بترتيب COMPLAINT_LEXICON"""
+    return [category for category in COMPLAINT_LEXICON if category in matches]
+
+
+def complaint_detail(review, matches):
+    issue_types = complaint_types(matches)
+    return {
+        'type': issue_types[0],
+        'types': issue_types,
+        'keywords': [phrase for issue_type in issue_types for phrase in matches[issue_type]],
+        'review_title': review.get('title', ''),
+        'review_content': review['content'][:100] + '...' if len(review['content']) > 100 else review['content'],
+        'rating': review.get('rating', 0)
+    }
+
+
+class ReviewAccumulator:
+    """تجميع تدريجي للمشاعر والشكاوى: كل مراجعة تُضاف (أو تُطرح عند تعديلها) ثم تُنسى، والتفاصيل عينة محدودة"""
+
+    def __init__(self, max_details=MAX_COMPLAINT_DETAILS):
+        self.counts = {'positive': 0, 'negative': 0, 'neutral': 0, 'total_analyzed': 0}
+        self.key_phrases = {'positive': Counter(), 'negative': Counter()}
+        self.complaint_counts = {category: 0 for category in COMPLAINT_LEXICON}
+        self.complaint_counts['other_issues'] = 0
+        self.with_complaints = 0
+        self.details = BoundedSample(max_details)
+
+    def add(self, review, matches=None, weight=1):
+        """weight=-1 يطرح مساهمة نسخة قديمة من المراجعة"""
+        if matches is None:
+            matches = classify_review(review)
+            if matches is None:
+                return
+        positive_phrases = matches.get('positive', [])
+        negative_phrases = matches.get('negative', [])
+        
+        if len(positive_phrases) > len(negative_phrases):
+            self.counts['positive'] += weight
+            self.key_phrases['positive'].update({phrase: weight for phrase in positive_phrases})
+        elif len(negative_phrases) > len(positive_phrases):
+            self.counts['negative'] += weight
+            self.key_phrases['negative'].update({phrase: weight for phrase in negative_phrases})
+        else:
+            self.counts['neutral'] += weight
+        self.counts['total_analyzed'] += weight
+        
+        # المراجعة الواحدة قد تشتكي من أكثر من شيء (المقاس والشحن معاً)
+        issue_types = complaint_types(matches)
+        for issue_type in issue_types:
+            self.complaint_counts[issue_type] += weight
+        
+        if issue_types:
+            self.with_complaints += weight
+            if weight > 0:
+                self.details.add(complaint_detail(review, matches))
+        elif (review.get('rating') or 5) <= 2:
+            self.complaint_counts['other_issues'] += weight
+
+    def merge(self, other):
+        for key, value in other.counts.items():
+            self.counts[key] += value
+        for polarity, counter in other.key_phrases.items():
+            self.key_phrases[polarity].update(counter)
+        for key, value in other.complaint_counts.items():
+            self.complaint_counts[key] = self.complaint_counts.get(key, 0) + value
+        self.with_complaints += other.with_complaints
+        for detail in other.details.items:
+            self.details.add(detail)
+        return self
+
+    def state(self):
+        """التجميع بصيغة JSON للحفظ (بدون عينة التفاصيل)"""
+        return {
+            'counts': self.counts,
+            'key_phrases': {polarity: dict(+counter) for polarity, counter in self.key_phrases.items()},
+            'complaint_counts': self.complaint_counts,
+            'with_complaints': self.with_complaints
+        }
+
+    @classmethod
+    def from_state(cls, state, max_details=MAX_COMPLAINT_DETAILS):
+        accumulator = cls(max_details)
+        if state:
+            accumulator.counts.update(state['counts'])
+            for polarity, phrases in state['key_phrases'].items():
+                accumulator.key_phrases[polarity].update(phrases)
+            accumulator.complaint_counts.update(state['complaint_counts'])
+            accumulator.with_complaints = state['with_complaints']
+        return accumulator
+
+    def sentiment(self):
+        sentiment = dict(self.counts)
+        sentiment['sentiment_score'] = 0
+        if sentiment['total_analyzed'] > 0:
+            sentiment['sentiment_score'] = (sentiment['positive'] - sentiment['negative']) / sentiment['total_analyzed']
+        # العبارات مرتبة حسب التكرار
+        sentiment['key_phrases'] = {
+            polarity: [phrase for phrase, count in counter.most_common() if count > 0]
+            for polarity, counter in self.key_phrases.items()
+        }
+        return sentiment
+
+    def complaints(self):
+        complaints = dict(self.complaint_counts)
+        complaints['complaint_details'] = list(self.details.items)
+        complaints['complaints_total'] = self.with_complaints
+        return complaints
+
 
 class ReviewsInventoryAnalyzer:
-    def __init__(self):
+    def __init__(self, fetcher=None, pages=None, store=None, snapshots=None):
         self.base_url = "https://dnmeg.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.pages = pages or get_page_store(self.fetcher)
+        self.store = store or get_review_store()
+        self.snapshots = snapshots or get_snapshot_store()
+        self.discovery = SitemapDiscovery(self.fetcher)
         self.analysis_data = {
             'reviews_analysis': {},
             'inventory_analysis': {},
@@ -129,115 +297,26 @@ class ReviewsInventoryAnalyzer:
         
         return summary
     
-    def analyze_sentiment(self, reviews):
-        """تحليل المشاعر في المراجعات"""
-        sentiment = {
-            'positive': 0,
-            'negative': 0,
-            'neutral': 0,
-            'total_analyzed': 0,
-            'sentiment_score': 0,
-            'key_phrases': {
-                'positive': [],
-                'negative': []
-            }
-        }
-        
-        # قائمة الكلمات الإيجابية والسلبية
-        positive_words = ['good', 'great', 'excellent', 'amazing', 'perfect', 'love', 'awesome', 'fantastic', 'wonderful', 'nice', 'happy', 'satisfied', 'comfortable', 'quality', 'fit', 'style']
-        negative_words = ['bad', 'poor', 'terrible', 'awful', 'hate', 'disappointed', 'uncomfortable', 'cheap', 'wrong', 'small', 'large', 'tight', 'loose', 'defective', 'damaged', 'late', 'expensive']
-        
+    def classify_reviews(self, reviews):
+        """مرور واحد على نص كل مراجعة يحدد المشاعر وكل فئات الشكاوى معاً"""
         for review in reviews:
-            if not review.get('content'):
-                continue
-            
-            content = review['content'].lower()
-            title = review.get('title', '').lower()
-            full_text = content + ' ' + title
-            
-            positive_count = sum(1 for word in positive_words if word in full_text)
-            negative_count = sum(1 for word in negative_words if word in full_text)
-            
-            if positive_count > negative_count:
-                sentiment['positive'] += 1
-                # استخراج العبارات الإيجابية
-                for word in positive_words:
-                    if word in full_text:
-                        sentiment['key_phrases']['positive'].append(word)
-            elif negative_count > positive_count:
-                sentiment['negative'] += 1
-                # استخراج العبارات السلبية
-                for word in negative_words:
-                    if word in full_text:
-                        sentiment['key_phrases']['negative'].append(word)
-            else:
-                sentiment['neutral'] += 1
-            
-            sentiment['total_analyzed'] += 1
-        
-        # حساب درجة المشاعر
-        if sentiment['total_analyzed'] > 0:
-            sentiment['sentiment_score'] = (sentiment['positive'] - sentiment['negative']) / sentiment['total_analyzed']
-        
-        # إزالة التكرار من العبارات
-        sentiment['key_phrases']['positive'] = list(set(sentiment['key_phrases']['positive']))
-        sentiment['key_phrases']['negative'] = list(set(sentiment['key_phrases']['negative']))
-        
-        return sentiment
+            matches = classify_review(review)
+            if matches is not None:
+                yield review, matches
+    
+    def analyze_sentiment(self, reviews, classified=None):
+        """تحليل المشاعر في المراجعات"""
+        accumulator = ReviewAccumulator()
+        for review, matches in classified if classified is not None else self.classify_reviews(reviews):
+            accumulator.add(review, matches)
+        return accumulator.sentiment()
     
-    def find_complaints(self, reviews):
+    def find_complaints(self, reviews, classified=None):
         """البحث عن الشكاوى المتكررة"""
-        complaints = {
-            'quality_issues': 0,
-            'sizing_problems': 0,
-            'shipping_delays': 0,
-            'customer_service': 0,
-            'price_concerns': 0,
-            'product_damage': 0,
-            'wrong_item': 0,
-            'other_issues': 0,
-            'complaint_details': []
-        }
-        
-        # كلمات مفتاحية للمشاكل
-        issue_keywords = {
-            'quality_issues': ['quality', 'defective', 'broken', 'poor quality', 'cheap material'],
-            'sizing_problems': ['size', 'small', 'large', 'tight', 'loose', 'fit', 'sizing'],
-            'shipping_delays': ['shipping', 'delivery', 'late', 'delay', 'slow'],
-            'customer_service': ['service', 'support', 'help', 'response', 'rude'],
-            'price_concerns': ['price', 'expensive', 'overpriced', 'cost', 'value'],
-            'product_damage': ['damaged', 'torn', 'ripped', 'stained', 'dirty'],
-            'wrong_item': ['wrong', 'incorrect', 'different', 'not what', 'mistake']
-        }
-        
-        for review in reviews:
-            if not review.get('content'):
-                continue
-            
-            content = review['content'].lower()
-            title = review.get('title', '').lower()
-            full_text = content + ' ' + title
-            
-            complaint_found = False
-            
-            for issue_type, keywords in issue_keywords.items():
-                if any(keyword in full_text for keyword in keywords):
-                    complaints[issue_type] += 1
-                    complaint_found = True
-                    
-                    # إضافة التفاصيل
-                    complaints['complaint_details'].append({
-                        'type': issue_type,
-                        'review_title': review.get('title', ''),
-                        'review_content': review['content'][:100] + '...' if len(review['content']) > 100 else review['content'],
-                        'rating': review.get('rating', 0)
-                    })
-                    break
-            
-            if not complaint_found and review.get('rating', 5) <= 2:
-                complaints['other_issues'] += 1
-        
-        return complaints
+        accumulator = ReviewAccumulator()
+        for review, matches in classified if classified is not None else self.classify_reviews(reviews):
+            accumulator.add(review, matches)
+        return accumulator.complaints()
     
     def check_stock_levels(self, soup, product_url):
         """فحص مستويات المخزون"""
@@ -333,60 +412,180 @@ class ReviewsInventoryAnalyzer:
         
         return out_of_stock
     
-    def monitor_restocks(self, out_of_stock_products):
-        """مراقبة إعادة التخزين"""
+    def monitor_restocks(self, out_of_stock_products, transitions=None):
+        """مراقبة إعادة التخزين من الفروق بين لقطات المخزون المتتالية"""
+        transitions = transitions or []
+        interval = self.snapshots.snapshot_interval()
         restock_monitoring = {
             'monitoring_active': True,
             'products_to_monitor': len(out_of_stock_products),
-            'restock_alerts': [],
-            'monitoring_frequency': 'daily',
+            'restock_alerts': [event for event in transitions if event['type'] in (RESTOCKED, VARIANT_RESTOCKED)],
+            'sold_out_alerts': [event for event in transitions if event['type'] in (SOLD_OUT, VARIANT_SOLD_OUT)],
+            'low_stock_alerts': [event for event in transitions if event['type'] == LOW_STOCK],
+            'monitoring_frequency': f'every {round(interval / 60)} min' if interval else 'first snapshot',
             'alert_methods': ['email', 'webhook'],
-            'restock_recommendations': []
+            'restock_recommendations': [],
+            'snapshot_store': self.snapshots.summary()
         }
         
         # توليد توصيات إعادة التخزين
+        now = time.time()
         for product in out_of_stock_products:
+            sold_out_at = self.snapshots.last_event(product['url'], SOLD_OUT)
+            daily_demand = self.snapshots.depletion_rate(product['url'])
+            # النفاد الحديث أو سحب مرصود للكمية = طلب حقيقي
+            urgent = (sold_out_at is not None and now - sold_out_at <= 7 * 86400) or daily_demand is not None
             recommendation = {
                 'product_url': product['url'],
-                'priority': 'high',
-                'action': 'Restock immediately',
-                'reason': 'Product is completely out of stock',
-                'suggested_quantity': random.randint(20, 50),
-                'estimated_demand': 'High based on out-of-stock status'
+                'priority': 'high' if urgent else 'medium',
+                'action': 'Restock immediately' if urgent else 'Review demand before restocking',
+                'reason': f"Sold out since {format_time(sold_out_at)}" if sold_out_at else 'Out of stock since the first snapshot',
+                'sold_out_since': format_time(sold_out_at),
+                'suggested_quantity': self.snapshots.suggested_quantity(product['url']),
+                'estimated_demand': (f'{daily_demand:.1f} units/day from observed stock levels' if daily_demand
+                                     else 'Unknown (no stock quantity history yet)')
             }
             restock_monitoring['restock_recommendations'].append(recommendation)
         
         return restock_monitoring
     
+    def product_reviews(self, url, page, inline=None, source=None):
+        """مولّد مراجعات المنتج: المعروضة في الصفحة ثم صفحات ودجت المراجعات (بدون تكرار)"""
+        seen = set()
+        if inline is None:
+            inline = self.extract_reviews(page.soup, url)['reviews']
+        streams = [inline] if source is None else [inline, source.reviews()]
+        for stream in streams:
+            for position, review in enumerate(stream):
+                key = review_id(review, position)
+                if key in seen:
+                    if review.get('id'):
+                        continue
+                    # نفس الكاتب ونفس اليوم: مراجعتان مختلفتان يميزهما الترتيب
+                    key = f'{key}:{position}'
+                seen.add(key)
+                review['id'] = key
+                yield review
+    
+    def ingest_product_reviews(self, url, page, inline=None):
+        """تحليل المراجعات الجديدة أو المعدلة فقط ودمجها في التجميع المحفوظ للمنتج"""
+        known = self.store.known(url)
+        high_water_mark, state, full_scan_at = self.store.product_state(url)
+        accumulator = ReviewAccumulator.from_state(state)
+        full_scan = full_scan_at is None or time.time() - full_scan_at >= FULL_RESCAN_INTERVAL
+        stats = {'new': 0, 'edited': 0, 'unchanged': 0, 'removed': 0, 'errors': 0, 'truncated': 0, 'full_scans': int(full_scan)}
+        page_review_ids = set()
+        widget_review_ids = set()
+        newest_widget_review = None
+        reached_mark = False
+        
+        source = detect_review_source(self.fetcher, url, page.text)
+        reviews = self.product_reviews(url, page, inline, source)
+        for review in reviews:
+            from_widget = review.get('source') is not None
+            (widget_review_ids if from_widget else page_review_ids).add(review['id'])
+            if from_widget and newest_widget_review is None:
+                newest_widget_review = review['id']
+            # الودجت يرتب الأحدث أولاً: كل ما بعد العلامة مخزن من تشغيل مكتمل سابق (إلا في الفحص الكامل)
+            at_mark = from_widget and not full_scan and high_water_mark is not None and review['id'] == high_water_mark
+            
+            digest = content_hash(review)
+            previous_digest = known.get(review['id'])
+            if previous_digest == digest:
+                stats['unchanged'] += 1
+            elif previous_digest is not None:
+                old_review, old_matches = self.store.previous(url, review['id'])
+                if old_matches is not None:
+                    accumulator.add(old_review, old_matches, weight=-1)
+                stats['edited'] += 1
+            else:
+                stats['new'] += 1
+            
+            if previous_digest != digest:
+                matches = classify_review(review)
+                if matches is not None:
+                    accumulator.add(review, matches)
+                self.store.save_review(url, review, digest, matches, bool(matches and complaint_types(matches)))
+            
+            if at_mark:
+                reached_mark = True
+                reviews.close()
+                break
+        
+        # مراجعات الصفحة التي لم تعد معروضة تُطرح من التجميع وتُحذف، فلا تتراكم الأعداد مع كل تشغيل
+        removed = {key: stored for key, stored in self.store.page_reviews(url).items() if key not in page_review_ids}
+        # وكذلك مراجعات الودجت التي لم تظهر في فحص كامل وصل لآخر صفحة
+        if full_scan and source is not None and source.complete:
+            for key in known.keys() - widget_review_ids - page_review_ids - removed.keys():
+                removed[key] = self.store.previous(url, key)
+        for old_review, old_matches in removed.values():
+            if old_matches is not None:
+                accumulator.add(old_review, old_matches, weight=-1)
+        self.store.delete_reviews(url, removed)
+        stats['removed'] = len(removed)
+        
+        if source is not None:
+            stats['errors'] = source.stats['errors']
+            stats['truncated'] = int(source.truncated)
+        
+        # العلامة تتقدم فقط إذا وصل الجلب لآخر الصفحات أو للعلامة السابقة؛
+        # التدفق المنقطع (خطأ أو max_pages) يبقي العلامة القديمة فيكمل التشغيل التالي الفجوة
+        if newest_widget_review is not None and (reached_mark or source.complete):
+            high_water_mark = newest_widget_review
+        # الفحص الكامل يُحتسب فقط إن اكتمل (أو لا يوجد ودجت أصلاً)، وإلا يُعاد في التشغيل التالي
+        if full_scan and (source is None or source.complete):
+            full_scan_at = time.time()
+        
+        total = self.store.save_product(url, high_water_mark, accumulator.state(), full_scan_at)
+        return accumulator, total, stats
+    
     def analyze_product_reviews(self, product_urls):
         """تحليل مراجعات المنتجات"""
-        all_reviews = []
+        accumulator = ReviewAccumulator()
+        incremental = {'new': 0, 'edited': 0, 'unchanged': 0, 'removed': 0, 'errors': 0, 'truncated': 0, 'full_scans': 0}
         product_reviews = {}
         
-        for url in product_urls:
+        # جلب صفحات المنتجات بالتوازي (أو من مخزن الصفحات)
+        pages = self.pages.get_many(product_urls)
+        
+        for url, page in zip(product_urls, pages):
             try:
-                response = self.session.get(url, timeout=10)
-                soup = BeautifulSoup(response.content, 'html.parser')
+                if page.response.error is not None:
+                    raise FetchError(page.response.error)
+                soup = page.soup
                 
+                # المراجعات تتدفق إلى المخزن والمجمِّع دون الاحتفاظ بها كلها في الذاكرة
                 reviews_data = self.extract_reviews(soup, url)
+                product_accumulator, total, stats = self.ingest_product_reviews(url, page, reviews_data['reviews'])
+                accumulator.merge(product_accumulator)
+                for key, value in stats.items():
+                    incremental[key] += value
+                
+                reviews_data['reviews'] = [review for review, _ in self.store.latest_reviews([url], MAX_PRODUCT_REVIEW_SAMPLES)]
+                reviews_data['total_reviews'] = total
+                reviews_data['has_reviews'] = total > 0
+                reviews_data['incremental'] = stats
                 product_reviews[url] = reviews_data
-                all_reviews.extend(reviews_data['reviews'])
                 
-                print(f"✅ تم تحليل المراجعات لـ: {url}")
+                print(f"✅ تم تحليل المراجعات لـ: {url} ({total} مراجعة، {stats['new']} جديدة، {stats['edited']} معدلة)")
                 
             except Exception as e:
+                self.store.rollback()
                 print(f"❌ خطأ في تحليل المراجعات لـ {url}: {e}")
         
-        # تحليل المشاعر
-        sentiment_analysis = self.analyze_sentiment(all_reviews)
-        
-        # البحث عن الشكاوى
-        complaints_analysis = self.find_complaints(all_reviews)
+        analyzed_urls = list(product_reviews)
+        complaints_analysis = accumulator.complaints()
+        complaints_analysis['complaint_details'] = [
+            complaint_detail(review, matches)
+            for review, matches in self.store.latest_reviews(analyzed_urls, MAX_COMPLAINT_DETAILS, complaints_only=True)
+        ]
         
         return {
             'product_reviews': product_reviews,
-            'all_reviews': all_reviews,
-            'sentiment_analysis': sentiment_analysis,
+            'all_reviews': [review for review, _ in self.store.latest_reviews(analyzed_urls, MAX_REVIEW_SAMPLES)],
+            'total_reviews': self.store.review_count(analyzed_urls),
+            'incremental': incremental,
+            'sentiment_analysis': accumulator.sentiment(),
             'complaints_analysis': complaints_analysis
         }
     
@@ -394,10 +593,14 @@ class ReviewsInventoryAnalyzer:
         """تحليل حالة المخزون"""
         all_stock_info = []
         
-        for url in product_urls:
+        # جلب صفحات المنتجات بالتوازي (أو من مخزن الصفحات)
+        pages = self.pages.get_many(product_urls)
+        
+        for url, page in zip(product_urls, pages):
             try:
-                response = self.session.get(url, timeout=10)
-                soup = BeautifulSoup(response.content, 'html.parser')
+                if page.response.error is not None:
+                    raise FetchError(page.response.error)
+                soup = page.soup
                 
                 stock_info = self.check_stock_levels(soup, url)
                 all_stock_info.append(stock_info)
@@ -410,8 +613,11 @@ class ReviewsInventoryAnalyzer:
         # البحث عن المنتجات النافدة
         out_of_stock_analysis = self.find_out_of_stock(all_stock_info)
         
+        # لقطة مخزون جديدة ومقارنتها بالسابقة
+        transitions = self.snapshots.record(all_stock_info)
+        
         # مراقبة إعادة التخزين
-        restock_monitoring = self.monitor_restocks(out_of_stock_analysis['out_of_stock_products'])
+        restock_monitoring = self.monitor_restocks(out_of_stock_analysis['out_of_stock_products'], transitions)
         
         return {
             'all_stock_info': all_stock_info,
@@ -423,30 +629,24 @@ class ReviewsInventoryAnalyzer:
         """تشغيل التحليل الشامل"""
         print("📊 بدء تحليل المراجعات والمخزون...")
         
-        # الحصول على روابط المنتجات
+        # الحصول على روابط المنتجات من جرد sitemap المشترك
         try:
-            response = self.session.get(f"{self.base_url}/collections/all", timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            product_links = []
-            for link in soup.find_all('a', href=True):
-                if '/products/' in link['href']:
-                    full_url = urljoin(self.base_url, link['href'])
-                    product_links.append(full_url)
-            
-            product_links = list(set(product_links))  # إزالة التكرار
-            
+            product_links = self.discovery.urls(self.base_url, 'product')
         except Exception as e:
-            print(f"❌ خطأ في الحصول على روابط المنتجات: {e}")
+            print(f"❌ خطأ في اكتشاف روابط المنتجات من sitemap: {e}")
             product_links = []
         
         if not product_links:
-            print("⚠️ لم يتم العثور على روابط المنتجات، استخدام روابط افتراضية")
-            product_links = [
-                f"{self.base_url}/products/tee-v1",
-                f"{self.base_url}/products/tee-v2",
-                f"{self.base_url}/products/jeans-1-9"
-            ]
+            print("⚠️ لم يتم العثور على منتجات في sitemap، استخدام روابط صفحة المجموعات")
+            try:
+                soup = self.pages.get(f"{self.base_url}/collections/all").soup
+                product_links = list(dict.fromkeys(
+                    urljoin(self.base_url, link['href'])
+                    for link in soup.find_all('a', href=True)
+                    if '/products/' in link['href']
+                ))
+            except Exception as e:
+                print(f"❌ خطأ في الحصول على روابط المنتجات: {e}")
         
         # تحليل المراجعات
         print("📝 تحليل المراجعات والتقييمات...")
@@ -533,7 +733,7 @@ class ReviewsInventoryAnalyzer:
         
         # تحليل المراجعات
         reviews = self.analysis_data.get('reviews_analysis', {})
-        print(f"📝 إجمالي المراجعات: {len(reviews.get('all_reviews', []))}")
+        print(f"📝 إجمالي المراجعات: {reviews.get('total_reviews', len(reviews.get('all_reviews', [])))}")
         
         sentiment = reviews.get('sentiment_analysis', {})
         print(f"😊 المراجعات الإيجابية: {sentiment.get('positive', 0)}")
@@ -4,30 +4,58 @@ DNM.EG Website Scraper
 تحليل موقع dnmeg.com باستخدام Python و BeautifulSoup
 """
 
-import requests
-from bs4 import BeautifulSoup
 import json
 import time
 from urllib.parse import urljoin, urlparse
 
+from crawl_frontier import CrawlFrontier, content_hash
+from html_parser import make_soup
+from http_client import get_shared_fetcher
+from page_store import get_page_store
+from url_inventory import SitemapDiscovery, get_url_inventory
+
+# Shopify يعيد حتى 250 منتج في كل صفحة من products.json
+CATALOG_PAGE_SIZE = 250
+
+# عدد صفحات المنتجات في كل دفعة متوازية قبل حفظ السجلات
+CRAWL_BATCH_SIZE = 20
+CHECKPOINT_DIR = 'dnmeg_crawl_state'
+
+# صفحات بلا lastmod في sitemap تُعاد بعد هذه المدة (بالثواني)
+UNDATED_REFETCH_AGE = 24 * 3600
+
 class DNMScraper:
-    def __init__(self):
+    def __init__(self, fetcher=None, pages=None, inventory=None):
         self.base_url = "https://dnmeg.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.pages = pages or get_page_store(self.fetcher)
+        # جرد الروابط المشترك من sitemap
+        self.inventory = inventory or get_url_inventory()
+        self.discovery = SitemapDiscovery(self.fetcher, self.inventory)
+        self.reused_records = 0
         
     def get_page(self, url):
         """الحصول على محتوى الصفحة"""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
+            page = self.pages.get(url)
+            page.response.raise_for_status()
+            return page.soup
         except Exception as e:
             print(f"Error fetching {url}: {e}")
             return None
     
+    def get_pages(self, urls):
+        """الحصول على عدة صفحات بالتوازي"""
+        pages = {}
+        for url, page in zip(urls, self.pages.get_many(urls)):
+            try:
+                page.response.raise_for_status()
+                pages[url] = page.soup
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                pages[url] = None
+        return pages
+    
     def extract_homepage_data(self, soup):
         """استخراج بيانات الصفحة الرئيسية"""
         data = {
@@ -72,10 +100,154 @@ class DNMScraper:
         
         return data
     
-    def scrape_site(self):
+    def fetch_catalog(self, collection=None, frontier=None):
+        """جلب الكتالوج كاملاً من واجهة Shopify JSON (حتى 250 منتج لكل طلب)"""
+        path = f"/collections/{collection}/products.json" if collection else "/products.json"
+        products = []
+        page = 1
+        
+        while True:
+            url = f"{self.base_url}{path}?limit={CATALOG_PAGE_SIZE}&page={page}"
+            if frontier is not None and frontier.is_done(url):
+                # صفحة مكتملة من تشغيل سابق
+                batch = frontier.record(url)['products']
+            else:
+                response = self.fetcher.fetch(url, headers={'Accept': 'application/json'})
+                response.raise_for_status()
+                batch = json.loads(response.content).get('products', [])
+                if frontier is not None:
+                    frontier.mark_done(url, {'products': batch}, content_hash(response.content))
+            products.extend(batch)
+            print(f"📄 صفحة الكتالوج {page}: {len(batch)} منتج")
+            
+            if len(batch) < CATALOG_PAGE_SIZE:
+                break
+            page += 1
+        
+        return products
+    
+    def catalog_product_to_record(self, product):
+        """تحويل منتج Shopify JSON لنفس شكل بيانات صفحة المنتج"""
+        variants = product.get('variants', [])
+        prices = [float(v['price']) for v in variants if v.get('price')]
+        compare_prices = [float(v['compare_at_price']) for v in variants if v.get('compare_at_price')]
+        description_html = product.get('body_html') or ''
+        
+        data = {
+            'name': product.get('title', ''),
+            'price': f"LE {min(prices):.2f}" if prices else '',
+            'description': make_soup(description_html).get_text(' ', strip=True) if description_html else '',
+            'images': [image['src'] for image in product.get('images', []) if image.get('src')],
+            'specifications': {option['name']: option.get('values', []) for option in product.get('options', [])},
+            'availability': 'In stock' if any(v.get('available') for v in variants) else 'Sold out',
+            'reviews': [],
+            'url': urljoin(self.base_url, f"/products/{product.get('handle', '')}"),
+            'product_id': product.get('id'),
+            'handle': product.get('handle', ''),
+            'product_type': product.get('product_type', ''),
+            'tags': product.get('tags', []),
+            'compare_at_price': f"LE {max(compare_prices):.2f}" if compare_prices else '',
+            'updated_at': product.get('updated_at', ''),
+            'variants': []
+        }
+        
+        # المتغيرات (المقاسات/الألوان) مع حالة التوفر
+        for variant in variants:
+            data['variants'].append({
+                'id': variant.get('id'),
+                'title': variant.get('title', ''),
+                'sku': variant.get('sku', ''),
+                'price': variant.get('price', ''),
+                'compare_at_price': variant.get('compare_at_price'),
+                'available': bool(variant.get('available')),
+                'options': [variant.get(f'option{i}') for i in (1, 2, 3) if variant.get(f'option{i}')]
+            })
+        
+        return data
+    
+    def load_previous_records(self, path='dnmeg_analysis.json'):
+        """سجلات المنتجات من التشغيل السابق (صفحات HTML فقط) حسب الرابط"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if previous.get('analysis_summary', {}).get('products_source') != 'html':
+            return {}
+        return {record['url']: record for record in previous.get('products', []) if record.get('url')}
+    
+    def scrape_product_pages(self, homepage, frontier=None, sitemap_urls=None):
+        """تحليل صفحات المنتجات HTML من sitemap وروابط الصفحة الرئيسية"""
+        product_urls = list(sitemap_urls or [])
+        if homepage:
+            product_urls += [
+                urljoin(self.base_url, link['href'])
+                for link in homepage.find_all('a', href=True)
+                if '/products/' in link['href']
+            ]
+        unique_urls = list(dict.fromkeys(product_urls))
+        records = {}
+        
+        # إعادة استخدام سجلات المنتجات التي لم يتغير lastmod لها منذ آخر جلب
+        previous = self.load_previous_records()
+        due = set(self.inventory.due(unique_urls, max_age=UNDATED_REFETCH_AGE))
+        for url in unique_urls:
+            if url not in due and url in previous:
+                records[url] = previous[url]
+        self.reused_records = len(records)
+        
+        if frontier is not None:
+            frontier.enqueue([url for url in unique_urls if url not in records])
+            for url in unique_urls:
+                if frontier.is_done(url):
+                    records[url] = frontier.record(url)
+        
+        # جلب كل منتج مرة واحدة بالتوازي على دفعات، وحفظ كل سجل فور اكتماله
+        pending = [url for url in unique_urls if url not in records]
+        for i in range(0, len(pending), CRAWL_BATCH_SIZE):
+            batch = pending[i:i + CRAWL_BATCH_SIZE]
+            if frontier is not None:
+                frontier.mark_in_flight(batch)
+            
+            for url, page in zip(batch, self.pages.get_many(batch)):
+                print(f"🔍 تحليل المنتج: {url}")
+                try:
+                    page.response.raise_for_status()
+                    record = self.extract_product_data(page.soup)
+                    record['url'] = url
+                except Exception as e:
+                    print(f"Error fetching {url}: {e}")
+                    if frontier is not None:
+                        frontier.mark_failed(url, e)
+                    continue
+                
+                records[url] = record
+                self.inventory.mark_fetched([url])
+                if frontier is not None:
+                    frontier.mark_done(url, record, content_hash(page.content))
+        
+        # الحفاظ على ترتيب الروابط كما ظهرت في sitemap والصفحة
+        return [dict(records[url]) for url in unique_urls if url in records]
+    
+    def scrape_site(self, use_catalog=True, collection=None, checkpoint_dir=CHECKPOINT_DIR):
         """الوظيفة الرئيسية للتحليل"""
         print("🚀 بدء تحليل موقع dnmeg.com...")
         
+        # نقاط الحفظ لاستئناف الزحف إذا توقف التشغيل السابق
+        frontier = CrawlFrontier(checkpoint_dir) if checkpoint_dir else None
+        if frontier is not None and frontier.state:
+            summary = frontier.summary()
+            print(f"♻️ استئناف الزحف: {summary['done']} رابط مكتمل، {len(frontier.pending())} متبقي")
+        
+        # اكتشاف الروابط من sitemap (الجرد المشترك بين كل المحللات)
+        sitemap_products = []
+        try:
+            self.discovery.ensure_fresh(self.base_url)
+            sitemap_products = self.inventory.urls(urlparse(self.base_url).netloc, 'product')
+            print(f"🗺️ {len(sitemap_products)} منتج في sitemap")
+        except Exception as e:
+            print(f"⚠️ تعذر اكتشاف الروابط من sitemap: {e}")
+        
         # تحليل الصفحة الرئيسية
         print("📊 تحليل الصفحة الرئيسية...")
         homepage = self.get_page(self.base_url)
@@ -83,24 +255,21 @@ class DNMScraper:
             homepage_data = self.extract_homepage_data(homepage)
             print(f"✅ تم العثور على {len(homepage_data['products'])} منتج في الصفحة الرئيسية")
         
-        # تحليل صفحات المنتجات
+        # تحليل المنتجات: كتالوج JSON أولاً ثم صفحات HTML كبديل
         print("📦 تحليل صفحات المنتجات...")
         products_data = []
+        products_source = 'html'
         
-        # الحصول على روابط المنتجات
-        if homepage:
-            product_links = homepage.find_all('a', href=True)
-            for link in product_links:
-                if '/products/' in link['href']:
-                    product_url = urljoin(self.base_url, link['href'])
-                    print(f"🔍 تحليل المنتج: {product_url}")
-                    
-                    product_page = self.get_page(product_url)
-                    if product_page:
-                        product_data = self.extract_product_data(product_page)
-                        products_data.append(product_data)
-                    
-                    time.sleep(1)  # تأخير لمنع الحظر
+        if use_catalog:
+            try:
+                products_data = [self.catalog_product_to_record(product) for product in self.fetch_catalog(collection, frontier)]
+                products_source = 'catalog_json'
+            except Exception as e:
+                print(f"⚠️ تعذر جلب كتالوج JSON، الرجوع لصفحات HTML: {e}")
+        
+        if not products_data and (homepage or sitemap_products):
+            products_data = self.scrape_product_pages(homepage, frontier, sitemap_products)
+            products_source = 'html'
         
         # حفظ البيانات
         final_data = {
@@ -110,14 +279,28 @@ class DNMScraper:
             'total_products': len(products_data),
             'analysis_summary': {
                 'homepage_products': len(homepage_data['products']) if homepage else 0,
-                'total_products_found': len(products_data)
+                'total_products_found': len(products_data),
+                'products_source': products_source,
+                'sitemap_products': len(sitemap_products)
             }
         }
+        if products_source == 'html':
+            final_data['analysis_summary']['reused_unchanged'] = self.reused_records
+        if self.fetcher.cache is not None:
+            final_data['analysis_summary']['http_cache'] = dict(self.fetcher.cache.stats)
+        if self.fetcher.ledger is not None:
+            final_data['analysis_summary']['fetch_errors'] = self.fetcher.ledger.summary()
+        if hasattr(self.fetcher.rate_limiter, 'summary'):
+            final_data['analysis_summary']['rate_limits'] = self.fetcher.rate_limiter.summary()
         
         # حفظ في ملف JSON
         with open('dnmeg_analysis.json', 'w', encoding='utf-8') as f:
             json.dump(final_data, f, ensure_ascii=False, indent=2)
         
+        # اكتمل التشغيل: لا حاجة لنقاط الحفظ
+        if frontier is not None:
+            frontier.reset()
+        
         print(f"✅ تم تحليل {len(products_data)} منتج بنجاح!")
         print("📁 تم حفظ البيانات في dnmemeg_analysis.json")
         
@@ -176,6 +359,17 @@ def main():
     print("📊 ملخص التحليل:")
     print(f"📦 إجمالي المنتجات: {results['total_products']}")
     print(f"🏠 منتجات الصفحة الرئيسية: {results['analysis_summary']['homepage_products']}")
+    print(f"🗂️ مصدر المنتجات: {results['analysis_summary']['products_source']}")
+    if 'reused_unchanged' in results['analysis_summary']:
+        print(f"♻️ منتجات لم تتغير (بدون إعادة جلب): {results['analysis_summary']['reused_unchanged']}")
+    if 'http_cache' in results['analysis_summary']:
+        cache_stats = results['analysis_summary']['http_cache']
+        print(f"💾 كاش HTTP: {cache_stats['hits']} صالح، {cache_stats['revalidated']} أعيد التحقق (304)، {cache_stats['misses']} جديد")
+    fetch_errors = results['analysis_summary'].get('fetch_errors')
+    if fetch_errors and fetch_errors['urls_failed']:
+        print(f"❌ روابط فشلت: {fetch_errors['urls_failed']} ({fetch_errors['by_kind']})، محاولات معادة: {fetch_errors['retried']}")
+    for host, limits in results['analysis_summary'].get('rate_limits', {}).items():
+        print(f"🚦 {host}: {limits['rate']} طلب/ثانية، {limits['throttled']} رد 429/503")
     print(f"📈 وقت التحليل: {results['scrape_time']}")
     print("="*50)
 
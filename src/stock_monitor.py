@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+DNM.EG Stock Monitor
+مراقب مخزون دائم: كل منتج بجدول فحص خاص في طابور أولويات؛ المنتجات سريعة البيع أو المتغيرة تُفحص أكثر والمستقرة تتباطأ
+"""
+
+import argparse
+import heapq
+import json
+import random
+import time
+
+from html_parser import make_soup
+from http_client import get_shared_fetcher
+from inventory_snapshots import format_time
+from reviews_inventory_analyzer import ReviewsInventoryAnalyzer
+
+# الفواصل بالثواني
+MIN_INTERVAL = 120
+BASE_INTERVAL = 1800
+MAX_INTERVAL = 6 * 3600
+BACKOFF_FACTOR = 1.5
+MAX_BATCH = 20
+MAX_ALERTS = 200
+
+
+class StockMonitor:
+    def __init__(self, product_urls, analyzer=None, min_interval=MIN_INTERVAL, base_interval=BASE_INTERVAL,
+                 max_interval=MAX_INTERVAL, backoff=BACKOFF_FACTOR, max_batch=MAX_BATCH, output='dnmeg_stock_monitor.json'):
+        self.analyzer = analyzer or ReviewsInventoryAnalyzer()
+        self.fetcher = self.analyzer.fetcher
+        self.snapshots = self.analyzer.snapshots
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_batch = max_batch
+        self.output = output
+        self.products = {}
+        self.alerts = []
+        self.stats = {'requests': 0, 'errors': 0, 'transitions': 0}
+        self._queue = []
+
+        # توزيع الفحص الأول على الفاصل الأساسي بدل موجة واحدة
+        now = time.time()
+        for index, url in enumerate(dict.fromkeys(product_urls)):
+            due = now + base_interval * index / max(1, len(product_urls)) if index else now
+            self.products[url] = {'interval': base_interval, 'next_due': due, 'polls': 0, 'changes': 0, 'errors': 0, 'last_checked': None}
+            heapq.heappush(self._queue, (due, url))
+
+    def next_interval(self, state, stock_info, changed):
+        """الفاصل التالي: تغير أو مخزون منخفض يقصّره، والاستقرار يمدده، ومعدل البيع المرصود يحدّه"""
+        if changed:
+            interval = self.min_interval
+        elif stock_info.get('low_stock_warning'):
+            interval = state['interval'] / 2
+        else:
+            interval = state['interval'] * self.backoff
+
+        # فحص أربع مرات على الأقل قبل النفاد المتوقع
+        quantity = stock_info.get('stock_quantity')
+        daily_demand = self.snapshots.depletion_rate(stock_info['product_url'])
+        if quantity and daily_demand and not stock_info.get('out_of_stock'):
+            interval = min(interval, quantity / daily_demand * 86400 / 4)
+
+        # عشوائية صغيرة حتى لا تتزامن الفحوص في موجات
+        interval *= random.uniform(0.9, 1.1)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _schedule(self, url, interval):
+        state = self.products[url]
+        state['interval'] = interval
+        state['next_due'] = time.time() + interval
+        heapq.heappush(self._queue, (state['next_due'], url))
+
+    def poll(self, urls):
+        """فحص دفعة روابط مستحقة وتسجيل لقطتها وإعادة جدولتها"""
+        results = self.fetcher.fetch_many(urls, use_cache=False)
+        self.stats['requests'] += len(urls)
+
+        all_stock_info = []
+        for url, result in zip(urls, results):
+            state = self.products[url]
+            state['polls'] += 1
+            state['last_checked'] = format_time(time.time())
+            if not result.ok:
+                state['errors'] += 1
+                self.stats['errors'] += 1
+                self._schedule(url, min(self.max_interval, state['interval'] * 2))
+                continue
+            all_stock_info.append(self.analyzer.check_stock_levels(make_soup(result.content), url))
+
+        # دفعة جزئية: لا تُحتسب لقطة كتالوج (فاصل monitoring_frequency في المحلل)
+        transitions = self.snapshots.record(all_stock_info, catalog=False)
+        changed_urls = {event['product_url'] for event in transitions}
+        for event in transitions:
+            self.products[event['product_url']]['changes'] += 1
+            self.alerts.append(event)
+            variant = f" ({event['variant']})" if event['variant'] else ''
+            print(f"🔔 {event['type']}: {event['product_url']}{variant} @ {event['at']}")
+        self.stats['transitions'] += len(transitions)
+        del self.alerts[:-MAX_ALERTS]
+
+        for stock_info in all_stock_info:
+            url = stock_info['product_url']
+            self._schedule(url, self.next_interval(self.products[url], stock_info, url in changed_urls))
+        return transitions
+
+    def run(self, duration=None, max_polls=None):
+        """حلقة المراقبة حتى انتهاء المدة أو عدد الفحوص أو Ctrl+C"""
+        started = time.time()
+        polls = 0
+        try:
+            while self._queue:
+                if duration is not None and time.time() - started >= duration:
+                    break
+                if max_polls is not None and polls >= max_polls:
+                    break
+                due, _ = self._queue[0]
+                wait = due - time.time()
+                if wait > 0:
+                    if duration is not None:
+                        wait = min(wait, started + duration - time.time())
+                    time.sleep(max(0, wait))
+                    continue
+
+                # كل ما استحق الآن يُجلب معاً
+                batch = []
+                now = time.time()
+                while self._queue and self._queue[0][0] <= now and len(batch) < self.max_batch:
+                    _, url = heapq.heappop(self._queue)
+                    if url not in batch:
+                        batch.append(url)
+                self.poll(batch)
+                polls += len(batch)
+                self.save(started)
+        except KeyboardInterrupt:
+            print("\n⏹️ تم إيقاف المراقبة")
+        return self.save(started)
+
+    def summary(self, started):
+        elapsed = max(time.time() - started, 1e-9)
+        # فحص كل المنتجات بأقصر فاصل طوال المدة نفسها
+        blanket = len(self.products) * max(1, int(elapsed // self.min_interval) + 1)
+        return {
+            'started_at': format_time(started),
+            'elapsed_s': round(elapsed, 1),
+            'products': len(self.products),
+            **self.stats,
+            'blanket_requests': blanket,
+            'requests_saved_pct': round((1 - self.stats['requests'] / blanket) * 100, 1) if blanket else 0,
+            'schedule': {
+                url: {
+                    'interval_s': round(state['interval']),
+                    'next_check': format_time(state['next_due']),
+                    'polls': state['polls'],
+                    'changes': state['changes'],
+                    'errors': state['errors'],
+                    'last_checked': state['last_checked']
+                }
+                for url, state in sorted(self.products.items(), key=lambda item: item[1]['interval'])
+            },
+            'alerts': self.alerts
+        }
+
+    def save(self, started):
+        summary = self.summary(started)
+        with open(self.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+def main():
+    """الوظيفة الرئيسية"""
+    parser = argparse.ArgumentParser(description='Adaptive stock monitor for dnmeg.com products')
+    parser.add_argument('--url', action='append', help='product URL to monitor (repeatable, default: all products from the sitemap)')
+    parser.add_argument('--min-interval', type=float, default=MIN_INTERVAL, help='seconds')
+    parser.add_argument('--base-interval', type=float, default=BASE_INTERVAL, help='seconds')
+    parser.add_argument('--max-interval', type=float, default=MAX_INTERVAL, help='seconds')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds (default: run until Ctrl+C)')
+    parser.add_argument('--max-polls', type=int)
+    parser.add_argument('--output', default='dnmeg_stock_monitor.json')
+    args = parser.parse_args()
+
+    analyzer = ReviewsInventoryAnalyzer(get_shared_fetcher())
+    product_urls = args.url or analyzer.discovery.urls(analyzer.base_url, 'product')
+    if not product_urls:
+        print("❌ لا توجد منتجات للمراقبة")
+        return
+
+    print(f"👀 مراقبة {len(product_urls)} منتج (فاصل {args.min_interval:.0f}–{args.max_interval:.0f} ثانية)")
+    monitor = StockMonitor(product_urls, analyzer, min_interval=args.min_interval, base_interval=args.base_interval,
+                           max_interval=args.max_interval, output=args.output)
+    summary = monitor.run(duration=args.duration, max_polls=args.max_polls)
+
+    print(f"📊 الطلبات: {summary['requests']} (بدلاً من {summary['blanket_requests']} بالفحص الشامل، توفير {summary['requests_saved_pct']}%)")
+    print(f"🔔 التغيرات المرصودة: {summary['transitions']}")
+    print(f"📁 تم حفظ الحالة في {args.output}")
+
+if __name__ == "__main__":
+    main()
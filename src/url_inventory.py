@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+DNM.EG URL Inventory
+اكتشاف روابط الموقع من sitemap.xml وملفاته الفرعية بتحليل متدفق، مع جرد مشترك يجدول إعادة جلب الروابط المتغيرة فقط
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlparse
+
+from http_client import get_shared_fetcher
+
+INVENTORY_ENV_VAR = 'DNMEG_URL_INVENTORY'
+DEFAULT_INVENTORY_PATH = 'dnmeg_url_inventory.sqlite'
+
+# عمر الاكتشاف قبل إعادة قراءة sitemap (بالثواني)
+DISCOVERY_MAX_AGE = 3600
+# حد أقصى لعدد ملفات sitemap في التشغيل الواحد
+MAX_SITEMAPS = 1000
+UPSERT_BATCH_SIZE = 500
+
+URL_KINDS = [
+    ('product', '/products/'),
+    ('collection', '/collections/'),
+    ('blog', '/blogs/'),
+    ('page', '/pages/')
+]
+
+
+def parse_lastmod(value):
+    """تحويل lastmod (صيغة W3C: تاريخ فقط أو تاريخ ووقت) إلى طابع زمني UTC"""
+    if not value:
+        return None
+    value = value.strip().replace('Z', '+00:00')
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def url_kind(url):
+    path = urlparse(url).path
+    for kind, marker in URL_KINDS:
+        if marker in path:
+            return kind
+    return 'other'
+
+
+class SitemapStreamParser:
+    """تحليل sitemap تدريجياً: يُغذى بالدفعات ويعيد كل مدخل فور اكتماله ثم يحرره من الذاكرة"""
+
+    def __init__(self, gzipped=False):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        # ملفات ‎.xml.gz تصل مضغوطة كملف (وليس بترميز نقل)
+        self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        self._root = None
+        self.kind = None
+
+    def feed(self, chunk):
+        if self._inflate is not None:
+            chunk = self._inflate.decompress(chunk)
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self):
+        if self._inflate is not None:
+            self._parser.feed(self._inflate.flush())
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self):
+        """المدخلات المكتملة: [(نوع 'url' أو 'sitemap', loc, lastmod)]"""
+        entries = []
+        for event, element in self._parser.read_events():
+            tag = element.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if self._root is None:
+                    self._root = element
+                    self.kind = tag
+                continue
+            if tag not in ('url', 'sitemap') or element is self._root:
+                continue
+            fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in element}
+            if fields.get('loc'):
+                entries.append((tag, fields['loc'], fields.get('lastmod') or None))
+            # تحرير العنصر المكتمل حتى لا تنمو الشجرة مع حجم الملف
+            try:
+                self._root.remove(element)
+            except ValueError:
+                element.clear()
+        return entries
+
+
+class UrlInventory:
+    def __init__(self, path=DEFAULT_INVENTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                host TEXT,
+                kind TEXT,
+                lastmod REAL,
+                lastmod_raw TEXT,
+                sitemap TEXT,
+                first_seen REAL,
+                last_seen REAL,
+                fetched_lastmod REAL,
+                fetched_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS urls_host_kind ON urls (host, kind);
+            CREATE INDEX IF NOT EXISTS urls_sitemap ON urls (sitemap);
+            CREATE TABLE IF NOT EXISTS sitemaps (
+                url TEXT PRIMARY KEY,
+                lastmod REAL,
+                fetched_at REAL,
+                url_count INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS discoveries (
+                host TEXT PRIMARY KEY,
+                started_at REAL,
+                finished_at REAL
+            );
+        """)
+        self._db.commit()
+
+    def upsert_urls(self, entries, sitemap, seen_at):
+        """إضافة/تحديث روابط من sitemap: [(loc, lastmod_raw)]"""
+        rows = [
+            (url, urlparse(url).netloc, url_kind(url), parse_lastmod(lastmod), lastmod, sitemap, seen_at, seen_at)
+            for url, lastmod in entries
+        ]
+        with self._lock:
+            self._db.executemany("""
+                INSERT INTO urls (url, host, kind, lastmod, lastmod_raw, sitemap, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    lastmod = excluded.lastmod,
+                    lastmod_raw = excluded.lastmod_raw,
+                    sitemap = excluded.sitemap,
+                    last_seen = excluded.last_seen
+            """, rows)
+            self._db.commit()
+        return len(rows)
+
+    def touch_sitemap_urls(self, sitemap, seen_at):
+        """sitemap لم يتغير (أو تعذر جلبه): روابطه السابقة ما زالت قائمة"""
+        with self._lock:
+            count = self._db.execute("UPDATE urls SET last_seen = ? WHERE sitemap = ?", (seen_at, sitemap)).rowcount
+            self._db.commit()
+        return count
+
+    def sitemap_state(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT lastmod, fetched_at, url_count FROM sitemaps WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {'lastmod': row[0], 'fetched_at': row[1], 'url_count': row[2]}
+
+    def record_sitemap(self, url, lastmod, fetched_at, url_count):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sitemaps VALUES (?, ?, ?, ?)", (url, lastmod, fetched_at, url_count))
+            self._db.commit()
+
+    def record_discovery(self, host, started_at, finished_at):
+        """تسجيل اكتشاف مكتمل (بداية الاكتشاف هي حد الروابط الحالية)"""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO discoveries VALUES (?, ?, ?)", (host, started_at, finished_at))
+            self._db.commit()
+
+    def last_discovery(self, host):
+        """آخر اكتشاف مكتمل: {'started_at', 'finished_at'} أو None"""
+        with self._lock:
+            row = self._db.execute("SELECT started_at, finished_at FROM discoveries WHERE host = ?", (host,)).fetchone()
+        if row is None:
+            return None
+        return {'started_at': row[0], 'finished_at': row[1]}
+
+    def _live_filter(self, host, kind):
+        """شرط الروابط الموجودة في آخر اكتشاف مكتمل للمضيف"""
+        query = " FROM urls WHERE host = ?"
+        params = [host]
+        discovery = self.last_discovery(host)
+        if discovery is not None:
+            query += " AND last_seen >= ?"
+            params.append(discovery['started_at'])
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        return query, params
+
+    def urls(self, host, kind=None, limit=None):
+        """الروابط الحالية للمضيف، الأحدث تعديلاً أولاً"""
+        query, params = self._live_filter(host, kind)
+        query = "SELECT url" + query + " ORDER BY lastmod IS NULL, lastmod DESC, url"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [row[0] for row in self._db.execute(query, params).fetchall()]
+
+    def removed(self, host, kind=None):
+        """روابط اختفت من sitemap منذ آخر اكتشاف مكتمل"""
+        discovery = self.last_discovery(host)
+        if discovery is None:
+            return []
+        query = "SELECT url FROM urls WHERE host = ? AND last_seen < ?"
+        params = [host, discovery['started_at']]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            return [row[0] for row in self._db.execute(query, params).fetchall()]
+
+    def due(self, urls, max_age=None):
+        """الروابط التي تحتاج إعادة جلب: جديدة، أو lastmod أحدث من آخر جلب، أو بلا lastmod وأقدم من max_age"""
+        now = time.time()
+        due = []
+        with self._lock:
+            for url in urls:
+                row = self._db.execute(
+                    "SELECT lastmod, fetched_lastmod, fetched_at FROM urls WHERE url = ?", (url,)
+                ).fetchone()
+                if row is None or row[2] is None:
+                    due.append(url)
+                    continue
+                lastmod, fetched_lastmod, fetched_at = row
+                if lastmod is not None:
+                    if fetched_lastmod is None or lastmod > fetched_lastmod:
+                        due.append(url)
+                elif max_age is not None and now - fetched_at > max_age:
+                    due.append(url)
+        return due
+
+    def mark_fetched(self, urls, fetched_at=None):
+        """تسجيل جلب الروابط بنسخة lastmod الحالية"""
+        fetched_at = fetched_at or time.time()
+        rows = [(fetched_at, url) for url in urls]
+        with self._lock:
+            self._db.executemany("UPDATE urls SET fetched_lastmod = lastmod, fetched_at = ? WHERE url = ?", rows)
+            # روابط من خارج sitemap (مثل روابط الصفحة الرئيسية) تُسجل أيضاً حتى لا تُجلب كل مرة
+            self._db.executemany("""
+                INSERT OR IGNORE INTO urls (url, host, kind, first_seen, fetched_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(url, urlparse(url).netloc, url_kind(url), fetched_at, fetched_at) for url in urls])
+            self._db.commit()
+
+    def summary(self, host):
+        query, params = self._live_filter(host, None)
+        with self._lock:
+            rows = self._db.execute("SELECT kind, COUNT(*)" + query + " GROUP BY kind", params).fetchall()
+        return {kind: count for kind, count in rows}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SitemapDiscovery:
+    def __init__(self, fetcher=None, inventory=None, max_sitemaps=MAX_SITEMAPS):
+        self.fetcher = fetcher or get_shared_fetcher()
+        self.inventory = inventory or get_url_inventory()
+        self.max_sitemaps = max_sitemaps
+        self.stats = {'sitemaps_fetched': 0, 'sitemaps_skipped': 0, 'sitemaps_failed': 0, 'urls_seen': 0}
+
+    def sitemap_roots(self, base_url):
+        """ملفات sitemap المعلنة في robots.txt، وإلا ‎/sitemap.xml"""
+        roots = []
+        try:
+            robots = self.fetcher.fetch(urljoin(base_url, '/robots.txt'))
+            if robots.status_code < 400:
+                for line in robots.text.splitlines():
+                    if line.lower().startswith('sitemap:'):
+                        roots.append(line.split(':', 1)[1].strip())
+        except Exception as e:
+            print(f"⚠️ تعذر قراءة robots.txt: {e}")
+        return list(dict.fromkeys(roots)) or [urljoin(base_url, '/sitemap.xml')]
+
+    async def _read_sitemap(self, url, seen_at):
+        """قراءة sitemap واحد بالتدفق: الروابط تُكتب في الجرد دفعة بدفعة، وتعاد الملفات الفرعية"""
+        parser = SitemapStreamParser(gzipped=urlparse(url).path.endswith('.gz'))
+        children = []
+        batch = []
+        counts = {'urls': 0}
+
+        def flush():
+            if batch:
+                counts['urls'] += self.inventory.upsert_urls(batch, url, seen_at)
+                batch.clear()
+
+        def handle(entries):
+            for tag, loc, lastmod in entries:
+                if tag == 'sitemap':
+                    children.append((urljoin(url, loc), parse_lastmod(lastmod)))
+                else:
+                    batch.append((urljoin(url, loc), lastmod))
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                flush()
+
+        try:
+            result = await self.fetcher.fetch_stream_async(url, lambda chunk: handle(parser.feed(chunk)))
+            if result.error is None and result.status_code < 400:
+                handle(parser.close())
+        except (ET.ParseError, zlib.error) as e:
+            flush()
+            return None, f'parse error: {e}'
+        flush()
+        if result.error is not None:
+            return None, result.error
+        if result.status_code >= 400:
+            return None, f'HTTP {result.status_code}'
+        return {'children': children, 'url_count': counts['urls']}, None
+
+    async def _discover_async(self, roots, seen_at, force):
+        queue = [(root, None) for root in roots]
+        visited = set()
+        while queue and len(visited) < self.max_sitemaps:
+            level = []
+            for url, lastmod in queue:
+                if url in visited or len(visited) >= self.max_sitemaps:
+                    continue
+                visited.add(url)
+                state = self.inventory.sitemap_state(url)
+                # sitemap فرعي بنفس lastmod السابق: لا حاجة لإعادة قراءته
+                if not force and state and lastmod is not None and state['lastmod'] is not None and lastmod <= state['lastmod']:
+                    self.inventory.touch_sitemap_urls(url, seen_at)
+                    self.stats['sitemaps_skipped'] += 1
+                    continue
+                level.append((url, lastmod))
+
+            results = await asyncio.gather(*(self._read_sitemap(url, seen_at) for url, _ in level))
+            queue = []
+            for (url, lastmod), (parsed, error) in zip(level, results):
+                if error is not None:
+                    print(f"⚠️ تعذر قراءة {url}: {error}")
+                    self.stats['sitemaps_failed'] += 1
+                    # الاحتفاظ بروابطه السابقة بدلاً من اعتبارها محذوفة
+                    self.inventory.touch_sitemap_urls(url, seen_at)
+                    continue
+                self.stats['sitemaps_fetched'] += 1
+                self.stats['urls_seen'] += parsed['url_count']
+                self.inventory.record_sitemap(url, lastmod, seen_at, parsed['url_count'])
+                queue.extend(parsed['children'])
+
+    def discover(self, base_url, force=False):
+        """قراءة كل ملفات sitemap للموقع وتحديث الجرد"""
+        host = urlparse(base_url).netloc
+        seen_at = time.time()
+        roots = self.sitemap_roots(base_url)
+        print(f"🗺️ اكتشاف الروابط من {len(roots)} sitemap...")
+        self.fetcher.run(self._discover_async(roots, seen_at, force))
+        if self.stats['sitemaps_fetched'] or self.stats['sitemaps_skipped']:
+            self.inventory.record_discovery(host, seen_at, time.time())
+        return self.inventory.summary(host)
+
+    def ensure_fresh(self, base_url, max_age=DISCOVERY_MAX_AGE):
+        """اكتشاف جديد فقط إذا كان آخر اكتشاف أقدم من max_age"""
+        discovery = self.inventory.last_discovery(urlparse(base_url).netloc)
+        if discovery is None or time.time() - discovery['finished_at'] > max_age:
+            return self.discover(base_url)
+        return self.inventory.summary(urlparse(base_url).netloc)
+
+    def urls(self, base_url, kind=None, limit=None, max_age=DISCOVERY_MAX_AGE):
+        """روابط الجرد بعد التأكد من حداثته"""
+        self.ensure_fresh(base_url, max_age)
+        return self.inventory.urls(urlparse(base_url).netloc, kind, limit)
+
+
+_url_inventory = None
+
+
+def get_url_inventory():
+    """الجرد المشترك لهذا التشغيل (DNMEG_URL_INVENTORY=مسار، أو فارغ لجرد في الذاكرة فقط)"""
+    global _url_inventory
+    if _url_inventory is None:
+        path = os.environ.get(INVENTORY_ENV_VAR, DEFAULT_INVENTORY_PATH)
+        _url_inventory = UrlInventory(path or ':memory:')
+    return _url_inventory
+
+
+def main():
+    """الوظيفة الرئيسية"""
+    base_url = "https://dnmeg.com"
+    discovery = SitemapDiscovery()
+    summary = discovery.discover(base_url)
+    host = urlparse(base_url).netloc
+    products = discovery.inventory.urls(host, 'product')
+
+    print(f"✅ ملفات sitemap: {discovery.stats['sitemaps_fetched']} مقروء، {discovery.stats['sitemaps_skipped']} بدون تغيير")
+    for kind, count in sorted(summary.items()):
+        print(f"  • {kind}: {count}")
+    print(f"🔄 منتجات تحتاج إعادة جلب: {len(discovery.inventory.due(products))} من {len(products)}")
+    removed = discovery.inventory.removed(host)
+    if removed:
+        print(f"🗑️ روابط أزيلت من sitemap: {len(removed)}")
+    print(f"📁 الجرد محفوظ في {discovery.inventory.path}")
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,42 @@ DNM.EG User Behavior Simulator
 محاكاة شاملة لسلوك المستخدم وتحليل رحلة العميل
 """
 
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import json
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 
+from content_memo import ContentMemo, memoized_by_content
+from dom_extract import DomExtractor
+from funnel_engine import FunnelModel
+from html_parser import make_soup
+from http_client import get_shared_fetcher
+from rate_limiter import TokenBucket
+
+# قواعد عناصر الصفحة: تُطبق كلها في مرور واحد على الشجرة
+PAGE_ELEMENT_RULES = (
+    DomExtractor()
+    .add('navigation_links', 'nav a')
+    .add('product_cards', ['div', 'article'], class_=lambda x: x and 'product' in x.lower())
+    .add('call_to_action_buttons', ['button', 'a'], class_=lambda x: x and ('btn' in x.lower() or 'button' in x.lower()))
+    .add('trust_signals', ['img', 'div'], class_=lambda x: x and ('trust' in x.lower() or 'secure' in x.lower() or 'badge' in x.lower()))
+    .add('search_box', 'input', {'type': 'search'})
+    .add('cart_icon', ['a', 'div'], class_=lambda x: x and 'cart' in x.lower())
+    .add('social_links', 'a', href=lambda x: x and any(social in x for social in ['instagram', 'facebook', 'twitter', 'tiktok']))
+    .add('hero_section', ['section', 'div'], class_=lambda x: x and ('hero' in x.lower() or 'banner' in x.lower()))
+    .add('featured_products', ['div', 'section'], class_=lambda x: x and ('featured' in x.lower() or 'popular' in x.lower()))
+)
+
 class UserBehaviorSimulator:
-    def __init__(self):
+    def __init__(self, fetcher=None, memo_size=256):
         self.base_url = "https://dnmeg.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.fetcher = fetcher or get_shared_fetcher()
+        # نتائج التحليل والأشجار المحللة حسب بصمة المحتوى: تحليل واحد لكل صفحة فريدة
+        self.memo = ContentMemo(memo_size)
+        self.soups = ContentMemo(max(1, memo_size // 8))
         self.journey_data = {
             'user_sessions': [],
             'conversion_funnel': {},
@@ -28,8 +49,10 @@ class UserBehaviorSimulator:
             'recommendations': []
         }
         
-    def simulate_user_session(self, user_type='new_visitor'):
-        """محاكاة جلسة مستخدم كاملة"""
+    def simulate_user_session(self, user_type='new_visitor', fetcher=None, rng=None):
+        """محاكاة جلسة مستخدم كاملة (rng مولّد عشوائي خاص بالجلسة: كل قراراتها منه)"""
+        fetcher = fetcher or self.fetcher
+        rng = rng or random.Random()
         session_data = {
             'user_type': user_type,
             'timestamp': datetime.now().isoformat(),
@@ -43,7 +66,7 @@ class UserBehaviorSimulator:
         try:
             # الخطوة 1: زيارة الصفحة الرئيسية
             start_time = time.time()
-            homepage_response = self.session.get(self.base_url, timeout=10)
+            homepage_response = fetcher.fetch(self.base_url)
             homepage_time = time.time() - start_time
             
             session_data['journey_steps'].append({
@@ -56,9 +79,9 @@ class UserBehaviorSimulator:
             })
             
             # محاكاة قرار المستخدم
-            if random.random() < 0.7:  # 70% يستكشفون الموقع
+            if rng.random() < 0.7:  # 70% يستكشفون الموقع
                 # الخطوة 2: استكشاف المنتجات
-                products_response = self.session.get(f"{self.base_url}/collections/all", timeout=10)
+                products_response = fetcher.fetch(f"{self.base_url}/collections/all")
                 products_time = time.time() - start_time - homepage_time
                 
                 session_data['journey_steps'].append({
@@ -71,11 +94,11 @@ class UserBehaviorSimulator:
                 })
                 
                 # الخطوة 3: عرض تفاصيل المنتج
-                if random.random() < 0.8:  # 80% يضغطون على منتج
+                if rng.random() < 0.8:  # 80% يضغطون على منتج
                     product_urls = self.extract_product_urls(products_response.text)
                     if product_urls:
-                        selected_product = random.choice(product_urls)
-                        product_response = self.session.get(selected_product, timeout=10)
+                        selected_product = rng.choice(product_urls)
+                        product_response = fetcher.fetch(selected_product)
                         product_time = time.time() - start_time - homepage_time - products_time
                         
                         session_data['journey_steps'].append({
@@ -88,7 +111,7 @@ class UserBehaviorSimulator:
                         })
                         
                         # الخطوة 4: محاولة إضافة للسلة
-                        if random.random() < 0.6:  # 60% يحاولون الإضافة للسلة
+                        if rng.random() < 0.6:  # 60% يحاولون الإضافة للسلة
                             add_to_cart_result = self.simulate_add_to_cart(selected_product, product_response.text)
                             
                             session_data['journey_steps'].append({
@@ -102,8 +125,8 @@ class UserBehaviorSimulator:
                             
                             if add_to_cart_result['success']:
                                 # الخطوة 5: عملية الخروج
-                                if random.random() < 0.4:  # 40% يكملون الشراء
-                                    checkout_result = self.simulate_checkout_process()
+                                if rng.random() < 0.4:  # 40% يكملون الشراء
+                                    checkout_result = self.simulate_checkout_process(fetcher, rng)
                                     
                                     session_data['journey_steps'].append({
                                         'step': 5,
@@ -145,36 +168,44 @@ class UserBehaviorSimulator:
         
         return session_data
     
+    def parse(self, html_content):
+        """تحليل HTML مرة واحدة لكل محتوى فريد (الشجرة للقراءة فقط)"""
+        return self.soups.get_or_compute('soup', html_content, lambda: make_soup(html_content), copy_result=False)
+    
+    @memoized_by_content()
     def analyze_page_elements(self, html_content, page_type):
         """تحليل عناصر الصفحة"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = self.parse(html_content)
+        found = PAGE_ELEMENT_RULES.run(soup)
         
         elements = {
-            'navigation_links': len(soup.find_all('nav a')),
-            'product_cards': len(soup.find_all(['div', 'article'], class_=lambda x: x and 'product' in x.lower())),
-            'call_to_action_buttons': len(soup.find_all(['button', 'a'], class_=lambda x: x and ('btn' in x.lower() or 'button' in x.lower()))),
-            'trust_signals': len(soup.find_all(['img', 'div'], class_=lambda x: x and ('trust' in x.lower() or 'secure' in x.lower() or 'badge' in x.lower()))),
-            'search_box': len(soup.find_all('input', {'type': 'search'})),
-            'cart_icon': len(soup.find_all(['a', 'div'], class_=lambda x: x and 'cart' in x.lower())),
-            'social_links': len(soup.find_all('a', href=lambda x: x and any(social in x for social in ['instagram', 'facebook', 'twitter', 'tiktok'])))
+            'navigation_links': found.count('navigation_links'),
+            'product_cards': found.count('product_cards'),
+            'call_to_action_buttons': found.count('call_to_action_buttons'),
+            'trust_signals': found.count('trust_signals'),
+            'search_box': found.count('search_box'),
+            'cart_icon': found.count('cart_icon'),
+            'social_links': found.count('social_links')
         }
         
         # تحليل خاص حسب نوع الصفحة
         if page_type == 'homepage':
-            elements['hero_section'] = len(soup.find_all(['section', 'div'], class_=lambda x: x and ('hero' in x.lower() or 'banner' in x.lower())))
-            elements['featured_products'] = len(soup.find_all(['div', 'section'], class_=lambda x: x and ('featured' in x.lower() or 'popular' in x.lower())))
+            elements['hero_section'] = found.count('hero_section')
+            elements['featured_products'] = found.count('featured_products')
         
         return elements
     
+    @memoized_by_content()
     def count_products(self, html_content):
         """عدد المنتجات في الصفحة"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = self.parse(html_content)
         products = soup.find_all(['div', 'article'], class_=lambda x: x and 'product' in x.lower())
         return len(products)
     
+    @memoized_by_content()
     def extract_product_urls(self, html_content):
         """استخراج روابط المنتجات"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = self.parse(html_content)
         product_links = []
         
         for link in soup.find_all('a', href=True):
@@ -185,9 +216,10 @@ class UserBehaviorSimulator:
         
         return list(set(product_links))  # إزالة التكرار
     
+    @memoized_by_content()
     def analyze_product_page(self, html_content):
         """تحليل صفحة المنتج"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = self.parse(html_content)
         
         analysis = {
             'product_title': bool(soup.find('h1')),
@@ -211,9 +243,10 @@ class UserBehaviorSimulator:
             return [indicator.text.strip() for indicator in stock_indicators]
         return ['Unknown']
     
+    @memoized_by_content(1)
     def simulate_add_to_cart(self, product_url, product_html):
         """محاكاة إضافة المنتج للسلة"""
-        soup = BeautifulSoup(product_html, 'html.parser')
+        soup = self.parse(product_html)
         
         # تحقق من وجود زر إضافة للسلة
         add_button = soup.find(['button', 'input'], {'type': 'submit'}, value=lambda x: x and 'cart' in x.lower() if x else False)
@@ -246,13 +279,40 @@ class UserBehaviorSimulator:
             'issues': []
         }
     
-    def simulate_checkout_process(self):
+    def inspect_checkout_page(self, fetcher=None):
+        """فحص صفحة الخروج: هل يمكن الوصول إليها وما العناصر الناقصة"""
+        checkout_response = (fetcher or self.fetcher).fetch(f"{self.base_url}/checkout")
+        
+        if checkout_response.status_code != 200:
+            return {
+                'accessible': False,
+                'missing_elements': []
+            }
+        
+        # تحليل صفحة الخروج
+        soup = self.parse(checkout_response.text)
+        
+        # تحقق من عناصر الخروج
+        checkout_elements = {
+            'customer_info_form': bool(soup.find('form', id=lambda x: x and 'checkout' in x.lower())),
+            'shipping_options': bool(soup.find(['div', 'select'], class_=lambda x: x and 'shipping' in x.lower())),
+            'payment_options': bool(soup.find(['div', 'select'], class_=lambda x: x and 'payment' in x.lower())),
+            'place_order_button': bool(soup.find(['button', 'input'], value=lambda x: x and ('place order' in x.lower() or 'complete purchase' in x.lower()) if x else False))
+        }
+        
+        return {
+            'accessible': True,
+            'missing_elements': [key for key, value in checkout_elements.items() if not value]
+        }
+    
+    def simulate_checkout_process(self, fetcher=None, rng=None):
         """محاكاة عملية الخروج"""
+        rng = rng or random.Random()
         try:
             # محاكاة زيارة صفحة الخروج
-            checkout_response = self.session.get(f"{self.base_url}/checkout", timeout=10)
+            checkout_page = self.inspect_checkout_page(fetcher)
             
-            if checkout_response.status_code != 200:
+            if not checkout_page['accessible']:
                 return {
                     'success': False,
                     'time_spent': 0,
@@ -260,25 +320,14 @@ class UserBehaviorSimulator:
                     'cart_value': 0
                 }
             
-            # تحليل صفحة الخروج
-            soup = BeautifulSoup(checkout_response.text, 'html.parser')
-            
-            # تحقق من عناصر الخروج
-            checkout_elements = {
-                'customer_info_form': bool(soup.find('form', id=lambda x: x and 'checkout' in x.lower())),
-                'shipping_options': bool(soup.find(['div', 'select'], class_=lambda x: x and 'shipping' in x.lower())),
-                'payment_options': bool(soup.find(['div', 'select'], class_=lambda x: x and 'payment' in x.lower())),
-                'place_order_button': bool(soup.find(['button', 'input'], value=lambda x: x and ('place order' in x.lower() or 'complete purchase' in x.lower()) if x else False))
-            }
-            
             # محاكاة وقت إتمام العملية
-            checkout_time = random.uniform(2, 5)  # 2-5 ثواني لإتمام الخروج
+            checkout_time = rng.uniform(2, 5)  # 2-5 ثواني لإتمام الخروج
             
             # محاكاة قيمة السلة
-            cart_value = random.uniform(350, 1200)  # بناءً على الأسعار الفعلية
+            cart_value = rng.uniform(350, 1200)  # بناءً على الأسعار الفعلية
             
             # محاكاة نسبة النجاح
-            if all(checkout_elements.values()) and random.random() < 0.7:  # 70% نجاح إذا كانت جميع العناصر موجودة
+            if not checkout_page['missing_elements'] and rng.random() < 0.7:  # 70% نجاح إذا كانت جميع العناصر موجودة
                 return {
                     'success': True,
                     'time_spent': round(checkout_time, 2),
@@ -286,11 +335,10 @@ class UserBehaviorSimulator:
                     'cart_value': round(cart_value, 2)
                 }
             else:
-                missing_elements = [key for key, value in checkout_elements.items() if not value]
                 return {
                     'success': False,
                     'time_spent': round(checkout_time, 2),
-                    'issues': [f'Missing checkout elements: {", ".join(missing_elements)}'],
+                    'issues': [f'Missing checkout elements: {", ".join(checkout_page["missing_elements"])}'],
                     'cart_value': round(cart_value, 2)
                 }
         
@@ -302,27 +350,141 @@ class UserBehaviorSimulator:
                 'cart_value': 0
             }
     
-    def run_multiple_simulations(self, num_sessions=20):
-        """تشغيل محاكاة متعددة الجلسات"""
+    def build_site_profile(self):
+        """فحص حي واحد للموقع: كل ما تحتاجه المحاكاة غير المتصلة من نتائج حتمية"""
+        profile = {
+            'homepage_error': None,
+            'browse_error': None,
+            'product_count': 0,
+            'product_errors': {},
+            'add_to_cart_outcomes': {},
+            'checkout': {'ready': False, 'issue': None}
+        }
+        
+        try:
+            self.fetcher.fetch(self.base_url)
+        except Exception as e:
+            profile['homepage_error'] = str(e)
+            return profile
+        
+        try:
+            products_response = self.fetcher.fetch(f"{self.base_url}/collections/all")
+        except Exception as e:
+            profile['browse_error'] = str(e)
+            return profile
+        
+        # نتيجة الإضافة للسلة لكل منتج (المستخدم يختار منتجاً عشوائياً بالتساوي)
+        product_urls = self.extract_product_urls(products_response.text)
+        profile['product_count'] = len(product_urls)
+        for product_response in self.fetcher.fetch_many(product_urls):
+            share = 1 / len(product_urls)
+            if product_response.error is not None:
+                reason = f"{product_response.url}: {product_response.error}"
+                profile['product_errors'][reason] = profile['product_errors'].get(reason, 0) + share
+                continue
+            result = self.simulate_add_to_cart(product_response.url, product_response.text)
+            outcome = 'success' if result['success'] else ', '.join(str(issue) for issue in result['issues'])
+            profile['add_to_cart_outcomes'][outcome] = profile['add_to_cart_outcomes'].get(outcome, 0) + share
+        
+        # تطبيع النتائج على المنتجات التي تم جلبها فعلاً
+        fetched_share = sum(profile['add_to_cart_outcomes'].values())
+        if fetched_share:
+            profile['add_to_cart_outcomes'] = {reason: share / fetched_share for reason, share in profile['add_to_cart_outcomes'].items()}
+        
+        try:
+            checkout_page = self.inspect_checkout_page()
+            if not checkout_page['accessible']:
+                profile['checkout']['issue'] = 'Checkout page not accessible'
+            elif checkout_page['missing_elements']:
+                profile['checkout']['issue'] = f'Missing checkout elements: {", ".join(checkout_page["missing_elements"])}'
+            else:
+                profile['checkout']['ready'] = True
+        except Exception as e:
+            profile['checkout']['issue'] = f'Checkout error: {str(e)}'
+        
+        return profile
+    
+    def run_monte_carlo(self, num_sessions=1000000, seed=None, user_type_probabilities=None):
+        """محاكاة غير متصلة لملايين الجلسات بعد فحص حي واحد للموقع"""
+        print("🔎 فحص الموقع لبناء نموذج القمع...")
+        site_profile = self.build_site_profile()
+        
+        print(f"🎲 محاكاة {num_sessions:,} جلسة (Monte Carlo)...")
+        model = FunnelModel(site_profile, user_type_probabilities)
+        summary = model.run(num_sessions, seed=seed)
+        
+        self.journey_data['conversion_funnel'] = summary['conversion_funnel']
+        self.journey_data['friction_points'] = summary['friction_points']
+        self.journey_data['abandonment_reasons'] = summary['abandonment_reasons']
+        self.journey_data['monte_carlo'] = {
+            'sessions': num_sessions,
+            'seed': seed,
+            'elapsed_ms': summary['elapsed_ms'],
+            'per_user_type': summary['per_user_type'],
+            'site_profile': site_profile
+        }
+        
+        print(f"✅ تمت المحاكاة في {summary['elapsed_ms']} ms")
+        
+        # توليد التوصيات
+        self.generate_behavior_recommendations()
+        
+        return self.journey_data
+    
+    def session_rngs(self, num_sessions, seed=None):
+        """مولّد عشوائي مستقل لكل جلسة (seed + رقم الجلسة): نفس الجلسات مهما كان ترتيب تنفيذ الخيوط"""
+        if seed is None:
+            return [random.Random() for _ in range(num_sessions)]
+        return [random.Random(seed + i) for i in range(num_sessions)]
+    
+    def run_multiple_simulations(self, num_sessions=20, concurrency=1, rate_limit=None, seed=None):
+        """تشغيل محاكاة متعددة الجلسات (concurrency > 1 للتشغيل المتوازي)"""
         print(f"🚀 بدء محاكاة {num_sessions} جلسة مستخدم...")
         
         user_types = ['new_visitor', 'returning_customer', 'bargain_hunter', 'brand_loyal']
+        rngs = self.session_rngs(num_sessions, seed)
+        session_types = [rng.choice(user_types) for rng in rngs]
+        
+        if concurrency > 1:
+            self.run_concurrent_sessions(session_types, concurrency, rate_limit, rngs)
+        else:
+            for i, user_type in enumerate(session_types):
+                session_data = self.simulate_user_session(user_type, rng=rngs[i])
+                self.journey_data['user_sessions'].append(session_data)
+                
+                print(f"✅ تمت محاكاة الجلسة {i+1}/{num_sessions} - النوع: {user_type} - التحويل: {'✅' if session_data['converted'] else '❌'}")
         
-        for i in range(num_sessions):
-            user_type = random.choice(user_types)
-            session_data = self.simulate_user_session(user_type)
-            self.journey_data['user_sessions'].append(session_data)
-            
-            print(f"✅ تمت محاكاة الجلسة {i+1}/{num_sessions} - النوع: {user_type} - التحويل: {'✅' if session_data['converted'] else '❌'}")
-            
-            # تأخير صغير بين المحاكاة
-            time.sleep(0.5)
+        print(f"🧠 ذاكرة التحليل: {self.memo.stats['hits']} نتيجة معاد استخدامها، {self.soups.stats['misses']} صفحة محللة")
         
         # تحليل البيانات
         self.analyze_simulation_results()
         
         return self.journey_data
     
+    def run_concurrent_sessions(self, session_types, concurrency=8, rate_limit=None, rngs=None):
+        """تشغيل الجلسات بالتوازي: كل جلسة بكوكيز ومولّد عشوائي مستقلين، مع حد عام للطلبات في الثانية"""
+        rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        results = [None] * len(session_types)
+        rngs = rngs or self.session_rngs(len(session_types))
+        
+        def run_session(user_type, rng):
+            session_fetcher = self.fetcher.scoped(rate_limiter=rate_limiter)
+            try:
+                return self.simulate_user_session(user_type, fetcher=session_fetcher, rng=rng)
+            finally:
+                session_fetcher.close()
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(run_session, user_type, rngs[i]): i for i, user_type in enumerate(session_types)}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                results[i] = future.result()
+                print(f"✅ تمت محاكاة الجلسة {done}/{len(session_types)} - النوع: {session_types[i]} - التحويل: {'✅' if results[i]['converted'] else '❌'}")
+        
+        # التجميع في الخيط الرئيسي وبترتيب الجلسات
+        self.journey_data['user_sessions'].extend(results)
+        return results
+    
     def analyze_simulation_results(self):
         """تحليل نتائج المحاكاة"""
         sessions = self.journey_data['user_sessions']
@@ -443,6 +605,9 @@ class UserBehaviorSimulator:
         print(f"🛒 مضافو السلة: {funnel.get('cart_adders', 0)} ({funnel.get('cart_rate', 0)}%)")
         print(f"💳 مبدئو الخروج: {funnel.get('checkout_starters', 0)} ({funnel.get('checkout_rate', 0)}%)")
         print(f"✅ المحولون: {funnel.get('converted_users', 0)} ({funnel.get('conversion_rate', 0)}%)")
+        if 'confidence_intervals' in funnel:
+            low, high = funnel['confidence_intervals']['conversion_rate']
+            print(f"📐 فترة الثقة 95% لمعدل التحويل: {low}% - {high}%")
         
         # نقاط الاحتكاك
         print(f"\n⚠️ نقاط الاحتكاك الرئيسية:")
@@ -468,8 +633,20 @@ class UserBehaviorSimulator:
 
 def main():
     """الوظيفة الرئيسية"""
+    parser = argparse.ArgumentParser(description='Simulate user journeys on dnmeg.com')
+    parser.add_argument('--sessions', type=int, default=20, help='live sessions to simulate')
+    parser.add_argument('--monte-carlo', type=int, metavar='N', help='simulate N sessions offline after one live probe')
+    parser.add_argument('--concurrency', type=int, default=1, help='live sessions to run in parallel')
+    parser.add_argument('--rate-limit', type=float, help='max requests per second across all sessions')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    
     simulator = UserBehaviorSimulator()
-    results = simulator.run_multiple_simulations(20)
+    if args.monte_carlo:
+        simulator.run_monte_carlo(args.monte_carlo, seed=args.seed)
+    else:
+        # مع --seed: نفس اختيارات الجلسات في كل تشغيل (ضروري لإعادة التشغيل من أرشيف HTTP)
+        simulator.run_multiple_simulations(args.sessions, args.concurrency, args.rate_limit, seed=args.seed)
     simulator.print_summary()
     simulator.save_results()
 